@@ -1,10 +1,14 @@
 import streamlit as st
 import pandas as pd
-from collections import defaultdict
-import re
-import uuid
 import os
 import io
+import time
+
+from sp_header import (
+    PROFILES, GenerationLog, StageRecorder, SurveyError, available_readers, build_rows, diff_rows, fan_out,
+    WRITERS, generate_sheets, jobs, load_previous_states, load_sheets, load_survey, output_formats, plan_rows,
+    plan_summary, resolve_profile, sheet_names, stages_to_json, survey_cache, to_bytes, write_shards_zip,
+)
 
 # 设置页面配置
 st.set_page_config(page_title="SP-批量模版生成工具", page_icon="📊", layout="centered")
@@ -72,703 +76,360 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# C US 逻辑：从 script-C US.py 提取并调整
-def generate_header_from_survey_C(uploaded_file, output_file, country, sheet_name=0):
-    try:
-        df_survey_C = pd.read_excel(uploaded_file, sheet_name=sheet_name)
-        st.write(f"成功读取文件，数据形状：{df_survey_C.shape}")
-        st.write(f"列名列表: {list(df_survey_C.columns)}")
-    except FileNotFoundError:
-        st.error(f"错误：无法读取上传的文件。请确保文件格式正确。")
-        return None
-    except Exception as e:
-        st.error(f"读取文件时出错：{e}")
-        return None
-    
-    unique_campaigns = [name for name in df_survey_C['广告活动名称'].dropna() if str(name).strip()]
-    st.write(f"独特活动名称数量: {len(unique_campaigns)}: {unique_campaigns}")
-    
-    non_empty_campaigns = df_survey_C[
-        df_survey_C['广告活动名称'].notna() & 
-        (df_survey_C['广告活动名称'] != '')
-    ]
-    required_cols = ['CPC', 'SKU', '广告组默认竞价', '预算']
-    if all(col in non_empty_campaigns.columns for col in required_cols):
-        campaign_to_values = non_empty_campaigns.drop_duplicates(
-            subset='广告活动名称', keep='first'
-        ).set_index('广告活动名称')[required_cols].to_dict('index')
-    else:
-        campaign_to_values = {}
-        st.warning(f"警告：缺少列 {set(required_cols) - set(non_empty_campaigns.columns)}，使用默认值")
-    
-    st.write(f"生成的字典（有 {len(campaign_to_values)} 个活动）: {campaign_to_values}")
-    
-    keyword_columns = df_survey_C.columns[7:17]
-    st.write(f"关键词列: {list(keyword_columns)}")
-    
-    duplicates_found = False
-    st.markdown("### 检查关键词重复")
-    for col in keyword_columns:
-        col_index = list(df_survey_C.columns).index(col) + 1
-        col_letter = chr(64 + col_index) if col_index <= 26 else f"{chr(64 + (col_index-1)//26)}{chr(64 + (col_index-1)%26 + 1)}"
-        kw_list = [kw for kw in df_survey_C[col].dropna() if str(kw).strip()]
-        
-        if len(kw_list) > len(set(kw_list)):
-            duplicates_mask = df_survey_C[col].duplicated(keep=False)
-            duplicates_df = df_survey_C[duplicates_mask][[col]].dropna()
-            st.warning(f"警告：{col_letter} 列 ({col}) 有重复关键词")
-            for _, row in duplicates_df.iterrows():
-                kw = str(row[col]).strip()
-                count = (df_survey_C[col] == kw).sum()
-                if count > 1:
-                    st.write(f"  重复词: '{kw}' (出现 {count} 次)")
-            duplicates_found = True
-    
-    if duplicates_found:
-        st.error("提示：由于检测到关键词重复，生成已终止。请清理重复关键词后重试。")
-        return None
-    
-    st.write("关键词无重复，继续生成...")
-    
-    neg_exact = list(dict.fromkeys([kw for kw in df_survey_C.get('否定精准', pd.Series()).dropna() if str(kw).strip()]))
-    neg_phrase = list(dict.fromkeys([kw for kw in df_survey_C.get('否定词组', pd.Series()).dropna() if str(kw).strip()]))
-    suzhu_extra_neg_exact = list(dict.fromkeys([kw for kw in df_survey_C.get('宿主额外否精准', pd.Series()).dropna() if str(kw).strip()]))
-    suzhu_extra_neg_phrase = list(dict.fromkeys([kw for kw in df_survey_C.get('宿主额外否词组', pd.Series()).dropna() if str(kw).strip()]))
-    
-    neg_duplicates_found = False
-    st.markdown("### 检查否定关键词重复")
-    
-    if len(neg_exact) > len(set(neg_exact)):
-        neg_duplicates_found = True
-        st.warning("警告：'否定精准' 列有重复关键词")
-        neg_exact_series = df_survey_C.get('否定精准', pd.Series()).dropna()
-        duplicates_mask = neg_exact_series.duplicated(keep=False)
-        duplicates_df = df_survey_C[duplicates_mask].loc[:, '否定精准'].dropna()
-        for _, row in duplicates_df.items():
-            kw = str(row).strip()
-            count = (neg_exact_series == kw).sum()
-            if count > 1:
-                st.write(f"  重复词: '{kw}' (出现 {count} 次)")
-    
-    if len(neg_phrase) > len(set(neg_phrase)):
-        neg_duplicates_found = True
-        st.warning("警告：'否定词组' 列有重复关键词")
-        neg_phrase_series = df_survey_C.get('否定词组', pd.Series()).dropna()
-        duplicates_mask = neg_phrase_series.duplicated(keep=False)
-        duplicates_df = df_survey_C[duplicates_mask].loc[:, '否定词组'].dropna()
-        for _, row in duplicates_df.items():
-            kw = str(row).strip()
-            count = (neg_phrase_series == kw).sum()
-            if count > 1:
-                st.write(f"  重复词: '{kw}' (出现 {count} 次)")
-    
-    if len(suzhu_extra_neg_exact) > len(set(suzhu_extra_neg_exact)):
-        neg_duplicates_found = True
-        st.warning("警告：'宿主额外否精准' 列有重复关键词")
-        suzhu_exact_series = df_survey_C.get('宿主额外否精准', pd.Series()).dropna()
-        duplicates_mask = suzhu_exact_series.duplicated(keep=False)
-        duplicates_df = df_survey_C[duplicates_mask].loc[:, '宿主额外否精准'].dropna()
-        for _, row in duplicates_df.items():
-            kw = str(row).strip()
-            count = (suzhu_exact_series == kw).sum()
-            if count > 1:
-                st.write(f"  重复词: '{kw}' (出现 {count} 次)")
-    
-    if len(suzhu_extra_neg_phrase) > len(set(suzhu_extra_neg_phrase)):
-        neg_duplicates_found = True
-        st.warning("警告：'宿主额外否词组' 列有重复关键词")
-        suzhu_phrase_series = df_survey_C.get('宿主额外否词组', pd.Series()).dropna()
-        duplicates_mask = suzhu_phrase_series.duplicated(keep=False)
-        duplicates_df = df_survey_C[duplicates_mask].loc[:, '宿主额外否词组'].dropna()
-        for _, row in duplicates_df.items():
-            kw = str(row).strip()
-            count = (suzhu_phrase_series == kw).sum()
-            if count > 1:
-                st.write(f"  重复词: '{kw}' (出现 {count} 次)")
-    
-    if neg_duplicates_found:
-        st.error("提示：由于检测到否定关键词重复，生成已终止。请清理重复关键词后重试。")
-        return None
-    
-    st.write("否定关键词无重复，继续生成...")
-    
-    columns = [
-        '产品', '实体层级', '操作', '广告活动编号', '广告组编号', '广告组合编号', '广告编号', '关键词编号', '商品投放 ID',
-        '广告活动名称', '广告组名称', '开始日期', '结束日期', '投放类型', '状态', '每日预算', 'SKU', '广告组默认竞价',
-        '竞价', '关键词文本', '匹配类型', '竞价方案', '广告位', '百分比', '拓展商品投放编号'
-    ]
-    
-    product = '商品推广'
-    operation = 'Create'
-    status = '已启用'
-    targeting_type = '手动'
-    bidding_strategy = '动态竞价 - 仅降低'
-    default_daily_budget = 12
-    default_group_bid = 0.6
-    
-    keyword_categories = set()
-    for col in keyword_columns:
-        col_lower = str(col).lower()
-        if '/' in col:
-            parts = col_lower.split('/')
-            if parts[0]:
-                keyword_categories.add(parts[0])
-            if len(parts) > 1 and parts[1]:
-                chinese_part = parts[1].split('-')[0] if '-' in parts[1] else parts[1]
-                keyword_categories.add(chinese_part)
+# 生成逻辑见 sp_header.engine，各国家的规则在 sp_header/country_profiles.json；这里只负责界面输出，结果写到内存缓冲区，不落盘
+# 上传文件按内容哈希缓存解析结果，重跑 / 切换国家时不再重复 read_excel
+# 生成过程只往 GenerationLog 里记录，结束后一次性渲染：摘要直接显示，逐活动明细放进折叠面板
+def _render_log(log):
+    for level, kind, message in log.select():
+        if kind == '标题':
+            st.markdown(f"### {message}")
+        elif kind == '警告':
+            st.warning(message)
         else:
-            for suffix in ['精准词', '广泛词', '精准', '广泛']:
-                if col_lower.endswith(suffix):
-                    prefix = col_lower[:-len(suffix)]
-                    if prefix:
-                        keyword_categories.add(prefix)
-                        break
-    
-    keyword_categories.update(['suzhu', '宿主', 'case', '包', 'tape'])
-    st.write(f"识别到的关键词类别: {keyword_categories}")
-    
-    rows = []
-    
-    for campaign_name in unique_campaigns:
-        if campaign_name in campaign_to_values:
-            cpc = campaign_to_values[campaign_name]['CPC']
-            sku = campaign_to_values[campaign_name]['SKU']
-            group_bid = campaign_to_values[campaign_name]['广告组默认竞价']
-            budget = campaign_to_values[campaign_name]['预算']
-        else:
-            cpc = 0.5
-            sku = 'SKU-1'
-            group_bid = default_group_bid
-            budget = default_daily_budget
-        
-        st.write(f"处理活动: {campaign_name}")
-        
-        campaign_name_normalized = str(campaign_name).lower()
-        matched_category = None
-        for category in keyword_categories:
-            if category in campaign_name_normalized:
-                matched_category = category
-                break
-        st.write(f"  匹配的关键词类别: {matched_category}")
-        
-        is_exact = any(x in campaign_name_normalized for x in ['精准', 'exact'])
-        is_broad = any(x in campaign_name_normalized for x in ['广泛', 'broad'])
-        is_asin = 'asin' in campaign_name_normalized
-        match_type = '精准' if is_exact else '广泛' if is_broad else 'ASIN' if is_asin else None
-        st.write(f"  is_exact: {is_exact}, is_broad: {is_broad}, is_asin: {is_asin}, match_type: {match_type}")
-        
-        keywords = []
-        matched_columns = []
-        if matched_category and (is_exact or is_broad):
-            for col in keyword_columns:
-                col_lower = str(col).lower()
-                if is_exact and matched_category in col_lower and any(x in col_lower for x in ['精准', 'exact']):
-                    matched_columns.append(col)
-                    keywords.extend([kw for kw in df_survey_C[col].dropna() if str(kw).strip()])
-                elif is_broad and matched_category in col_lower and any(x in col_lower for x in ['广泛', 'broad']):
-                    matched_columns.append(col)
-                    keywords.extend([kw for kw in df_survey_C[col].dropna() if str(kw).strip()])
-            keywords = list(dict.fromkeys(keywords))
-            st.write(f"  匹配的列: {matched_columns}")
-            st.write(f"  关键词数量: {len(keywords)} (示例: {keywords[:2] if keywords else '无'})")
-        else:
-            st.write("  无匹配的关键词列，关键词为空")
-        
-        neg_keywords = []
-        if is_broad and matched_category:
-            for col in keyword_columns:
-                col_lower = str(col).lower()
-                if matched_category in col_lower and any(x in col_lower for x in ['精准', 'exact']):
-                    neg_keywords.extend([kw for kw in df_survey_C[col].dropna() if str(kw).strip()])
-                if any(x in campaign_name_normalized for x in ['suzhu', '宿主']) and any(x in col_lower for x in ['case', '包']) and any(x in col_lower for x in ['精准', 'exact']):
-                    neg_keywords.extend([kw for kw in df_survey_C[col].dropna() if str(kw).strip()])
-            neg_keywords = list(dict.fromkeys(neg_keywords))
-            st.write(f"  精准否定关键词数量: {len(neg_keywords)} (示例: {neg_keywords[:2] if neg_keywords else '无'})")
-        
-        # 合并 neg_exact 和 neg_keywords，去重
-        combined_neg_exact = list(dict.fromkeys(neg_exact + neg_keywords))
-        st.write(f"  合并后的否定精准关键词数量: {len(combined_neg_exact)} (示例: {combined_neg_exact[:2] if combined_neg_exact else '无'})")
-        
-        asin_targets = []
-        if is_asin and matched_category:
-            potential_asin_cols = []
-            for col in df_survey_C.columns:
-                col_lower = str(col).lower()
-                if matched_category in col_lower and 'asin' in col_lower:
-                    potential_asin_cols.append(col)
-            
-            st.write(f"  潜在ASIN列: {potential_asin_cols}")
-            
-            if potential_asin_cols:
-                def calculate_match_score(col_name, campaign_norm):
-                    col_lower = str(col_name).lower()
-                    words = re.split(r'[\s/:-]+', col_lower)
-                    unique_words = [w.strip() for w in words if w.strip() and w not in ['asin', '精准', '广泛', 'exact', 'broad']]
-                    score = sum(1 for word in unique_words if word in campaign_norm)
-                    return score, unique_words
-                
-                scores = {}
-                for col in potential_asin_cols:
-                    score, words = calculate_match_score(col, campaign_name_normalized)
-                    scores[col] = score
-                    st.write(f"    列 '{col}' 独特词: {words}, 分数: {score}")
-                
-                best_col = max(scores, key=scores.get)
-                best_score = scores[best_col]
-                st.write(f"  选择最佳列: {best_col} (分数: {best_score})")
-                
-                asin_targets.extend([kw for kw in df_survey_C[best_col].dropna() if str(kw).strip()])
-            
-            asin_targets = list(dict.fromkeys(asin_targets))
-            st.write(f"  商品定向 ASIN 数量: {len(asin_targets)} (示例: {asin_targets[:2] if asin_targets else '无'})")
-        
-        rows.append([
-            product, '广告活动', operation, campaign_name, '', '', '', '', '',
-            campaign_name, '', '', '', targeting_type, status, budget, '', '',
-            '', '', '', bidding_strategy, '', '', ''
-        ])
-        
-        rows.append([
-            product, '广告组', operation, campaign_name, campaign_name, '', '', '', '',
-            campaign_name, campaign_name, '', '', '', status, '', '', group_bid,
-            '', '', '', '', '', '', ''
-        ])
-        
-        rows.append([
-            product, '商品广告', operation, campaign_name, campaign_name, '', '', '', '',
-            campaign_name, campaign_name, '', '', '', status, '', sku, '',
-            '', '', '', '', '', '', ''
-        ])
-        
-        if is_exact or is_broad:
-            for kw in keywords:
-                rows.append([
-                    product, '关键词', operation, campaign_name, campaign_name, '', '', '', '',
-                    campaign_name, campaign_name, '', '', '', status, '', '', '',
-                    cpc, kw, match_type, '', '', '', ''
-                ])
-        
-        if is_broad:
-            for kw in combined_neg_exact:  # 使用合并后的否定精准关键词
-                rows.append([
-                    product, '否定关键词', operation, campaign_name, campaign_name, '', '', '', '',
-                    campaign_name, campaign_name, '', '', '', status, '', '', '', '',
-                    kw, '否定精准匹配', '', '', '', ''
-                ])
-            for kw in neg_phrase:
-                rows.append([
-                    product, '否定关键词', operation, campaign_name, campaign_name, '', '', '', '',
-                    campaign_name, campaign_name, '', '', '', status, '', '', '', '',
-                    kw, '否定词组', '', '', '', ''
-                ])
-            if any(x in campaign_name_normalized for x in ['suzhu', '宿主']):
-                for kw in suzhu_extra_neg_exact:
-                    rows.append([
-                        product, '否定关键词', operation, campaign_name, campaign_name, '', '', '', '',
-                        campaign_name, campaign_name, '', '', '', status, '', '', '', '',
-                        kw, '否定精准匹配', '', '', '', ''
-                    ])
-                for kw in suzhu_extra_neg_phrase:
-                    rows.append([
-                        product, '否定关键词', operation, campaign_name, campaign_name, '', '', '', '',
-                        campaign_name, campaign_name, '', '', '', status, '', '', '', '',
-                        kw, '否定词组', '', '', '', ''
-                    ])
-        
-        if is_asin:
-            for asin in asin_targets:
-                rows.append([
-                    product, '商品定向', operation, campaign_name, campaign_name, '', '', '', '',
-                    campaign_name, campaign_name, '', '', '', status, '', '', '',
-                    cpc, '', '', '', '', '', f'asin="{asin}"'
-                ])
-    
-    # 创建 DataFrame
-    df_header = pd.DataFrame(rows, columns=columns)
+            st.write(message)
+    if log.verbose:
+        log_text = log.text()
+        with st.expander("详细日志 / Debug Log"):
+            st.code(log_text, language=None)
+        st.download_button(
+            label="下载日志 / Download Log",
+            data=log_text.encode('utf-8'),
+            file_name="header-log.txt",
+            mime="text/plain"
+        )
+
+# 生成在后台任务里运行（sp_header.jobs），这里的函数不调用 st.*，只返回结果字典，任务结束后再渲染
+def _write_header(rows, result, max_rows=None, max_bytes=None, fmt='xlsx'):
     try:
-        df_header.to_excel(output_file, index=False, engine='openpyxl')
-        st.success(f"生成完成！输出文件：{output_file}，总行数：{len(rows)}")
-        return output_file
+        if max_rows or max_bytes:
+            # 按活动边界拆成多个文件并行写出，打包成 ZIP
+            with rows.stages.stage('写出') as record:
+                result['buffer'], result['shards'] = write_shards_zip(
+                    rows, result['output_file'], max_rows=max_rows, max_bytes=max_bytes, fmt=fmt)
+                record['行数'] = rows.n_rows
+        else:
+            result['buffer'] = to_bytes(rows, fmt)
     except Exception as e:
-        st.error(f"写入文件 {output_file} 时出错：{e}")
-        return None
+        result['error'] = f"写入文件时出错：{e}"
+        return result
+    result['n_rows'] = rows.n_rows
+    result['summary'] = rows.summary()
+    return result
 
-    keyword_rows = [row for row in rows if row[1] == '关键词']
-    st.write(f"关键词行数量: {len(keyword_rows)}")
-    if keyword_rows:
-        st.write(f"示例关键词行: 实体层级={keyword_rows[0][1]}, 关键词文本={keyword_rows[0][19]}, 匹配类型={keyword_rows[0][20]}")
-    
-    product_targeting_rows = [row for row in rows if row[1] == '商品定向']
-    st.write(f"商品定向行数量: {len(product_targeting_rows)}")
-    if product_targeting_rows:
-        st.write(f"示例商品定向行: 实体层级={product_targeting_rows[0][1]}, 竞价={product_targeting_rows[0][18]}, 拓展商品投放编号={product_targeting_rows[0][24]}")
-    
-    levels = set(row[1] for row in rows)
-    st.write(f"所有实体层级: {levels}")
+def generate_header_from_survey(job, uploaded_file, country, sheet_name=0, reader=None, log=None, previous_file=None,
+                                output_file='header.xlsx', max_rows=None, max_bytes=None, fmt='xlsx'):
+    log = log or GenerationLog()
+    result = {'log': log, 'country': country, 'file_name': getattr(uploaded_file, 'name', ''),
+              'output_file': output_file, 'fmt': fmt}
+    # 各阶段的耗时 / 峰值 RSS / 行数，随结果摘要一起返回
+    stages = StageRecorder()
+    try:
+        # 增量模式：先汇总上一版（调研表或批量表）的活动状态，再只输出变化的行
+        previous_states = None
+        if previous_file is not None:
+            previous_states = load_previous_states(previous_file, country, log=log, stages=stages)
+        with stages.stage('读取') as record:
+            df_survey = load_survey(uploaded_file, sheet_name=sheet_name, cache=survey_cache, reader=reader)
+            record['行数'] = len(df_survey)
+        rows = build_rows(df_survey, country, log=log, stages=stages, progress=job.progress)
+        if previous_states is not None:
+            rows, _ = diff_rows(rows, previous_states, log=log)
+    except SurveyError as e:
+        result['error'] = str(e)
+        return result
+    return _write_header(rows, result, max_rows, max_bytes, fmt)
 
-# B US 逻辑：从 script-B US.py 提取并调整
-def generate_header_from_survey_B(uploaded_file, output_file, country, sheet_name=0):
+# 多国家模式：调研表只解析一次，各国家配置在进程池里并行生成，打包成一个 ZIP
+def generate_countries_from_survey(job, uploaded_file, countries, sheet_name=0, reader=None, log=None, fmt='xlsx'):
+    log = log or GenerationLog()
+    result = {'log': log, 'countries': countries}
     try:
-        # 读取 Excel 文件
-        df_survey = pd.read_excel(uploaded_file, sheet_name=sheet_name)
-        st.write(f"成功读取文件，数据形状：{df_survey.shape}")
-        st.write(f"列名列表: {list(df_survey.columns)}")
-    except FileNotFoundError:
-        st.error(f"错误：无法读取上传的文件。请确保文件格式正确。")
-        return None
-    except Exception as e:
-        st.error(f"读取文件时出错：{e}")
-        return None
-    
-    # 提取独特活动名称
-    unique_campaigns = [name for name in df_survey['广告活动名称'].dropna() if str(name).strip()]
-    st.write(f"独特活动名称数量: {len(unique_campaigns)}: {unique_campaigns}")
-    
-    # 创建活动到 CPC/SKU/广告组默认竞价/预算 的映射
-    non_empty_campaigns = df_survey[
-        df_survey['广告活动名称'].notna() & 
-        (df_survey['广告活动名称'] != '')
-    ]
-    required_cols = ['CPC', 'SKU', '广告组默认竞价', '预算']
-    if all(col in non_empty_campaigns.columns for col in required_cols):
-        campaign_to_values = non_empty_campaigns.drop_duplicates(
-            subset='广告活动名称', keep='first'
-        ).set_index('广告活动名称')[required_cols].to_dict('index')
+        df_survey = load_survey(uploaded_file, sheet_name=sheet_name, cache=survey_cache, reader=reader)
+        result['buffer'], result['stats'] = fan_out(df_survey, countries, log=log, verbose=log.verbose,
+                                                    progress=job.progress, fmt=fmt)
+    except SurveyError as e:
+        result['error'] = str(e)
+    return result
+
+# 多工作表模式：工作簿只打开一次，选中的工作表在进程池里并行生成，合并成一个批量表或每表一个文件
+def generate_sheets_from_survey(job, uploaded_file, country, sheets, reader=None, log=None, fmt='xlsx', merge=False):
+    log = log or GenerationLog()
+    result = {'log': log, 'sheets': sheets, 'merge': merge, 'output_file': None}
+    try:
+        frames = load_sheets(uploaded_file, sheets, reader=reader)
+        result['buffer'], result['sheet_stats'] = generate_sheets(frames, country, log=log, verbose=log.verbose,
+                                                                  progress=job.progress, fmt=fmt, merge=merge)
+    except SurveyError as e:
+        result['error'] = str(e)
+        return result
+    if merge:
+        result['output_file'] = f"header-sheets-{country.replace(' ', '_')}{WRITERS[fmt][1]}"
+        result['mime'] = WRITERS[fmt][2]
     else:
-        campaign_to_values = {}
-        st.warning(f"警告：缺少列 {set(required_cols) - set(non_empty_campaigns.columns)}，使用默认值")
-    
-    st.write(f"生成的字典（有 {len(campaign_to_values)} 个活动）: {campaign_to_values}")
-    
-    # 关键词列：第 H 列（索引 7）到第 Q 列（索引 16）
-    keyword_columns = df_survey.columns[7:17]
-    st.write(f"关键词列: {list(keyword_columns)}")
-    
-    # 检查关键词重复
-    duplicates_found = False
-    st.markdown("### 检查关键词重复")
-    for col in keyword_columns:
-        col_index = list(df_survey.columns).index(col) + 1
-        col_letter = chr(64 + col_index) if col_index <= 26 else f"{chr(64 + (col_index-1)//26)}{chr(64 + (col_index-1)%26 + 1)}"
-        kw_list = [kw for kw in df_survey[col].dropna() if str(kw).strip()]
-        
-        if len(kw_list) > len(set(kw_list)):
-            duplicates_mask = df_survey[col].duplicated(keep=False)
-            duplicates_df = df_survey[duplicates_mask][[col]].dropna()
-            st.warning(f"警告：{col_letter} 列 ({col}) 有重复关键词")
-            for _, row in duplicates_df.iterrows():
-                kw = str(row[col]).strip()
-                count = (df_survey[col] == kw).sum()
-                if count > 1:
-                    st.write(f"  重复词: '{kw}' (出现 {count} 次)")
-            duplicates_found = True
-    
-    if duplicates_found:
-        st.error("提示：由于检测到关键词重复，生成已终止。请清理重复关键词后重试。")
+        result['output_file'] = f"header-sheets-{country.replace(' ', '_')}.zip"
+        result['mime'] = "application/zip"
+    return result
+
+def _snapshot(uploaded_file):
+    """上传文件复制一份交给后台任务（重跑后原对象可能已失效）。"""
+    if uploaded_file is None:
         return None
-    
-    st.write("关键词无重复，继续生成...")
-    
-    # 否定关键词聚合（去重）
-    neg_exact = list(dict.fromkeys([kw for kw in df_survey.get('否定精准', pd.Series()).dropna() if str(kw).strip()]))
-    neg_phrase = list(dict.fromkeys([kw for kw in df_survey.get('否定词组', pd.Series()).dropna() if str(kw).strip()]))
-    suzhu_extra_neg_exact = list(dict.fromkeys([kw for kw in df_survey.get('宿主额外否精准', pd.Series()).dropna() if str(kw).strip()]))
-    suzhu_extra_neg_phrase = list(dict.fromkeys([kw for kw in df_survey.get('宿主额外否词组', pd.Series()).dropna() if str(kw).strip()]))
-    neg_asin = list(dict.fromkeys([kw for kw in df_survey.get('否定ASIN', pd.Series()).dropna() if str(kw).strip()]))
-    
-    # 定义关键词类别到精准词列的映射
-    keyword_categories = {
-        'suzhu': 'suzhu/宿主-精准词',
-        '宿主': 'suzhu/宿主-精准词',
-        'case': 'case/包-精准词',
-        '包': 'case/包-精准词',
-        'cards': 'cards精准词',
-        'acces': 'acces精准词',
-        'acc': 'acc精准词',
-        None: '精准词'  # XX 组，默认列
-    }
-    
-    # 提取精准关键词
-    exact_keywords = {key: list(dict.fromkeys([kw for kw in df_survey.get(col, pd.Series()).dropna() if str(kw).strip()]))
-                      for key, col in keyword_categories.items() if col in df_survey.columns}
-    
-    # 列定义
-    columns = [
-        '产品', '实体层级', '操作', '广告活动编号', '广告组编号', '广告组合编号', '广告编号', '关键词编号', '商品投放 ID',
-        '广告活动名称', '广告组名称', '开始日期', '结束日期', '投放类型', '状态', '每日预算', 'SKU', '广告组默认竞价',
-        '竞价', '关键词文本', '匹配类型', '竞价方案', '广告位', '百分比', '拓展商品投放编号'
-    ]
-    
-    # 默认值
-    product = '商品推广'
-    operation = 'Create'
-    status = '已启用'
-    targeting_type = '手动'
-    bidding_strategy = '动态竞价 - 仅降低'
-    default_daily_budget = 12
-    default_group_bid = 0.6
-    
-    # 初始化结果列表
-    rows = []
-    
-    # 处理每个广告活动
-    for campaign_name in unique_campaigns:
-        campaign_name_normalized = str(campaign_name).lower()
-        
-        # 获取 CPC、SKU、预算和广告组默认竞价
-        campaign_values = campaign_to_values.get(campaign_name, {})
-        cpc = campaign_values.get('CPC', 0.6)
-        sku = campaign_values.get('SKU', '')
-        daily_budget = campaign_values.get('预算', default_daily_budget)
-        group_bid = campaign_values.get('广告组默认竞价', default_group_bid)
-        
-        # 判断匹配类型
-        is_exact = any(x in campaign_name_normalized for x in ['精准', 'exact'])
-        is_broad = any(x in campaign_name_normalized for x in ['广泛', 'broad'])
-        is_asin = 'asin' in campaign_name_normalized
-        match_type = '精准' if is_exact else '广泛' if is_broad else 'ASIN' if is_asin else None
-        st.write(f"处理活动: {campaign_name}")
-        st.write(f"  is_exact: {is_exact}, is_broad: {is_broad}, is_asin: {is_asin}, match_type: {match_type}")
-        
-        # 提取关键词类别
-        keyword_categories_set = set(keyword_categories.keys()) - {None}
-        st.write(f"识别到的关键词类别: {keyword_categories_set}")
-        
-        # 匹配关键词类别 - 去掉动态匹配，改为匹配到配件组
-        matched_category = None
-        matched_columns = []
+    data = io.BytesIO(uploaded_file.getvalue())
+    data.name = uploaded_file.name
+    return data
 
-        # 首先尝试预定义的映射
-        for category in keyword_categories_set:
-            if category in campaign_name_normalized:
-                matched_category = category
-                # 根据匹配类型找到对应的列
-                if is_exact:
-                    target_col = keyword_categories[category]
-                    if target_col in df_survey.columns:
-                        matched_columns.append(target_col)
-                elif is_broad:
-                    # 查找对应的广泛词列
-                    target_col_broad = keyword_categories[category].replace('精准', '广泛')
-                    if target_col_broad in df_survey.columns:
-                        matched_columns.append(target_col_broad)
-                break
+def _render_country_stats(stats):
+    st.markdown("### 各国家结果 / Per-Country Results")
+    st.dataframe(pd.DataFrame([{
+        '国家': stat['国家'],
+        '配置': stat['配置'],
+        '文件': stat['文件'],
+        '总行数': stat['总行数'],
+        '耗时（秒）': round(stat['秒'], 3),
+        '错误': stat['错误'],
+    } for stat in stats]))
 
-        # 如果没有匹配到预定义组别，则匹配到配件组
-        if not matched_columns and (is_exact or is_broad):
-            matched_category = '配件'
-            if is_exact:
-                # 配件精准组：使用 L 列（索引11）
-                target_col = df_survey.columns[11]  # L列
-                if target_col in df_survey.columns:
-                    matched_columns.append(target_col)
-                    st.write(f"  匹配到配件精准组，使用列: {target_col}")
-            elif is_broad:
-                # 配件广泛组：使用 M 列（索引12）
-                target_col = df_survey.columns[12]  # M列
-                if target_col in df_survey.columns:
-                    matched_columns.append(target_col)
-                    st.write(f"  匹配到配件广泛组，使用列: {target_col}")
+def _render_collisions(report):
+    collisions = report.get('跨活动重复')
+    negations = report.get('自我否定')
+    if collisions is not None and len(collisions):
+        st.warning(f"{len(collisions)} 个关键词被多个活动以相同匹配类型投放 / "
+                   f"{len(collisions)} keywords targeted by several campaigns with the same match type")
+        with st.expander("跨活动重复关键词 / Cross-Campaign Keyword Collisions"):
+            st.dataframe(collisions.assign(广告活动=collisions['广告活动'].map('、'.join)))
+    if negations is not None and len(negations):
+        st.warning(f"{len(negations)} 个关键词和所在活动的否定精准词相同 / "
+                   f"{len(negations)} keywords negated by their own campaign's exact negatives")
+        with st.expander("自我否定 / Self-Negations"):
+            st.dataframe(negations)
 
-        st.write(f"  匹配的关键词类别: {matched_category}")
-        
-        # 提取关键词
-        keywords = []
-        if matched_columns and (is_exact or is_broad):
-            for col in matched_columns:
-                if col in df_survey.columns:
-                    col_keywords = [kw for kw in df_survey[col].dropna() if str(kw).strip()]
-                    keywords.extend(col_keywords)
-                    st.write(f"  从列 {col} 提取 {len(col_keywords)} 个关键词")
-            
-            keywords = list(dict.fromkeys(keywords))  # 去重
-            st.write(f"  关键词数量: {len(keywords)} (示例: {keywords[:2] if keywords else '无'})")
-        else:
-            st.write("  无匹配的关键词列，关键词为空")
-        
-        # 初始化否定关键词列表
-        campaign_neg_exact = []
-        campaign_neg_phrase = []
-        
-        # 根据组别和匹配类型设置否定关键词
-        if is_exact and any(x in campaign_name_normalized for x in ['suzhu', '宿主']):
-            # 宿主精准组：仅通用否定精准
-            campaign_neg_exact = list(dict.fromkeys(neg_exact))
-            campaign_neg_phrase = list(dict.fromkeys(neg_phrase))
-        elif is_exact:
-            # 其他精准组：通用否定精准 + 通用否定词组
-            campaign_neg_exact = list(dict.fromkeys(neg_exact))
-            campaign_neg_phrase = list(dict.fromkeys(neg_phrase))
-        elif is_broad:
-            # 广泛组：通用否定精准 + 通用否定词组 + 对应精准组关键词（作为否定精准）
-            campaign_neg_exact = list(dict.fromkeys(neg_exact))
-            campaign_neg_phrase = list(dict.fromkeys(neg_phrase))
-            
-            # 为广泛组添加对应精准组的否定关键词
-            if matched_category in exact_keywords and matched_category != '配件':
-                # 预定义广泛组：添加对应精准组关键词
-                exact_kws = exact_keywords.get(matched_category, [])
-                campaign_neg_exact.extend(exact_kws)
-                st.write(f"  为预定义广泛组添加 {len(exact_kws)} 个 {matched_category} 精准词作为否定精准词")
-            elif matched_category == '配件':
-                # 配件广泛组：添加配件精准组关键词
-                accessory_exact_col = df_survey.columns[11]  # L列
-                if accessory_exact_col in df_survey.columns:
-                    accessory_exact_kws = list(dict.fromkeys([kw for kw in df_survey[accessory_exact_col].dropna() if str(kw).strip()]))
-                    campaign_neg_exact.extend(accessory_exact_kws)
-                    st.write(f"  为配件广泛组添加 {len(accessory_exact_kws)} 个配件精准词作为否定精准词 (从列: {accessory_exact_col})")
-            
-            campaign_neg_exact = list(dict.fromkeys(campaign_neg_exact))  # 去重
-        
-        # 为宿主组添加额外否定关键词（如果不是宿主精准组）
-        if not (is_exact and any(x in campaign_name_normalized for x in ['suzhu', '宿主'])):
-            if any(x in campaign_name_normalized for x in ['suzhu', '宿主']):
-                campaign_neg_exact.extend(suzhu_extra_neg_exact)
-                campaign_neg_phrase.extend(suzhu_extra_neg_phrase)
-                campaign_neg_exact = list(dict.fromkeys(campaign_neg_exact))
-                campaign_neg_phrase = list(dict.fromkeys(campaign_neg_phrase))
-        
-        # 生成广告活动行
-        rows.append([
-            product, '广告活动', operation, campaign_name, '', '', '', '', '',
-            campaign_name, '', '', '', targeting_type, status, daily_budget, '',
-            '', '', '', '', bidding_strategy, '', '', ''
-        ])
-        
-        # 生成广告组行
-        rows.append([
-            product, '广告组', operation, campaign_name, campaign_name, '', '', '', '',
-            campaign_name, campaign_name, '', '', '', status, '', '', group_bid,
-            '', '', '', '', '', '', ''
-        ])
-        
-        # 生成商品广告行
-        rows.append([
-            product, '商品广告', operation, campaign_name, campaign_name, '', '', '', '',
-            campaign_name, campaign_name, '', '', '', status, '', sku, '',
-            '', '', '', '', '', '', ''
-        ])
-        
-        # 生成关键词行
-        if is_exact or is_broad:
-            for kw in keywords:
-                rows.append([
-                    product, '关键词', operation, campaign_name, campaign_name, '', '', '', '',
-                    campaign_name, campaign_name, '', '', '', status, '', '', '',
-                    cpc, kw, match_type, '', '', '', ''
-                ])
-        
-        # 生成否定关键词行
-        if is_exact or is_broad:
-            # 精准组和广泛组：添加否定精准和否定词组
-            for kw in campaign_neg_exact:
-                rows.append([
-                    product, '否定关键词', operation, campaign_name, campaign_name, '', '', '', '',
-                    campaign_name, campaign_name, '', '', '', status, '', '', '', '',
-                    kw, '否定精准匹配', '', '', '', ''
-                ])
-            for kw in campaign_neg_phrase:
-                rows.append([
-                    product, '否定关键词', operation, campaign_name, campaign_name, '', '', '', '',
-                    campaign_name, campaign_name, '', '', '', status, '', '', '', '',
-                    kw, '否定词组', '', '', '', ''
-                ])
-        
-        # 生成商品定向和否定商品定向（仅 ASIN 组）
-        if is_asin:
-            asin_targets = []
-            # 精确匹配：列名必须与广告活动名称完全一致
-            if campaign_name in df_survey.columns:
-                asin_targets.extend([asin for asin in df_survey[campaign_name].dropna() if str(asin).strip()])
-                st.write(f"  找到与活动名称完全匹配的列: {campaign_name}")
-            else:
-                st.write(f"  未找到与活动名称完全匹配的列: {campaign_name}")
-                
-            asin_targets = list(dict.fromkeys(asin_targets))
-            st.write(f"  ASIN 数量: {len(asin_targets)} (示例: {asin_targets[:2] if asin_targets else '无'})")
-            
-            for asin in asin_targets:
-                rows.append([
-                    product, '商品定向', operation, campaign_name, campaign_name, '', '', '', '',
-                    campaign_name, campaign_name, '', '', '', status, '', '', '',
-                    cpc, '', '', '', '', '', f'asin="{asin}"'
-                ])
-            for asin in neg_asin:
-                rows.append([
-                    product, '否定商品定向', operation, campaign_name, campaign_name, '', '', '', '',
-                    campaign_name, campaign_name, '', '', '', status, '', '', '',
-                    '', '', '', '', '', '', f'asin="{asin}"'
-                ])
-    
-    # 创建 DataFrame
-    df_header = pd.DataFrame(rows, columns=columns)
-    try:
-        df_header.to_excel(output_file, index=False, engine='openpyxl')
-        st.success(f"生成完成！输出文件：{output_file}，总行数：{len(rows)}")
-        return output_file
-    except Exception as e:
-        st.error(f"写入文件 {output_file} 时出错：{e}")
-        return None
-    
-    # 调试输出
-    keyword_rows = [row for row in rows if row[1] == '关键词']
-    st.write(f"关键词行数量: {len(keyword_rows)}")
-    if keyword_rows:
-        st.write(f"示例关键词行: 实体层级={keyword_rows[0][1]}, 关键词文本={keyword_rows[0][19]}, 匹配类型={keyword_rows[0][20]}")
-    
-    product_targeting_rows = [row for row in rows if row[1] == '商品定向']
-    st.write(f"商品定向行数量: {len(product_targeting_rows)}")
-    if product_targeting_rows:
-        st.write(f"示例商品定向行: 实体层级={product_targeting_rows[0][1]}, 竞价={product_targeting_rows[0][18]}, 拓展商品投放编号={product_targeting_rows[0][24]}")
-    
-    levels = set(row[1] for row in rows)
-    st.write(f"所有实体层级: {levels}")
+def _render_stages(stages, country, file_name):
+    table = pd.DataFrame([{
+        '阶段': stage['阶段'],
+        '耗时（秒）': round(stage['秒'], 3),
+        '行数': stage['行数'],
+        '峰值 RSS（MB）': round(stage['峰值RSS'] / 1024 / 1024, 1) if stage['峰值RSS'] else None,
+        '新增 RSS（MB）': round(stage['新增RSS'] / 1024 / 1024, 1) if stage.get('新增RSS') is not None else None,
+        '与其他任务重叠': stage.get('RSS重叠', False),
+    } for stage in stages])
+    with st.expander("阶段耗时与内存 / Stage Timing & Memory"):
+        st.caption("RSS 是整个进程的内存；标记为重叠的阶段同时有其他任务在运行，RSS 包含这些任务。 / "
+                   "RSS is process-wide; overlapping stages include other jobs running at the same time.")
+        st.dataframe(table)
+        st.download_button(
+            label="下载阶段记录 JSON / Download Stage Stats (JSON)",
+            data=stages_to_json(stages, 国家=country, 文件=file_name).encode('utf-8'),
+            file_name="header-stages.json",
+            mime="application/json"
+        )
 
 # Streamlit 界面
 st.markdown('<div class="main-title">SP-批量模版生成工具</div>', unsafe_allow_html=True)
-st.markdown('<div class="instruction">请选择国家并上传 Excel 文件，点击按钮生成对应的 Header 文件（支持任意文件名的 .xlsx 文件）。<br>Please select a country and upload an Excel file, then click the button to generate the corresponding Header file (supports any .xlsx filename).</div>', unsafe_allow_html=True)
+st.markdown('<div class="instruction">请选择国家并上传调研表，点击按钮生成对应的 Header 文件（支持任意文件名的 .xlsx / .csv / .parquet 文件）。<br>Please select a country and upload a survey file, then click the button to generate the corresponding Header file (supports any .xlsx / .csv / .parquet filename).</div>', unsafe_allow_html=True)
+
+# 国家选择（多国家模式下可多选，一次生成多个 Header 文件）
+multi_country = st.checkbox("多国家模式 / Multi-Country Mode", value=False)
+if multi_country:
+    countries = st.multiselect("选择国家 / Select Countries", list(PROFILES), default=list(PROFILES))
+    country = None
+else:
+    country = st.selectbox("选择国家 / Select Country", list(PROFILES))
+
+# 读取引擎（默认最快的可用引擎，只读取规则用到的列；CSV / Parquet 按扩展名读取）
+reader = st.selectbox("读取引擎 / Reader", available_readers())
 
-# 国家选择
-country = st.selectbox("选择国家 / Select Country", ["C US", "B US", "K US", "A US"])
+# 输出格式（CSV 写出比 xlsx 快得多，亚马逊批量上传也接受；Parquet 需要安装 pyarrow）
+output_format = st.selectbox("输出格式 / Output Format", output_formats())
+
+# 详细日志（逐活动明细，默认关闭）
+verbose = st.checkbox("显示详细日志 / Show Debug Log", value=False)
+
+# 拆分输出（仅单个国家）：按活动边界拆成多个不超过行数 / 大小上限的文件，打包成 ZIP
+max_rows = max_bytes = None
+if not multi_country and st.checkbox("拆分输出文件 / Split Output Files", value=False):
+    max_rows = int(st.number_input("每个文件最多行数 / Max Rows per File", min_value=0, value=100000, step=10000)) or None
+    max_mb = st.number_input("每个文件最大 MB（估算，0 为不限） / Max MB per File (Estimated, 0 = No Limit)", min_value=0, value=0, step=10)
+    max_bytes = int(max_mb * 1024 * 1024) or None
 
 # 文件上传
-uploaded_file = st.file_uploader("上传 Excel 文件 / Upload Excel File", type=["xlsx"])
+uploaded_file = st.file_uploader("上传调研表 / Upload Survey File", type=["xlsx", "csv", "parquet"])
+
+# 多工作表（仅单个国家的 xlsx）：一次处理工作簿中的全部或部分工作表
+multi_sheet = False
+if uploaded_file is not None and not multi_country:
+    all_sheets = sheet_names(uploaded_file)
+    if len(all_sheets) > 1:
+        multi_sheet = st.checkbox("处理多个工作表 / Process Multiple Sheets", value=False)
+    if multi_sheet:
+        sheets = st.multiselect("选择工作表 / Select Sheets", all_sheets, default=all_sheets)
+        merge_sheets = st.radio("输出方式 / Output", ["合并成一个文件 / Merged File", "每个工作表一个文件 / One File per Sheet"]).startswith("合并")
+
+# 上一版文件（可选，仅单个国家、单个工作表）：上传后只生成新增 / 变更 / 删除的行
+previous_file = None
+if not multi_country and not multi_sheet:
+    previous_file = st.file_uploader("上一版调研表或批量表（可选，增量模式） / Previous Survey or Bulk File (Optional, Diff Mode)", type=["xlsx", "csv", "parquet"])
+
+def _render_single_result(result, output_file):
+    _render_log(result['log'])
+    if result.get('error'):
+        st.error(result['error'])
+        st.error("生成文件失败，请检查上传的文件格式或内容。 / Failed to generate file, please check the file format or content.")
+        return
+    st.success(f"生成完成！总行数：{result['n_rows']}")
+    summary = result['summary']
+    if 'shards' in result:
+        zip_file = f"{os.path.splitext(output_file)[0]}.zip"
+        st.download_button(
+            label=f"下载 {zip_file}（{len(result['shards'])} 个文件） / Download {zip_file}",
+            data=result['buffer'].getvalue(),
+            file_name=zip_file,
+            mime="application/zip"
+        )
+        st.dataframe(pd.DataFrame(result['shards']))
+    else:
+        st.download_button(
+            label=f"下载 {output_file} / Download {output_file}",
+            data=result['buffer'].getvalue(),
+            file_name=output_file,
+            mime=WRITERS[result['fmt']][2]
+        )
+    # 调试信息（生成时已统计，无需重新读取结果文件）
+    st.markdown("### 处理结果 / Processing Results")
+    level_counts = summary['实体层级']
+    keyword_row = summary['示例行'].get('关键词')
+    st.write(f"关键词行数量 / Keyword Rows: {level_counts.get('关键词', 0)}")
+    if keyword_row:
+        st.write(f"示例关键词行 / Example Keyword Row: 实体层级={keyword_row['实体层级']}, 关键词文本={keyword_row['关键词文本']}, 匹配类型={keyword_row['匹配类型']}")
+    product_targeting_row = summary['示例行'].get('商品定向')
+    st.write(f"商品定向行数量 / Product Targeting Rows: {level_counts.get('商品定向', 0)}")
+    if product_targeting_row:
+        st.write(f"示例商品定向行 / Example Product Targeting Row: 实体层级={product_targeting_row['实体层级']}, 竞价={product_targeting_row['竞价']}, 拓展商品投放编号={product_targeting_row['拓展商品投放编号']}")
+    st.write(f"所有实体层级 / All Entity Levels: {set(level_counts)}")
+    _render_collisions(summary['冲突'])
+    _render_stages(summary['阶段'], result['country'], result['file_name'])
+
+def _render_countries_result(result):
+    _render_log(result['log'])
+    if result.get('error'):
+        st.error(result['error'])
+        return
+    stats = result['stats']
+    if result['buffer'] is not None:
+        st.success(f"生成完成！共 {sum(1 for stat in stats if stat['文件'])} 个国家")
+        st.download_button(
+            label="下载 header-countries.zip / Download header-countries.zip",
+            data=result['buffer'].getvalue(),
+            file_name="header-countries.zip",
+            mime="application/zip"
+        )
+    else:
+        st.error("所有国家都生成失败，请检查上传的文件内容。 / All countries failed, please check the file content.")
+    _render_country_stats(stats)
 
-if uploaded_file is not None:
-    # 动态生成输出文件名
-    output_file = f"header-{country.replace(' ', '_')}.xlsx"
+def _render_sheets_result(result):
+    _render_log(result['log'])
+    if result.get('error'):
+        st.error(result['error'])
+        return
+    stats = result['sheet_stats']
+    if result['buffer'] is not None:
+        ok = sum(1 for stat in stats if not stat['错误'])
+        st.success(f"生成完成！共 {ok} 个工作表，总行数：{sum(stat['总行数'] for stat in stats)}")
+        st.download_button(
+            label=f"下载 {result['output_file']} / Download {result['output_file']}",
+            data=result['buffer'].getvalue(),
+            file_name=result['output_file'],
+            mime=result['mime']
+        )
+    else:
+        st.error("所有工作表都生成失败，请检查上传的文件内容。 / All sheets failed, please check the file content.")
+    st.markdown("### 各工作表结果 / Per-Sheet Results")
+    st.dataframe(pd.DataFrame([{
+        '工作表': stat['工作表'],
+        '活动数': stat['活动数'],
+        '总行数': stat['总行数'],
+        '文件': stat['文件'],
+        '耗时（秒）': round(stat['秒'], 3),
+        '错误': stat['错误'],
+    } for stat in stats]))
+
+# 预估：按规则只统计每个活动会展开成多少行，不生成行、不写文件（毫秒级）
+def _render_plan(uploaded_file, countries, reader=None, max_rows=None):
+    try:
+        df_survey = load_survey(uploaded_file, cache=survey_cache, reader=reader)
+    except SurveyError as e:
+        st.error(str(e))
+        return
+    planned = {}
+    for country in countries:
+        profile = resolve_profile(country)
+        if profile.name not in planned:
+            try:
+                planned[profile.name] = plan_rows(df_survey, profile)
+            except SurveyError as e:
+                planned[profile.name] = e
+        counter = planned[profile.name]
+        st.markdown(f"### 预估 / Dry Run：{country}")
+        if isinstance(counter, SurveyError):
+            st.error(str(counter))
+            continue
+        summary = plan_summary(counter, max_rows)
+        st.write(f"活动数 / Campaigns: {summary['活动数']}，总行数 / Total Rows: {summary['总行数']}，"
+                 f"单个活动最多 / Largest Campaign: {summary['最大活动行数']} 行")
+        st.write(f"各实体层级 / Entity Levels: {summary['实体层级']}")
+        if summary['超过上限']:
+            st.warning(f"总行数超过上限 {max_rows}，按活动边界需要拆成 {summary['拆分文件数']} 个文件 / "
+                       f"Exceeds {max_rows} rows, needs {summary['拆分文件数']} files")
+        with st.expander(f"各活动行数 / Rows per Campaign（{country}）"):
+            st.dataframe(counter.to_frame())
+
+def _submit(fn, *args, label='', unit='', **kwargs):
+    job = jobs.submit(fn, *args, label=label, unit=unit, **kwargs)
+    # 任务 id 同时记在会话和网址参数里：重跑脚本或刷新页面后都能取回结果
+    st.session_state['job_id'] = job.id
+    st.query_params['job'] = job.id
+
+if uploaded_file is not None and multi_country:
+    if st.button("生成 Header 文件 / Generate Header Files", disabled=not countries):
+        _submit(generate_countries_from_survey, _snapshot(uploaded_file), countries, reader=reader,
+                log=GenerationLog(verbose=verbose), fmt=output_format, label="header-countries.zip", unit="个国家配置")
+
+elif uploaded_file is not None and multi_sheet:
+    if st.button("生成 Header 文件 / Generate Header Files", disabled=not sheets):
+        _submit(generate_sheets_from_survey, _snapshot(uploaded_file), country, sheets, reader=reader,
+                log=GenerationLog(verbose=verbose), fmt=output_format, merge=merge_sheets,
+                label=f"{len(sheets)} 个工作表", unit="个工作表")
+
+elif uploaded_file is not None:
+    # 动态生成下载文件名
+    output_file = f"header-{country.replace(' ', '_')}{'-diff' if previous_file is not None else ''}{WRITERS[output_format][1]}"
     
     # 运行按钮
     if st.button("生成 Header 文件 / Generate Header File"):
-        with st.spinner("正在处理文件... / Processing file..."):
-            if country == "C US":
-                result = generate_header_from_survey_C(uploaded_file, output_file, country)
-            elif country in ["B US", "K US", "A US"]:
-                result = generate_header_from_survey_B(uploaded_file, output_file, country)
-            else:
-                st.error("不支持的国家选择。")
-                result = None
-            
-            if result and os.path.exists(result):
-                with open(result, "rb") as f:
-                    st.download_button(
-                        label=f"下载 {output_file} / Download {output_file}",
-                        data=f,
-                        file_name=output_file,
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                    )
-                # 调试信息
-                st.markdown("### 处理结果 / Processing Results")
-                df_result = pd.read_excel(result)
-                keyword_rows = [row for row in df_result.to_dict('records') if row['实体层级'] == '关键词']
-                st.write(f"关键词行数量 / Keyword Rows: {len(keyword_rows)}")
-                if keyword_rows:
-                    st.write(f"示例关键词行 / Example Keyword Row: 实体层级={keyword_rows[0]['实体层级']}, 关键词文本={keyword_rows[0]['关键词文本']}, 匹配类型={keyword_rows[0]['匹配类型']}")
-                product_targeting_rows = [row for row in df_result.to_dict('records') if row['实体层级'] == '商品定向']
-                st.write(f"商品定向行数量 / Product Targeting Rows: {len(product_targeting_rows)}")
-                if product_targeting_rows:
-                    st.write(f"示例商品定向行 / Example Product Targeting Row: 实体层级={product_targeting_rows[0]['实体层级']}, 竞价={product_targeting_rows[0]['竞价']}, 拓展商品投放编号={product_targeting_rows[0]['拓展商品投放编号']}")
-                levels = set(row['实体层级'] for row in df_result.to_dict('records'))
-                st.write(f"所有实体层级 / All Entity Levels: {levels}")
-            else:
-                st.error("生成文件失败，请检查上传的文件格式或内容。 / Failed to generate file, please check the file format or content.")
\ No newline at end of file
+        _submit(generate_header_from_survey, _snapshot(uploaded_file), country, reader=reader,
+                log=GenerationLog(verbose=verbose), previous_file=_snapshot(previous_file),
+                output_file=output_file, max_rows=max_rows, max_bytes=max_bytes, fmt=output_format,
+                label=output_file, unit="个活动")
+
+if uploaded_file is not None and st.button("预估行数 / Dry Run"):
+    _render_plan(uploaded_file, countries if multi_country else [country], reader=reader, max_rows=max_rows)
+
+# 当前任务：运行中显示进度和取消按钮并定时刷新，结束后渲染结果
+job = jobs.get(st.session_state.get('job_id') or st.query_params.get('job'))
+if job is not None:
+    if not job.finished:
+        st.progress(job.fraction, text=f"{job.label}：{job.status}，已处理 {job.done} / {job.total} {job.unit}")
+        if st.button("取消 / Cancel", disabled=job.cancel_requested):
+            job.cancel()
+        time.sleep(0.5)
+        st.rerun()
+    elif job.status == job.CANCELLED:
+        st.warning(f"{job.label}：已取消（已处理 {job.done} / {job.total} {job.unit}） / Cancelled")
+    elif job.status == job.FAILED:
+        st.error(f"{job.label}：生成时出错：{job.error}")
+    elif 'sheets' in job.result:
+        _render_sheets_result(job.result)
+    elif 'stats' in job.result or 'countries' in job.result:
+        _render_countries_result(job.result)
+    else:
+        _render_single_result(job.result, job.label)
@@ -0,0 +1,139 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import openpyxl
+import pandas as pd
+
+from sp_header import PROFILES, WRITERS, build_header_rows, output_formats, write_rows
+from sp_header.readers import available_readers
+from sp_header.stages import StageRecorder
+
+from .synthetic import make_survey
+
+
+# 预设规模：活动数、每个关键词列的词数、每个否定列的词数、ASIN 列数、每列 ASIN 数
+# （small / medium / large 大约生成 1 万 / 10 万 / 40 万行批量表）
+SIZES = {
+    'small': dict(n_campaigns=50, keywords_per_column=100, negatives=50, asin_columns=4, asins_per_column=20),
+    'medium': dict(n_campaigns=200, keywords_per_column=300, negatives=150, asin_columns=8, asins_per_column=100),
+    'large': dict(n_campaigns=400, keywords_per_column=500, negatives=250, asin_columns=16, asins_per_column=300),
+}
+
+
+def run_once(survey_path, country, reader, output_file, trace_memory=False, fmt='xlsx'):
+    """跑一次完整流程（读取 -> 校验 -> 分类 -> 行构建 -> 写出），返回各阶段记录。"""
+    stages = StageRecorder(trace_memory=trace_memory)
+    rows = build_header_rows(survey_path, country, reader=reader, stages=stages)
+    write_rows(rows, output_file, fmt)  # 写出阶段记录在 rows.stages（即 stages）里
+    return stages.results()
+
+
+def benchmark(survey_path, country, reader, repeat=3, memory=True, fmt='xlsx'):
+    """计时跑 repeat 次取每个阶段的最小值；memory=True 时再单独跑一次 tracemalloc 测内存峰值。"""
+    with tempfile.TemporaryDirectory() as tmp:
+        output_file = os.path.join(tmp, 'header' + WRITERS[fmt][1])
+        best = {}
+        for _ in range(repeat):
+            for record in run_once(survey_path, country, reader, output_file, fmt=fmt):
+                name = record['阶段']
+                if name not in best or record['秒'] < best[name]['秒']:
+                    best[name] = dict(record)
+        if memory:
+            for record in run_once(survey_path, country, reader, output_file, trace_memory=True, fmt=fmt):
+                best[record['阶段']]['峰值内存'] = record['峰值内存']
+    return list(best.values())
+
+
+def environment(reader, fmt='xlsx'):
+    return {
+        'python': sys.version.split()[0],
+        'pandas': pd.__version__,
+        'openpyxl': openpyxl.__version__,
+        'platform': platform.platform(),
+        'reader': reader,
+        'format': fmt,
+    }
+
+
+def compare(results, baseline_path):
+    """和基线结果逐阶段比较，打印耗时比值（>1 表示变慢）。"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {(r['配置'], r['规模名']): r for r in json.load(f)['结果']}
+    for result in results:
+        base = baseline.get((result['配置'], result['规模名']))
+        if base is None:
+            continue
+        base_stages = {s['阶段']: s for s in base['阶段']}
+        for stage in result['阶段']:
+            old = base_stages.get(stage['阶段'])
+            if old and old['秒'] > 0:
+                print(f"  {result['配置']} / {result['规模名']} / {stage['阶段']}: "
+                      f"{old['秒']:.3f}s -> {stage['秒']:.3f}s（{stage['秒'] / old['秒']:.2f}x）")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.run_benchmarks',
+        description='用合成调研表对各国家配置分阶段计时 / 测内存，结果写成 JSON。',
+    )
+    parser.add_argument('--sizes', default='small', help=f"逗号分隔的规模（可选：{', '.join(SIZES)}）")
+    parser.add_argument('--countries', default='C US,B US', help='逗号分隔的国家（见 country_profiles.json）')
+    parser.add_argument('--reader', default=None, help=f"读取引擎（可选：{', '.join(available_readers())}）")
+    parser.add_argument('--format', default='xlsx', choices=output_formats(), help='输出格式（默认 xlsx）')
+    parser.add_argument('--repeat', type=int, default=3, help='计时重复次数，取最小值')
+    parser.add_argument('--no-memory', action='store_true', help='不测内存峰值')
+    parser.add_argument('--baseline', default=None, help='基线结果 JSON，给出后打印各阶段耗时比值')
+    parser.add_argument('-o', '--output', default=None, help='结果文件（默认 benchmarks/results/bench-时间.json）')
+    args = parser.parse_args(argv)
+
+    reader = args.reader or available_readers()[0]
+    countries = [c.strip() for c in args.countries.split(',') if c.strip()]
+    for country in countries:
+        if country not in PROFILES:
+            parser.error(f"未知的国家：{country}")
+    sizes = [s.strip() for s in args.sizes.split(',') if s.strip()]
+    for size in sizes:
+        if size not in SIZES:
+            parser.error(f"未知的规模：{size}")
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            survey_path = os.path.join(tmp, f'survey-{size}.xlsx')
+            n_rows = make_survey(survey_path, **SIZES[size])
+            for country in countries:
+                stages = benchmark(survey_path, country, reader, repeat=args.repeat, memory=not args.no_memory,
+                                   fmt=args.format)
+                total = sum(stage['秒'] for stage in stages)
+                results.append({
+                    '配置': country,
+                    '规模名': size,
+                    '规模': SIZES[size],
+                    '调研表行数': n_rows,
+                    '阶段': stages,
+                    '总秒数': total,
+                })
+                detail = '，'.join(f"{stage['阶段']} {stage['秒']:.3f}s" for stage in stages)
+                print(f"[{size}] {country}: 共 {total:.3f}s（{detail}）")
+
+    output = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'results', time.strftime('bench-%Y%m%d-%H%M%S.json'))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({'生成时间': time.strftime('%Y-%m-%d %H:%M:%S'), '环境': environment(reader, args.format),
+                   '结果': results},
+                  f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {output}")
+
+    if args.baseline:
+        compare(results, args.baseline)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
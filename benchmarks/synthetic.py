@@ -0,0 +1,93 @@
+import argparse
+import random
+
+from openpyxl import Workbook
+
+
+# H-Q 关键词列（C 逻辑按列名推导类别，B 逻辑按映射取列，L / M 列为配件组兜底）
+KEYWORD_COLUMNS = [
+    'suzhu/宿主-精准词', 'suzhu/宿主-广泛词', 'case/包-精准词', 'case/包-广泛词', 'cards精准词',
+    'cards广泛词', 'acces精准词', 'acces广泛词', 'tape精准词', 'tape广泛词',
+]
+NEGATIVE_COLUMNS = ['否定精准', '否定词组', '宿主额外否精准', '宿主额外否词组', '否定ASIN']
+CATEGORIES = ['suzhu', '宿主', 'case', '包', 'cards', 'acces', 'tape', 'misc']
+MATCH_TYPES = ['精准', '广泛', 'exact', 'broad', 'asin']
+
+
+def campaign_names(n_campaigns, rng):
+    """类别 × 匹配类型轮流组合，再加编号保证名称唯一。"""
+    names = []
+    for i in range(n_campaigns):
+        category = CATEGORIES[i % len(CATEGORIES)]
+        match_type = MATCH_TYPES[(i // len(CATEGORIES)) % len(MATCH_TYPES)]
+        names.append(f"{category} {match_type} {rng.choice(['SP', 'KW', 'PT'])}-{i}")
+    return names
+
+
+def survey_columns(n_campaigns=100, keywords_per_column=200, negatives=100, asin_columns=4,
+                   asins_per_column=50, seed=0):
+    """返回 列名 -> 值列表（各列长度可以不同）。"""
+    rng = random.Random(seed)
+    names = campaign_names(n_campaigns, rng)
+    # A-G 列
+    columns = {
+        '广告活动名称': names,
+        'CPC': [round(rng.uniform(0.2, 2.0), 2) for _ in names],
+        'SKU': [f'SKU-{i}' for i in range(n_campaigns)],
+        '广告组默认竞价': [round(rng.uniform(0.2, 2.0), 2) for _ in names],
+        '预算': [rng.choice([10, 12, 20, 50]) for _ in names],
+        '备注': [],
+        '其他': [],
+    }
+    # 关键词列内不能有重复（否则校验会终止生成）
+    for col in KEYWORD_COLUMNS:
+        prefix = col.split('/')[0].replace('精准词', '').replace('广泛词', '')
+        columns[col] = [f'{prefix} {"exact" if "精准" in col else "broad"} kw {j}' for j in range(keywords_per_column)]
+    for col in NEGATIVE_COLUMNS[:4]:
+        columns[col] = [f'{col} {j}' for j in range(negatives)]
+    columns['否定ASIN'] = [f'B0NEG{j:05d}' for j in range(negatives)]
+    # C 逻辑的 ASIN 列（名称包含类别和 asin）
+    for k in range(asin_columns):
+        category = CATEGORIES[k % len(CATEGORIES)]
+        columns[f'{category} asin {k}'] = [f'B0{k:02d}{j:05d}' for j in range(asins_per_column)]
+    # B 逻辑的 ASIN 列（列名与 ASIN 活动名称完全一致）
+    for k, name in enumerate([n for n in names if ' asin ' in n][:asin_columns]):
+        columns[name] = [f'B1{k:02d}{j:05d}' for j in range(asins_per_column)]
+    return columns
+
+
+def write_survey(path, columns):
+    """按列写出调研表（openpyxl 只写模式）。"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Sheet1')
+    header = list(columns)
+    ws.append(header)
+    n_rows = max(len(values) for values in columns.values())
+    for i in range(n_rows):
+        ws.append([columns[col][i] if i < len(columns[col]) else None for col in header])
+    wb.save(path)
+    return n_rows
+
+
+def make_survey(path, **sizes):
+    return write_survey(path, survey_columns(**sizes))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='生成合成调研表（.xlsx），同时适用于 C US 和 B US 配置。')
+    parser.add_argument('output')
+    parser.add_argument('--campaigns', type=int, default=100)
+    parser.add_argument('--keywords', type=int, default=200, help='每个关键词列的关键词数')
+    parser.add_argument('--negatives', type=int, default=100, help='每个否定列的词数')
+    parser.add_argument('--asin-columns', type=int, default=4)
+    parser.add_argument('--asins', type=int, default=50, help='每个 ASIN 列的 ASIN 数')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    n_rows = make_survey(args.output, n_campaigns=args.campaigns, keywords_per_column=args.keywords,
+                         negatives=args.negatives, asin_columns=args.asin_columns,
+                         asins_per_column=args.asins, seed=args.seed)
+    print(f"已生成 {args.output}，共 {n_rows} 行")
+
+
+if __name__ == '__main__':
+    main()
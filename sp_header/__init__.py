@@ -0,0 +1,32 @@
+from .cache import SurveyCache, survey_cache
+from .collisions import CollisionIndex, find_collisions
+from .diff import CampaignState, build_diff_rows, campaign_states, diff_rows, load_previous_states
+from .engine import (
+    SurveyError,
+    build_header_rows,
+    build_rows,
+    generate_header,
+    load_survey,
+    resolve_profile,
+)
+from .fanout import fan_out, header_file_name, render_profile, run_parallel
+from .jobs import Job, JobCancelled, JobManager, jobs
+from .log import GenerationLog
+from .plan import RowCounter, plan_rows, plan_summary
+from .profiles import PROFILES, Profile, load_profiles
+from .readers import READERS, available_readers, get_reader, read_sheets, sheet_names, survey_format
+from .rows import COLUMNS, RowBuilder
+from .service import BatchService, ServiceBusy, ServiceClient
+from .shards import plan_shards, shard_rows, write_shards, write_shards_zip
+from .sheets import generate_sheets, load_sheets, sheet_file_name
+from .stages import StageRecorder, stages_to_json
+from .writer import (
+    WRITERS,
+    output_formats,
+    to_bytes,
+    to_xlsx_bytes,
+    write_csv,
+    write_parquet,
+    write_rows,
+    write_xlsx,
+)
@@ -0,0 +1,78 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+class SurveyCache:
+    """已解析调研表的 LRU 缓存，键为 (上传内容哈希, 工作表名)。
+
+    同时按条目数和 DataFrame 占用内存限制大小，超出时淘汰最久未使用的条目。
+    缓存中的 DataFrame 会被多次复用，调用方不能原地修改。
+    """
+
+    def __init__(self, max_entries=8, max_bytes=512 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, df):
+        size = int(df.memory_usage(deep=True).sum())
+        with self._lock:
+            if key in self._items:
+                self.total_bytes -= self._items.pop(key)[1]
+            self._items[key] = (df, size)
+            self.total_bytes += size
+            # 至少保留刚放入的这一条
+            while len(self._items) > 1 and (
+                len(self._items) > self.max_entries or self.total_bytes > self.max_bytes
+            ):
+                _, (_, evicted_size) = self._items.popitem(last=False)
+                self.total_bytes -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.total_bytes = 0
+
+
+def read_source_bytes(source):
+    """取出上传文件 / 文件对象 / 路径的全部字节，不改变文件对象的读取位置。"""
+    if hasattr(source, 'getvalue'):
+        return source.getvalue()
+    if hasattr(source, 'read'):
+        position = source.tell()
+        source.seek(0)
+        data = source.read()
+        source.seek(position)
+        return data
+    with open(os.fspath(source), 'rb') as f:
+        return f.read()
+
+
+def content_key(data, sheet_name=0):
+    return hashlib.sha256(data).hexdigest(), sheet_name
+
+
+# 进程内共享的默认缓存（Streamlit 每次重跑脚本时模块不会重新导入）
+survey_cache = SurveyCache()
@@ -0,0 +1,74 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+
+EXACT_MARKERS = ['精准', 'exact']
+BROAD_MARKERS = ['广泛', 'broad']
+ASIN_MARKERS = ['asin']
+HOST_MARKERS = ['suzhu', '宿主']
+
+CampaignClass = namedtuple('CampaignClass', 'category match_type is_exact is_broad is_asin is_host')
+
+
+class CampaignClassifier:
+    """把类别词和匹配类型标记编译成一个正则，一次扫描完成广告活动名称分类。
+
+    名称里同时出现多个类别时取最长的类别，长度相同取最靠前的，结果不再依赖
+    set 的迭代顺序。
+    """
+
+    def __init__(self, categories):
+        self.categories = sorted({str(c).lower() for c in categories if c}, key=lambda c: (-len(c), c))
+        roles = {}
+        for role, tokens in [('exact', EXACT_MARKERS), ('broad', BROAD_MARKERS),
+                             ('asin', ASIN_MARKERS), ('host', HOST_MARKERS)]:
+            for token in tokens:
+                roles.setdefault(token, set()).add(role)
+        for category in self.categories:
+            roles.setdefault(category, set()).add('category')
+
+        tokens = sorted(roles, key=lambda t: (-len(t), t))
+        # 同一位置只会捕获最长的词，所以每个词要带上它所有前缀词的角色
+        self._roles = {}
+        self._category = {}
+        for token in tokens:
+            prefixes = [t for t in tokens if token.startswith(t)]
+            self._roles[token] = frozenset().union(*(roles[t] for t in prefixes))
+            self._category[token] = next((t for t in prefixes if 'category' in roles[t]), None)
+        # 零宽前瞻：每个位置都尝试匹配，可以找到重叠的词
+        self._pattern = re.compile('(?=(' + '|'.join(re.escape(t) for t in tokens) + '))')
+
+    def classify(self, campaign_name):
+        name = str(campaign_name).lower()
+        found = set()
+        category = None
+        for token in self._pattern.findall(name):
+            found |= self._roles[token]
+            candidate = self._category[token]
+            if candidate and (category is None or len(candidate) > len(category)):
+                category = candidate
+        is_exact = 'exact' in found
+        is_broad = 'broad' in found
+        is_asin = 'asin' in found
+        match_type = '精准' if is_exact else '广泛' if is_broad else 'ASIN' if is_asin else None
+        return CampaignClass(category, match_type, is_exact, is_broad, is_asin, 'host' in found)
+
+    def classify_all(self, campaign_names):
+        """对整列广告活动名称分类，重复的名称只算一次。"""
+        cache = {}
+        results = []
+        for name in campaign_names:
+            if name not in cache:
+                cache[name] = self.classify(name)
+            results.append(cache[name])
+        return results
+
+
+@lru_cache(maxsize=64)
+def compiled_classifier(categories):
+    """按类别集合（frozenset）缓存编译好的分类器，同一配置和列名的重复生成直接复用。
+
+    分类器编译后只读，可以在多个线程间共用。
+    """
+    return CampaignClassifier(categories)
@@ -0,0 +1,201 @@
+import argparse
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .diff import build_diff_rows
+from .engine import SurveyError, build_header_rows, load_survey
+from .log import GenerationLog
+from .plan import plan_rows, plan_summary
+from .profiles import PROFILES
+from .readers import READERS
+from .shards import write_shards
+from .stages import StageRecorder
+from .writer import WRITERS, output_formats, write_rows
+
+
+SURVEY_EXTENSIONS = ('.xlsx', '.csv', '.parquet')
+
+
+def output_name(survey_path, country, fmt='xlsx'):
+    stem = os.path.splitext(os.path.basename(survey_path))[0]
+    return f"{stem}-header-{country.replace(' ', '_')}{WRITERS[fmt][1]}"
+
+
+def write_log(log, output_file):
+    """把日志写到输出文件旁边（同名 .log）。"""
+    with open(os.path.splitext(output_file)[0] + '.log', 'w', encoding='utf-8') as f:
+        f.write(log.text())
+
+
+def previous_file(survey_path, country, previous_dir):
+    """上一版目录中同名的调研表，或之前生成的同名批量表（任一输出格式）；都没有时返回 None。"""
+    for name in [os.path.basename(survey_path)] + [output_name(survey_path, country, fmt) for fmt in WRITERS]:
+        path = os.path.join(previous_dir, name)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def write_output(rows, output_file, max_rows=None, max_bytes=None, fmt='xlsx'):
+    """按格式写出批量表，返回 (行数, 写出的文件路径列表)。
+
+    给出行数 / 字节上限时按活动边界拆成 输出名-1、输出名-2 ...，返回的是各分片的路径。
+    """
+    if not (max_rows or max_bytes):
+        return write_rows(rows, output_file, fmt), [output_file]
+    paths = []
+    with rows.stages.stage('写出') as record:
+        # 已经在子进程里，分片在本进程依次写出
+        for name, _, data in write_shards(rows, os.path.basename(output_file), max_rows, max_bytes,
+                                          max_workers=1, fmt=fmt):
+            path = os.path.join(os.path.dirname(output_file), name)
+            with open(path, 'wb') as f:
+                f.write(data)
+            paths.append(path)
+        record['行数'] = rows.n_rows
+    return rows.n_rows, paths
+
+
+def process_survey(survey_path, country, output_dir, reader=None, verbose=False, previous_dir=None,
+                   max_rows=None, max_bytes=None, fmt='xlsx'):
+    """在子进程中处理单个调研表，返回 (输入路径, 写出的文件路径列表, 行数, 错误信息, 阶段记录)。
+
+    verbose=True 时记录逐活动明细日志，并写到输出文件旁边；previous_dir 中有上一版
+    文件时只输出变化的行；max_rows / max_bytes 给出时按活动边界拆成多个文件（返回各分片的路径）；
+    fmt 为输出格式（xlsx / csv / parquet）。
+    """
+    log = GenerationLog(verbose=verbose)
+    stages = StageRecorder()
+    output_file = os.path.join(output_dir, output_name(survey_path, country, fmt))
+    previous = previous_file(survey_path, country, previous_dir) if previous_dir else None
+    try:
+        if previous:
+            rows, _ = build_diff_rows(survey_path, previous, country, log=log, reader=reader, stages=stages)
+        else:
+            rows = build_header_rows(survey_path, country, log=log, reader=reader, stages=stages)
+        n_rows, outputs = write_output(rows, output_file, max_rows, max_bytes, fmt)
+        return survey_path, outputs, n_rows, None, stages.results()
+    except SurveyError as e:
+        return survey_path, [], 0, str(e), stages.results()
+    except Exception as e:
+        return survey_path, [], 0, f"写入文件时出错：{e}", stages.results()
+    finally:
+        if verbose:
+            write_log(log, output_file)
+
+
+def plan_survey(survey_path, country, reader=None, max_rows=None):
+    """在子进程中预估单个调研表（只统计行数，不写文件），返回 (输入路径, 预估摘要, 错误信息)。"""
+    try:
+        df_survey = load_survey(survey_path, reader=reader)
+        return survey_path, plan_summary(plan_rows(df_survey, country), max_rows), None
+    except SurveyError as e:
+        return survey_path, None, str(e)
+
+
+def run_plans(surveys, args):
+    """--dry-run：并行预估所有调研表并打印各文件的行数。"""
+    failed = 0
+    stats = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(plan_survey, path, args.country, args.reader, args.max_rows) for path in surveys]
+        for future in as_completed(futures):
+            survey_path, summary, error = future.result()
+            stats.append({'文件': survey_path, '错误': error, '预估': summary})
+            if error:
+                failed += 1
+                print(f"[失败] {survey_path}: {error}")
+                continue
+            levels = '，'.join(f"{level} {n}" for level, n in summary['实体层级'].items())
+            print(f"[预估] {survey_path}: {summary['活动数']} 个活动，总行数：{summary['总行数']}（{levels}）")
+            if summary['超过上限']:
+                print(f"       超过 --max-rows {args.max_rows}，按活动边界需要拆成 {summary['拆分文件数']} 个文件")
+    return failed, stats
+
+
+def is_output_file(name):
+    """是否是本工具生成的批量表（命令行 / 界面的输出名，含增量和拆分出的分片）。"""
+    countries = '|'.join(re.escape(country.replace(' ', '_')) for country in PROFILES)
+    stem = os.path.splitext(name)[0]
+    return re.search(rf'(^|-)header-({countries})(-diff)?(-\d+)?$', stem) is not None
+
+
+def find_surveys(input_dir):
+    """目录下的调研表；输出默认写在输入目录里，之前生成的批量表跳过，不当作调研表。"""
+    return sorted(
+        os.path.join(input_dir, name) for name in os.listdir(input_dir)
+        if name.lower().endswith(SURVEY_EXTENSIONS) and not name.startswith('~$') and not is_output_file(name)
+    )
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m sp_header',
+        description='批量处理目录下的调研表，生成 SP 批量 Header 文件。',
+    )
+    parser.add_argument('input_dir', help='调研表所在目录（*.xlsx / *.csv / *.parquet）')
+    parser.add_argument('-c', '--country', default='C US', choices=list(PROFILES),
+                        help='国家 / 店铺（默认 C US）')
+    parser.add_argument('-o', '--output-dir', default=None, help='输出目录（默认与输入目录相同；之前生成的批量表不会再被当作调研表）')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='并行进程数（默认 CPU 核数）')
+    parser.add_argument('-f', '--format', default='xlsx', choices=output_formats(),
+                        help='输出格式（默认 xlsx；Parquet 需要安装 pyarrow）')
+    parser.add_argument('--reader', default=None, choices=sorted(READERS),
+                        help='xlsx 读取引擎（默认最快的可用引擎）')
+    parser.add_argument('--previous-dir', default=None,
+                        help='上一版目录：其中有同名调研表或之前生成的批量表时，只输出新增 / 变更 / 删除的行')
+    parser.add_argument('--max-rows', type=int, default=None,
+                        help='每个输出文件最多行数，超过时按活动边界拆成多个文件（同一活动不会被拆开）')
+    parser.add_argument('--max-mb', type=float, default=None, help='每个输出文件最大 MB，超过时按活动边界拆分')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='只预估每个文件、每个活动会生成多少行（结合 --max-rows 判断是否超限），不写文件')
+    parser.add_argument('--stats', default=None, help='把每个文件的阶段耗时 / 峰值 RSS / 行数写成 JSON')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='记录逐活动明细日志，写到输出文件旁边（同名 .log）')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    output_dir = args.output_dir or args.input_dir
+    os.makedirs(output_dir, exist_ok=True)
+
+    surveys = find_surveys(args.input_dir)
+    if not surveys:
+        print(f"目录 {args.input_dir} 下没有找到调研表（.xlsx / .csv / .parquet）")
+        return 1
+
+    if args.dry_run:
+        failed, stats = run_plans(surveys, args)
+        return finish(surveys, failed, stats, args)
+
+    failed = 0
+    stats = []
+    max_bytes = int(args.max_mb * 1024 * 1024) if args.max_mb else None
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(process_survey, path, args.country, output_dir, args.reader, args.verbose, args.previous_dir,
+                               args.max_rows, max_bytes, args.format) for path in surveys]
+        for future in as_completed(futures):
+            survey_path, outputs, n_rows, error, stages = future.result()
+            seconds = sum(stage['秒'] for stage in stages)
+            stats.append({'文件': survey_path, '输出': outputs, '错误': error, '总秒数': seconds, '阶段': stages})
+            if error:
+                failed += 1
+                print(f"[失败] {survey_path}: {error}")
+            elif len(outputs) == 1:
+                print(f"[完成] {survey_path} -> {outputs[0]}，总行数：{n_rows}，耗时 {seconds:.2f}s")
+            else:
+                print(f"[完成] {survey_path} -> {len(outputs)} 个文件，总行数：{n_rows}，耗时 {seconds:.2f}s")
+                for path in outputs:
+                    print(f"       {path}")
+    return finish(surveys, failed, stats, args)
+
+
+def finish(surveys, failed, stats, args):
+    print(f"共 {len(surveys)} 个文件，成功 {len(surveys) - failed}，失败 {failed}")
+    if args.stats:
+        with open(args.stats, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, ensure_ascii=False, indent=2)
+    return 1 if failed else 0
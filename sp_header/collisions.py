@@ -0,0 +1,146 @@
+import pandas as pd
+
+
+# 否定精准会屏蔽同一活动里投放的同名关键词（任何匹配类型）
+EXACT_NEGATIVE = '否定精准匹配'
+
+COLLISION_COLUMNS = ['关键词', '匹配类型', '活动数', '广告活动']
+SELF_NEGATION_COLUMNS = ['广告活动名称', '关键词', '匹配类型', '否定关键词']
+
+
+def keyword_key(keyword):
+    """关键词比较用的键：不区分大小写，连续空白视为一个空格（和亚马逊的匹配规则一致）。"""
+    return ' '.join(str(keyword).lower().split())
+
+
+class CollisionIndex:
+    """生成结果中 (活动, 关键词, 匹配类型) 和 (活动, 否定精准词) 的哈希索引。
+
+    一次遍历所有关键词 / 否定关键词块建立索引，之后查找：同一个关键词和匹配类型被多个
+    活动投放（活动之间互相抢流量），以及活动用否定精准屏蔽了自己投放的关键词（精准词
+    完全不会展示，广泛词的同名搜索词被屏蔽）。关键词 / 否定词数组在各活动间共用，索引
+    只记数组引用、活动挂在数组上，每个共用数组只算一次键，不按行展开。
+    """
+
+    def __init__(self):
+        # (id(关键词数组), 匹配类型) -> (数组, 匹配类型, {活动: None})（dict 保持生成顺序）
+        self._targets = {}
+        # 活动 -> [(关键词数组, 匹配类型)]、活动 -> [否定精准数组]
+        self._target_blocks = {}
+        self._negative_blocks = {}
+        self._keys = {}
+        self._key_sets = {}
+        self._hits = {}
+
+    def _normalised(self, keywords):
+        key = id(keywords)
+        if key not in self._keys:
+            # 同时保存数组本身，保证 id 在建索引期间不会被复用
+            self._keys[key] = (keywords, [keyword_key(keyword) for keyword in keywords])
+        return self._keys[key][1]
+
+    def _negative_keys(self, keywords):
+        """否定词数组 -> {键: 原始否定词}，共用的数组只建一次。"""
+        key = id(keywords)
+        if key not in self._key_sets:
+            mapping = {}
+            for keyword in keywords:
+                mapping.setdefault(keyword_key(keyword), keyword)
+            self._key_sets[key] = (keywords, mapping)
+        return self._key_sets[key][1]
+
+    def add_keywords(self, campaign_name, keywords, match_type):
+        if not len(keywords):
+            return
+        entry = self._targets.setdefault((id(keywords), match_type), (keywords, match_type, {}))
+        entry[2].setdefault(campaign_name, None)
+        self._target_blocks.setdefault(campaign_name, []).append((keywords, match_type))
+
+    def add_negatives(self, campaign_name, keywords, match_type):
+        if match_type == EXACT_NEGATIVE and len(keywords):
+            self._negative_blocks.setdefault(campaign_name, []).append(keywords)
+
+    def add_rows(self, rows):
+        """加入 RowBuilder 中的关键词和否定关键词块（增量模式下 Archive 的块不算），返回自身。"""
+        for _, _, values in rows._blocks:
+            if values.get('操作') == 'Archive':
+                continue
+            level = values['实体层级']
+            if level == '关键词':
+                self.add_keywords(values['广告活动名称'], values['关键词文本'], values['匹配类型'])
+            elif level == '否定关键词':
+                self.add_negatives(values['广告活动名称'], values['关键词文本'], values['匹配类型'])
+        return self
+
+    def collisions(self, match_types=('精准',)):
+        """同一关键词、同一匹配类型被多个活动投放：每个关键词一行（活动按生成顺序）。
+
+        按不同的关键词数组建索引，开销和去重后的数组长度之和成正比，与共用数组的活动数无关。
+        """
+        index = {}
+        for keywords, match_type, campaigns in self._targets.values():
+            if match_types is not None and match_type not in match_types:
+                continue
+            for key, keyword in zip(self._normalised(keywords), keywords):
+                index.setdefault((key, match_type), []).append((keyword, campaigns))
+        records = []
+        for (_, match_type), entries in index.items():
+            if len(entries) == 1 and len(entries[0][1]) < 2:
+                continue
+            names = {}
+            for _, campaigns in entries:
+                names.update(campaigns)
+            if len(names) > 1:
+                records.append((entries[0][0], match_type, len(names), list(names)))
+        return pd.DataFrame(records, columns=COLLISION_COLUMNS)
+
+    def _self_hits(self, keywords, negative_blocks):
+        """关键词数组中被否定词数组屏蔽的 (关键词, 否定词)；同一组共用数组只比较一次。"""
+        key = (id(keywords),) + tuple(id(block) for block in negative_blocks)
+        if key not in self._hits:
+            negative_sets = [self._negative_keys(block) for block in negative_blocks]
+            hits = []
+            for normalised, keyword in zip(self._normalised(keywords), keywords):
+                for negatives in negative_sets:
+                    if normalised in negatives:
+                        hits.append((keyword, negatives[normalised]))
+                        break
+            self._hits[key] = hits
+        return self._hits[key]
+
+    def self_negations(self):
+        """活动的否定精准词和它自己投放的关键词相同：每个 (活动, 关键词, 匹配类型) 一行。"""
+        records = []
+        for campaign_name, negative_blocks in self._negative_blocks.items():
+            for keywords, match_type in self._target_blocks.get(campaign_name, ()):
+                for keyword, negative in self._self_hits(keywords, negative_blocks):
+                    records.append((campaign_name, keyword, match_type, negative))
+        return pd.DataFrame(records, columns=SELF_NEGATION_COLUMNS)
+
+
+def find_collisions(rows, log=None, match_types=('精准',), examples=5):
+    """检查生成结果中的跨活动重复关键词和自我否定，返回 {'跨活动重复': DataFrame, '自我否定': DataFrame}。
+
+    有问题时在日志里记警告和前几个示例（完整明细记为详细日志）；只提示，不终止生成。
+    """
+    index = CollisionIndex().add_rows(rows)
+    report = {'跨活动重复': index.collisions(match_types), '自我否定': index.self_negations()}
+    if log is None:
+        return report
+
+    log.section("检查跨活动关键词冲突")
+    collisions = report['跨活动重复']
+    if len(collisions):
+        log.warning("警告：%s 个关键词被多个活动以相同匹配类型投放，活动之间会互相竞争", len(collisions))
+        for i, row in enumerate(collisions.itertuples(index=False)):
+            emit = log.info if i < examples else log.debug
+            emit("  '%s'（%s）: %s", row.关键词, row.匹配类型, '、'.join(map(str, row.广告活动)))
+    negations = report['自我否定']
+    if len(negations):
+        log.warning("警告：%s 个关键词和所在活动的否定精准词相同，同名搜索词会被屏蔽", len(negations))
+        for i, row in enumerate(negations.itertuples(index=False)):
+            emit = log.info if i < examples else log.debug
+            emit("  %s: '%s'（%s）", row.广告活动名称, row.关键词, row.匹配类型)
+    if not len(collisions) and not len(negations):
+        log.info("没有跨活动重复的关键词，也没有自我否定")
+    return report
@@ -0,0 +1,267 @@
+import hashlib
+import math
+import re
+
+from .engine import SurveyError, build_header_rows, build_rows, load_survey, resolve_profile
+from .log import GenerationLog
+from .readers import text_value
+from .rows import COLUMNS, RowBuilder
+from .stages import NullStages, StageRecorder
+
+
+_COL = {col: i for i, col in enumerate(COLUMNS)}
+_ASIN_EXPRESSION = re.compile(r'^asin="(.*)"$')
+
+# 亚马逊批量表里的实体编号列；Update / Archive 行必须带上一版的编号才能被识别
+ID_COLUMNS = ['广告活动编号', '广告组编号', '广告编号', '关键词编号', '商品投放 ID']
+# 各实体层级自己的编号列
+ENTITY_ID = {
+    '广告活动': '广告活动编号',
+    '广告组': '广告组编号',
+    '商品广告': '广告编号',
+    '关键词': '关键词编号',
+    '否定关键词': '关键词编号',
+    '商品定向': '商品投放 ID',
+    '否定商品定向': '商品投放 ID',
+}
+
+
+def _cell(value):
+    """比较用的单元格值：空值为 ''，数字统一成 float，其余转成字符串。
+
+    CSV 上一版不保留单元格类型，数字样式的文本（如关键词 12345）也按数字比较。
+    """
+    if value is None or (isinstance(value, float) and value != value):
+        return ''
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    value = str(value)
+    try:
+        number = float(value)
+    except ValueError:
+        return value
+    return number if math.isfinite(number) else value
+
+
+def _key(value):
+    """识别实体用的键：按文本比较（'007' 和 '7' 是不同的关键词），空值为 ''。
+
+    存成数字的单元格（上一版批量表里的 ASIN、SKU）转成不带 .0 的文本。
+    """
+    if value is None or (isinstance(value, float) and value != value):
+        return ''
+    return text_value(value)
+
+
+def _asin(expression):
+    match = _ASIN_EXPRESSION.match(str(expression))
+    return match.group(1) if match else expression
+
+
+class CampaignState:
+    """一个广告活动在批量表里的全部实体：(实体层级, 键...) -> 原始值。
+
+    键只包含识别实体的字段（关键词文本 + 匹配类型、ASIN、SKU），竞价 / 预算等可更新的
+    字段放在值里。指纹是所有实体比较值的哈希，指纹相同的活动不再逐个实体比较。
+    上一版是从广告后台下载的批量表时，ids 记录各实体的编号列（不参与比较）；本工具生成的
+    批量表把活动名称写在活动 / 广告组编号列里，这种“编号”不算。
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.entities = {}
+        self.ids = {}
+        self.campaign_ids = {}
+        self._fingerprint = None
+
+    def _row_ids(self, row):
+        ids = {}
+        for col in ID_COLUMNS:
+            value = _key(row[_COL[col]])
+            if value and not (col in ('广告活动编号', '广告组编号') and value == _key(self.name)):
+                ids[col] = value
+        return ids
+
+    def entity_ids(self, entity):
+        """实体的编号列（列名 -> 编号），缺少的活动 / 广告组编号用活动里其他行的补上。"""
+        return dict(self.campaign_ids, **self.ids.get(entity, {}))
+
+    def add(self, row):
+        level = row[_COL['实体层级']]
+        if level == '广告活动':
+            key, raw = (), (row[_COL['每日预算']], row[_COL['投放类型']], row[_COL['竞价方案']])
+        elif level == '广告组':
+            key, raw = (), (row[_COL['广告组默认竞价']],)
+        elif level == '商品广告':
+            raw = (row[_COL['SKU']],)
+            key = (_key(raw[0]),)
+        elif level in ('关键词', '否定关键词'):
+            raw = (row[_COL['关键词文本']], row[_COL['匹配类型']], row[_COL['竞价']])
+            key = (_key(raw[0]), _key(raw[1]))
+        elif level in ('商品定向', '否定商品定向'):
+            raw = (_asin(row[_COL['拓展商品投放编号']]), row[_COL['竞价']])
+            key = (_key(raw[0]),)
+        else:
+            return
+        entity = (level,) + key
+        self.entities[entity] = raw
+        ids = self._row_ids(row)
+        if ids:
+            self.ids[entity] = ids
+            for col in ('广告活动编号', '广告组编号'):
+                if col in ids:
+                    self.campaign_ids.setdefault(col, ids[col])
+        self._fingerprint = None
+
+    def fingerprint(self):
+        if self._fingerprint is None:
+            items = sorted(repr((entity, tuple(_cell(v) for v in raw))) for entity, raw in self.entities.items())
+            self._fingerprint = hashlib.sha1('\n'.join(items).encode('utf-8')).hexdigest()
+        return self._fingerprint
+
+
+def campaign_states(rows):
+    """把批量表行（按 COLUMNS 顺序的元组）汇总成 活动名称 -> CampaignState（保持活动顺序）。
+
+    操作为 Archive 的行视为已删除，不计入状态。
+    """
+    states = {}
+    for row in rows:
+        if str(row[_COL['操作']]).lower() == 'archive':
+            continue
+        name = row[_COL['广告活动名称']]
+        key = _cell(name)
+        if key == '':
+            continue
+        if key not in states:
+            states[key] = CampaignState(name)
+        states[key].add(row)
+    return states
+
+
+def load_previous_states(source, country, sheet_name=0, log=None, stages=None):
+    """读取上一版文件并汇总成活动状态。
+
+    source 可以是上一版调研表（按同一国家配置重新生成）或之前生成的批量表
+    （表头含“实体层级”列）。批量表要读取全部列，所以固定使用 openpyxl 引擎。
+    """
+    log = log or GenerationLog()
+    stages = stages or NullStages()
+    with stages.stage('读取上一版') as record:
+        try:
+            df_previous = load_survey(source, sheet_name=sheet_name, reader='openpyxl')
+            if '实体层级' in df_previous.columns:
+                log.info("上一版为批量表，共 %s 行", len(df_previous))
+                rows = df_previous.reindex(columns=COLUMNS).itertuples(index=False, name=None)
+            else:
+                log.info("上一版为调研表，按相同国家配置重新生成后比较")
+                rows = build_rows(df_previous, country, log=GenerationLog()).iter_rows()
+        except SurveyError as e:
+            raise SurveyError(f"上一版文件：{e}")
+        states = campaign_states(rows)
+        record['行数'] = len(df_previous)
+    return states
+
+
+def _emit(rows, name, entity, raw, operation, ids=None):
+    """写出一个实体行；ids 为上一版的编号列，写在同一行里。"""
+    level = entity[0]
+    if level == '广告活动':
+        rows.campaign(name, raw[0], raw[1], raw[2], operation=operation)
+    elif level == '广告组':
+        rows.ad_group(name, raw[0], operation=operation)
+    elif level == '商品广告':
+        rows.product_ad(name, raw[0], operation=operation)
+    elif level == '关键词':
+        rows.keywords(name, (raw[0],), raw[2], raw[1], operation=operation)
+    elif level == '否定关键词':
+        rows.negative_keywords(name, (raw[0],), raw[1], operation=operation)
+    elif level == '商品定向':
+        rows.product_targets(name, (raw[0],), raw[1], operation=operation)
+    elif level == '否定商品定向':
+        rows.negative_product_targets(name, (raw[0],), operation=operation)
+    rows.set_ids(ids)
+
+
+def diff_rows(new_rows, previous_states, log=None):
+    """新生成的 RowBuilder 和上一版活动状态比较，只输出变化的行。
+
+    新活动整块复制（Create）；已有活动里新增的实体为 Create，消失的为 Archive，
+    预算 / 竞价 / 投放设置变化的为 Update；上一版有、新版没有的活动整体 Archive。
+    Update / Archive 行写入上一版批量表里的实体编号，已有活动里的 Create 行写入活动和广告组
+    编号；上一版没有编号（调研表或本工具生成的批量表）时这些行亚马逊无法识别，记警告并在
+    统计的“缺少编号”里给出行数。返回 (RowBuilder, 统计)。
+    """
+    log = log or GenerationLog()
+    stages = new_rows.stages or StageRecorder()
+    with stages.stage('增量比较') as record:
+        rows, stats = _diff_rows(new_rows, previous_states, log)
+        record['行数'] = rows.n_rows
+    rows.stages = stages
+    # 关键词冲突针对完整的生成结果，增量输出沿用
+    rows.collisions = new_rows.collisions
+    return rows, stats
+
+
+def _diff_rows(new_rows, previous_states, log):
+    new_states = campaign_states(new_rows.iter_rows())
+    rows = RowBuilder(product=new_rows.product, operation=new_rows.operation, status=new_rows.status)
+    stats = {'新增活动': 0, '变更活动': 0, '未变活动': 0, '删除活动': 0, '缺少编号': 0}
+
+    def emit(state, entity, raw, operation):
+        ids = state.entity_ids(entity)
+        if operation == 'Create':
+            ids = {col: ids[col] for col in ('广告活动编号', '广告组编号') if col in ids}
+        elif ENTITY_ID[entity[0]] not in ids:
+            stats['缺少编号'] += 1
+        _emit(rows, state.name, entity, raw, operation, ids)
+
+    created = set()
+    for key, state in new_states.items():
+        old = previous_states.get(key)
+        if old is None:
+            created.add(state.name)
+            stats['新增活动'] += 1
+            continue
+        if old.fingerprint() == state.fingerprint():
+            stats['未变活动'] += 1
+            continue
+        stats['变更活动'] += 1
+        log.debug("变更活动: %s", state.name)
+        for entity, raw in state.entities.items():
+            old_raw = old.entities.get(entity)
+            if old_raw is None:
+                emit(old, entity, raw, 'Create')
+            elif tuple(map(_cell, old_raw)) != tuple(map(_cell, raw)):
+                emit(old, entity, raw, 'Update')
+        for entity, raw in old.entities.items():
+            if entity not in state.entities:
+                emit(old, entity, raw, 'Archive')
+
+    # 新活动直接复用新生成结果里的块，行顺序和完整生成时一致
+    rows.extend_campaigns(new_rows, created)
+
+    for key, old in previous_states.items():
+        if key not in new_states:
+            stats['删除活动'] += 1
+            emit(old, ('广告活动',), old.entities.get(('广告活动',), ('', '', '')), 'Archive')
+
+    log.info("增量比较：新增 %s 个活动，变更 %s 个，未变 %s 个，删除 %s 个",
+             stats['新增活动'], stats['变更活动'], stats['未变活动'], stats['删除活动'])
+    if stats['缺少编号']:
+        log.warning("警告：%s 行 Update / Archive 没有上一版的实体编号，亚马逊无法识别这些行。"
+                    "请用从广告后台下载的批量表（含广告活动编号、关键词编号等列）作为上一版。",
+                    stats['缺少编号'])
+    log.info("增量输出行数：%s", rows.n_rows)
+    return rows, stats
+
+
+def build_diff_rows(source, previous, country, sheet_name=0, log=None, reader=None, stages=None, progress=None):
+    """无界面增量生成入口：新调研表 + 上一版文件（调研表或批量表），返回 (RowBuilder, 统计)。"""
+    log = log or GenerationLog()
+    stages = stages or StageRecorder()
+    profile = resolve_profile(country)
+    previous_states = load_previous_states(previous, profile, log=log, stages=stages)
+    new_rows = build_header_rows(source, profile, sheet_name=sheet_name, log=log, reader=reader, stages=stages,
+                                 progress=progress)
+    return diff_rows(new_rows, previous_states, log=log)
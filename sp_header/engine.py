@@ -0,0 +1,270 @@
+import io
+
+import pandas as pd
+
+from .cache import content_key, read_source_bytes
+from .classifier import compiled_classifier
+from .collisions import find_collisions
+from .index import AsinColumnIndex, KeywordColumns, KeywordIndex, NegativeBlocks
+from .log import GenerationLog
+from .profiles import PROFILES, Profile
+from .readers import UnsupportedFormat, get_reader, survey_format
+from .rows import RowBuilder
+from .stages import StageRecorder
+from .validation import NEGATIVE_COLUMNS, find_duplicates
+
+
+class SurveyError(Exception):
+    """调研表无法生成 Header（读取失败或校验未通过）。"""
+
+
+def load_survey(source, sheet_name=0, cache=None, reader=None):
+    """读取调研表；source 可以是路径、文件对象或已经读好的 DataFrame。
+
+    reader 选择读取引擎（见 readers.READERS，默认用最快的可用引擎，只读取规则
+    用到的列）。CSV / Parquet 调研表按扩展名或文件头识别，不受 reader 影响。
+    传入 cache（SurveyCache）时按文件内容哈希、工作表名和引擎复用已解析的结果。
+    """
+    if isinstance(source, pd.DataFrame):
+        return source
+    get_reader(reader)  # 引擎名错误直接报出，不当作读取失败
+    try:
+        if cache is None:
+            read = get_reader(reader, survey_format(source))
+            return read(source, sheet_name=sheet_name)
+        data = read_source_bytes(source)
+        read = get_reader(reader, survey_format(source, data))
+        key = content_key(data, sheet_name) + (getattr(read, '__name__', repr(read)),)
+        df_survey = cache.get(key)
+        if df_survey is None:
+            df_survey = read(io.BytesIO(data), sheet_name=sheet_name)
+            cache.put(key, df_survey)
+        return df_survey
+    except UnsupportedFormat as e:
+        raise SurveyError(str(e))
+    except FileNotFoundError:
+        raise SurveyError("错误：无法读取上传的文件。请确保文件格式正确。")
+    except Exception as e:
+        raise SurveyError(f"读取文件时出错：{e}")
+
+
+def check_duplicates(df_survey, keyword_columns, log):
+    """关键词列和否定列一次性查重。
+
+    关键词列（H-Q）有重复时终止生成；否定列重复只提示，生成时会自动去重。
+    返回完整的重复报告（列号、列名、关键词、次数）。
+    """
+    keyword_columns = list(keyword_columns)
+    negative_columns = [col for col in NEGATIVE_COLUMNS if col not in keyword_columns]
+    report = find_duplicates(df_survey, keyword_columns + negative_columns)
+    is_negative = report['列名'].isin(negative_columns)
+
+    log.section("检查关键词重复")
+    for (letter, col), group in report[~is_negative].groupby(['列号', '列名'], sort=False):
+        log.warning("警告：%s 列 (%s) 有重复关键词", letter, col)
+        # 关键词重复会终止生成，重复词要让用户看到，记为摘要
+        for kw, count in zip(group['关键词'], group['次数']):
+            log.info("  重复词: '%s' (出现 %s 次)", kw, count)
+    if (~is_negative).any():
+        raise SurveyError("提示：由于检测到关键词重复，生成已终止。请清理重复关键词后重试。")
+    log.info("关键词无重复，继续生成...")
+
+    log.section("检查否定关键词重复")
+    for col, group in report[is_negative].groupby('列名', sort=False):
+        log.warning("警告：'%s' 列有 %s 个重复关键词（已自动去重）", col, len(group))
+        if log.verbose:
+            for kw, count in zip(group['关键词'], group['次数']):
+                log.debug("  重复词: '%s' (出现 %s 次)", kw, count)
+    if not is_negative.any():
+        log.info("否定关键词无重复，继续生成...")
+    return report
+
+
+def resolve_profile(profile):
+    """profile 可以是 Profile 或国家名（见 profiles.PROFILES）。"""
+    if isinstance(profile, Profile):
+        return profile
+    if profile not in PROFILES:
+        raise SurveyError("不支持的国家选择。")
+    return PROFILES[profile]
+
+
+def campaign_values(df_survey, log):
+    """活动名称列表（保留重复）和 活动 -> CPC/SKU/广告组默认竞价/预算 的映射。"""
+    if '广告活动名称' not in df_survey.columns:
+        raise SurveyError("调研表缺少“广告活动名称”列，请检查表头。")
+    unique_campaigns = [name for name in df_survey['广告活动名称'].dropna() if str(name).strip()]
+    log.info("独特活动名称数量: %s", len(unique_campaigns))
+    log.debug("活动名称列表: %s", unique_campaigns)
+
+    non_empty_campaigns = df_survey[
+        df_survey['广告活动名称'].notna() &
+        (df_survey['广告活动名称'] != '')
+    ]
+    required_cols = ['CPC', 'SKU', '广告组默认竞价', '预算']
+    if all(col in non_empty_campaigns.columns for col in required_cols):
+        campaign_to_values = non_empty_campaigns.drop_duplicates(
+            subset='广告活动名称', keep='first'
+        ).set_index('广告活动名称')[required_cols].to_dict('index')
+    else:
+        campaign_to_values = {}
+        log.warning("警告：缺少列 %s，使用默认值", set(required_cols) - set(non_empty_campaigns.columns))
+
+    log.info("生成的字典（有 %s 个活动）", len(campaign_to_values))
+    log.debug("活动参数字典: %s", campaign_to_values)
+    return unique_campaigns, campaign_to_values
+
+
+def build_rows(df_survey, profile, log=None, stages=None, progress=None, rows=None):
+    """按国家配置（执行计划）生成批量表行，返回 RowBuilder。
+
+    所有国家共用这一个引擎：配置只决定类别来源、取哪些关键词列、默认值、
+    否定词策略和商品定向规则，索引和共享词块对每个配置都一样生效。
+    校验 / 分类 / 行构建 三个阶段的耗时、峰值 RSS 和行数记录在 stages（StageRecorder，
+    不传时新建一个）里，并挂到返回的 RowBuilder.stages 上，写出时继续记录。
+    progress(已处理活动数, 活动总数) 在每个活动处理完后调用，回调抛出异常即中止生成。
+    rows 是收集行的对象，默认新建 RowBuilder；预估时传入只计数的 plan.RowCounter。
+    生成后检查跨活动重复的关键词和自我否定（见 collisions），结果挂到 RowBuilder.collisions 上。
+    """
+    profile = resolve_profile(profile)
+    log = log or GenerationLog()
+    stages = stages or StageRecorder()
+    log.info("成功读取文件，数据形状：%s", df_survey.shape)
+    log.info("国家配置：%s", profile.name)
+    log.debug("列名列表: %s", list(df_survey.columns))
+
+    with stages.stage('校验'):
+        unique_campaigns, campaign_to_values = campaign_values(df_survey, log)
+
+        keyword_columns = df_survey.columns[profile.keyword_columns]
+        log.debug("关键词列: %s", list(keyword_columns))
+
+        check_duplicates(df_survey, keyword_columns, log)
+
+        # 通用否定词块（去重后只算一次，所有活动共用）
+        negatives = NegativeBlocks(df_survey)
+
+    with stages.stage('分类'):
+        # 类别按最长优先编译成一个匹配器（按类别集合缓存），一次性给所有活动分类
+        classifier = compiled_classifier(frozenset(profile.categories(keyword_columns)))
+        log.info("识别到的关键词类别: %s", classifier.categories)
+        campaign_classes = classifier.classify_all(unique_campaigns)
+
+    with stages.stage('行构建') as record:
+        # 关键词列清洗 / 合并结果、列解析和 ASIN 列索引只算一次，所有活动共用
+        keyword_index = KeywordIndex(df_survey, keyword_columns)
+        columns = KeywordColumns(df_survey, keyword_columns, profile.keyword_mode, profile.keyword_map)
+        asin_index = AsinColumnIndex(df_survey.columns) if profile.product_target_mode == 'best_column' else None
+        rows = RowBuilder() if rows is None else rows
+        rows.stages = stages
+
+        total = len(unique_campaigns)
+        if progress is not None:
+            progress(0, total)
+        for done, (campaign_name, campaign_class) in enumerate(zip(unique_campaigns, campaign_classes), 1):
+            values = campaign_to_values.get(campaign_name, profile.defaults)
+            cpc = values['CPC']
+            sku = values['SKU']
+            group_bid = values['广告组默认竞价']
+            daily_budget = values['预算']
+
+            is_exact, is_broad, is_asin, is_host = campaign_class[2:]
+            match_type = campaign_class.match_type
+            match_types, policy = profile.plan(is_exact, is_broad)
+            log.debug("处理活动: %s", campaign_name)
+            log.debug("  is_exact: %s, is_broad: %s, is_asin: %s, match_type: %s", is_exact, is_broad, is_asin, match_type)
+
+            # 关键词列：先按类别取，取不到时落到兜底组（如配件组的 L / M 列）
+            matched_category = campaign_class.category
+            matched_columns = columns.columns([matched_category], match_types) if matched_category else []
+            if not matched_columns and match_types and profile.fallback_category:
+                matched_category = profile.fallback_category
+                matched_columns = columns.columns([matched_category], match_types)
+            log.debug("  匹配的关键词类别: %s", matched_category)
+
+            keywords = keyword_index.merged(matched_columns)  # 去重
+            if matched_columns:
+                log.debug("  匹配的列: %s", matched_columns)
+                log.debug("  关键词数量: %s (示例: %s)", len(keywords), keywords[:2] or '无')
+            else:
+                log.debug("  无匹配的关键词列，关键词为空")
+
+            rows.campaign(campaign_name, daily_budget, profile.targeting_type, profile.bidding_strategy)
+            rows.ad_group(campaign_name, group_bid)
+            rows.product_ad(campaign_name, sku)
+
+            if match_types:
+                rows.keywords(campaign_name, keywords, cpc, match_type)
+
+            # 否定关键词：通用否定 + （按策略）同类别精准词 + 宿主额外否定，合并结果按键共用
+            if policy is not None:
+                exact_kws = ()
+                if policy.add_exact_keywords and matched_category:
+                    categories = [matched_category] + (policy.host_exact_categories if is_host else [])
+                    exact_kws = keyword_index.merged(columns.columns(categories, ['精准']))
+                    log.debug("  添加 %s 个精准词作为否定精准词", len(exact_kws))
+                merge_host = is_host and policy.host == 'merge'
+                neg_exact = negatives.merged(
+                    ('否定精准', policy.match_type, matched_category, is_host),
+                    negatives.exact, exact_kws, negatives.host_exact if merge_host else ())
+                neg_phrase = negatives.merged(
+                    ('否定词组', policy.match_type, is_host),
+                    negatives.phrase, negatives.host_phrase if merge_host else ())
+                log.debug("  否定精准关键词数量: %s (示例: %s)", len(neg_exact), neg_exact[:2] or '无')
+
+                rows.negative_keywords(campaign_name, neg_exact, '否定精准匹配')
+                rows.negative_keywords(campaign_name, neg_phrase, '否定词组')
+                if is_host and policy.host == 'separate':
+                    rows.negative_keywords(campaign_name, negatives.host_exact, '否定精准匹配')
+                    rows.negative_keywords(campaign_name, negatives.host_phrase, '否定词组')
+
+            if is_asin:
+                asin_targets = ()
+                if profile.product_target_mode == 'best_column':
+                    # 名称包含类别的 ASIN 列中，列名词与活动名称重合最多的列
+                    if campaign_class.category and asin_index.candidates(campaign_class.category):
+                        best_col, best_score = asin_index.best_column(campaign_class.category, str(campaign_name).lower())
+                        log.debug("  选择最佳列: %s (分数: %s, 独特词: %s)", best_col, best_score, asin_index.words[best_col])
+                        asin_targets = keyword_index.unique_keywords(best_col)
+                elif campaign_name in df_survey.columns:
+                    # 列名必须与广告活动名称完全一致
+                    asin_targets = keyword_index.unique_keywords(campaign_name)
+                    log.debug("  找到与活动名称完全匹配的列: %s", campaign_name)
+                else:
+                    log.debug("  未找到与活动名称完全匹配的列: %s", campaign_name)
+                log.debug("  ASIN 数量: %s (示例: %s)", len(asin_targets), asin_targets[:2] or '无')
+
+                rows.product_targets(campaign_name, asin_targets, cpc)
+                if profile.negative_asin:
+                    rows.negative_product_targets(campaign_name, negatives.asin)
+
+            if progress is not None:
+                progress(done, total)
+
+        record['行数'] = rows.n_rows
+
+    if isinstance(rows, RowBuilder):
+        with stages.stage('冲突检查'):
+            # 跨活动重复的关键词和自我否定只提示，不终止生成
+            rows.collisions = find_collisions(rows, log)
+
+    return rows
+
+
+def build_header_rows(source, country, sheet_name=0, log=None, reader=None, stages=None, progress=None):
+    """无界面生成入口：读取调研表并返回按实体块收集的 RowBuilder（可流式写出）。"""
+    profile = resolve_profile(country)
+    stages = stages or StageRecorder()
+    with stages.stage('读取') as record:
+        df_survey = load_survey(source, sheet_name=sheet_name, reader=reader)
+        record['行数'] = len(df_survey)
+    return build_rows(df_survey, profile, log=log, stages=stages, progress=progress)
+
+
+def generate_header(source, country, sheet_name=0, log=None, reader=None, categorical=False):
+    """无界面生成入口：读取调研表并返回批量表 DataFrame。
+
+    categorical=True 时各列为 category 类型（几十万行的结果内存约为对象列的 1/6）。
+    """
+    rows = build_header_rows(source, country, sheet_name=sheet_name, log=log, reader=reader)
+    return rows.to_frame(categorical=categorical)
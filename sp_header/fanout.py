@@ -0,0 +1,113 @@
+import io
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+
+from .engine import SurveyError, build_rows, resolve_profile
+from .log import GenerationLog
+from .writer import WRITERS, to_bytes
+
+
+def header_file_name(country, fmt='xlsx'):
+    return f"header-{country.replace(' ', '_')}{WRITERS[fmt][1]}"
+
+
+def render_profile(df_survey, profile, verbose=False, fmt='xlsx'):
+    """（在工作进程中）按一个国家配置生成并写出批量表（fmt 为输出格式）。
+
+    返回 (文件字节, 结果摘要, 日志记录, 错误信息)，都可以跨进程传回。
+    """
+    log = GenerationLog(verbose=verbose)
+    try:
+        rows = build_rows(df_survey, profile, log=log)
+        data = to_bytes(rows, fmt).getvalue()
+    except SurveyError as e:
+        return None, None, log.records, str(e)
+    return data, rows.summary(), log.records, None
+
+
+@lru_cache(maxsize=None)
+def process_context():
+    """进程池的启动方式：forkserver（没有时用 spawn），不直接 fork。
+
+    调用方是多线程进程（Streamlit 服务器、JobManager 的后台线程），fork 会把其他线程
+    持有的锁（SurveyCache、logging 等）原样复制进子进程，工作进程可能卡死。forkserver
+    从一个预先导入了引擎的单线程进程派生工作进程，不继承这些锁。
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(['sp_header.engine', 'sp_header.writer'])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+def run_parallel(fn, args_list, max_workers=None, progress=None):
+    """按顺序返回每组参数调用 fn(*args) 的结果。
+
+    多个任务时在进程池中并行（fn 和参数要能跨进程传递）；只有一个任务或单核时直接在
+    本进程里运行，省掉进程启动和传输 DataFrame 的开销。progress(已完成数, 总数) 每完成
+    一个任务调用一次，回调抛出异常时取消还没开始的任务。工作进程用 process_context() 启动，
+    调用的脚本需要 if __name__ == '__main__' 保护（Streamlit 和命令行入口已满足）。
+    """
+    progress = progress or (lambda done, total: None)
+    total = len(args_list)
+    progress(0, total)
+    workers = min(total, max_workers or os.cpu_count() or 1)
+    if workers <= 1:
+        results = []
+        for args in args_list:
+            results.append(fn(*args))
+            progress(len(results), total)
+        return results
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=process_context())
+    try:
+        futures = [pool.submit(fn, *args) for args in args_list]
+        for done, _ in enumerate(as_completed(futures), 1):
+            progress(done, total)
+        return [future.result() for future in futures]
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def fan_out(df_survey, countries, log=None, max_workers=None, verbose=False, progress=None, fmt='xlsx'):
+    """同一份已解析的调研表按多个国家生成，返回 (ZIP 缓冲区或 None, 各国家统计)。
+
+    使用同一个国家配置的国家（如 B / K / A US）只生成一次，共用同一份文件内容；
+    不同配置在进程池中并行生成。ZIP 里每个国家一个 Header 文件（xlsx / Parquet
+    本身已压缩，直接存储；CSV 压缩存储）。progress(已完成配置数, 配置总数) 在每个
+    配置完成后调用，回调抛出异常时取消还没开始的配置。
+    """
+    log = log or GenerationLog(verbose=verbose)
+    groups = {}
+    for country in countries:
+        profile = resolve_profile(country)
+        groups.setdefault(id(profile), (profile, []))[1].append(country)
+    tasks = list(groups.values())
+
+    results = run_parallel(render_profile, [(df_survey, profile, verbose, fmt) for profile, _ in tasks],
+                           max_workers, progress)
+
+    stats = []
+    buffer = io.BytesIO()
+    compression = zipfile.ZIP_DEFLATED if fmt == 'csv' else zipfile.ZIP_STORED
+    with zipfile.ZipFile(buffer, 'w', compression=compression) as archive:
+        for (profile, group), (data, summary, records, error) in zip(tasks, results):
+            log.section(f"{profile.name}（{', '.join(group)}）")
+            log.records.extend(records)
+            if error:
+                log.warning(error)
+            for country in group:
+                stat = {'国家': country, '配置': profile.name, '文件': None, '总行数': 0, '秒': 0.0, '错误': error}
+                if data is not None:
+                    stat['文件'] = header_file_name(country, fmt)
+                    stat['总行数'] = summary['总行数']
+                    stat['秒'] = sum(stage['秒'] for stage in summary['阶段'])
+                    archive.writestr(stat['文件'], data)
+                stats.append(stat)
+
+    if not any(stat['文件'] for stat in stats):
+        return None, stats
+    buffer.seek(0)
+    return buffer, stats
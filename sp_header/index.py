@@ -0,0 +1,180 @@
+import re
+
+from .validation import non_blank
+
+
+MATCH_MARKERS = {
+    '精准': ['精准', 'exact'],
+    '广泛': ['广泛', 'broad'],
+}
+
+
+def merge_unique(*blocks):
+    """按顺序拼接多个关键词块并去重，返回不可变的 tuple。"""
+    merged = {}
+    for block in blocks:
+        merged.update(dict.fromkeys(block))
+    return tuple(merged)
+
+
+class KeywordIndex:
+    """每份调研表建一次的关键词索引，所有广告活动共用。
+
+    列的清洗结果（去空值、去空白）只算一次；合并去重后的关键词块以 tuple 缓存，
+    各广告活动直接引用同一个块。
+    """
+
+    def __init__(self, df_survey, keyword_columns):
+        self.df_survey = df_survey
+        self.keyword_columns = list(keyword_columns)
+        self._column_keywords = {}
+        self._merged = {}
+
+    def column_keywords(self, col):
+        """某一列清洗后的关键词（保留原始值和顺序，不去重）。"""
+        if col not in self._column_keywords:
+            self._column_keywords[col] = non_blank(self.df_survey[col]).tolist()
+        return self._column_keywords[col]
+
+    def merged(self, columns):
+        """多列关键词按列顺序拼接后去重（按列组合缓存）。"""
+        key = tuple(columns)
+        if key not in self._merged:
+            self._merged[key] = merge_unique(*(self.column_keywords(col) for col in columns))
+        return self._merged[key]
+
+    def unique_keywords(self, col):
+        """某一列清洗并去重后的关键词。"""
+        return self.merged([col])
+
+
+class KeywordColumns:
+    """把 (类别, 匹配类型) 解析成调研表中的关键词列，每份调研表建一次，结果按参数缓存。
+
+    match 模式：关键词列（H-Q）中名称包含任一类别、且包含任一匹配类型标记的列；
+    map 模式：按国家配置里的 类别 -> {匹配类型: 列名 / 列序号} 映射取列，表中没有的列跳过。
+    """
+
+    def __init__(self, df_survey, keyword_columns, mode='match', mapping=None):
+        self.mode = mode
+        self.keyword_columns = list(keyword_columns)
+        self._lower = {col: str(col).lower() for col in self.keyword_columns}
+        self._map = {}
+        for category, columns in (mapping or {}).items():
+            resolved = {}
+            for match_type, col in columns.items():
+                # 整数为列序号（0 开始），例如配件组兜底用的 L / M 列
+                if isinstance(col, int):
+                    col = df_survey.columns[col] if col < len(df_survey.columns) else None
+                if col is not None and col in df_survey.columns:
+                    resolved[match_type] = col
+            self._map[category] = resolved
+        self._resolved = {}
+
+    def columns(self, categories, match_types):
+        """按列顺序（match 模式）或类别、匹配类型顺序（map 模式）返回去重后的列。"""
+        key = (tuple(categories), tuple(match_types))
+        if key not in self._resolved:
+            if self.mode == 'match':
+                markers = [x for match_type in match_types for x in MATCH_MARKERS[match_type]]
+                columns = [col for col in self.keyword_columns
+                           if any(category in self._lower[col] for category in categories)
+                           and any(x in self._lower[col] for x in markers)]
+            else:
+                columns = []
+                for category in categories:
+                    for match_type in match_types:
+                        col = self._map.get(category, {}).get(match_type)
+                        if col is not None and col not in columns:
+                            columns.append(col)
+            self._resolved[key] = columns
+        return self._resolved[key]
+
+
+class NegativeBlocks:
+    """通用否定词块：每份调研表只清洗、去重一次，存成不可变的 tuple。
+
+    各组别需要的合并结果（通用否定 + 对应精准词 + 宿主额外否定）按调用方给的
+    键缓存，相同 (类别, 是否宿主) 的广告活动共用同一个块，不再各自复制列表。
+    """
+
+    def __init__(self, df_survey):
+        self.exact = self._column(df_survey, '否定精准')
+        self.phrase = self._column(df_survey, '否定词组')
+        self.host_exact = self._column(df_survey, '宿主额外否精准')
+        self.host_phrase = self._column(df_survey, '宿主额外否词组')
+        self.asin = self._column(df_survey, '否定ASIN')
+        self._merged = {}
+
+    @staticmethod
+    def _column(df_survey, col):
+        if col not in df_survey.columns:
+            return ()
+        return merge_unique(non_blank(df_survey[col]).tolist())
+
+    def merged(self, key, *blocks):
+        """合并多个块并去重，结果按 key 缓存。"""
+        if key not in self._merged:
+            self._merged[key] = merge_unique(*blocks)
+        return self._merged[key]
+
+
+ASIN_STOP_WORDS = ['asin', '精准', '广泛', 'exact', 'broad']
+
+
+class AsinColumnIndex:
+    """C 逻辑 ASIN 列索引：列名分词和 词 -> 列 的倒排表每份调研表只建一次。
+
+    选列规则不变：候选列为名称同时包含类别和 asin 的列；列名里的每个词只要
+    出现在广告活动名称中就加 1 分；取分数最高的列，同分取靠前的列。
+    """
+
+    def __init__(self, columns):
+        self.columns = [col for col in columns if 'asin' in str(col).lower()]
+        self._lower = {col: str(col).lower() for col in self.columns}
+        self.words = {}
+        self._postings = {}
+        for col in self.columns:
+            words = re.split(r'[\s/:-]+', self._lower[col])
+            self.words[col] = [w.strip() for w in words if w.strip() and w not in ASIN_STOP_WORDS]
+            for word in self.words[col]:
+                postings = self._postings.setdefault(word, {})
+                postings[col] = postings.get(col, 0) + 1
+        tokens = sorted(self._postings, key=lambda w: (-len(w), w))
+        # 前瞻在同一位置只捕获最长的词，所以每个词要带上它的所有前缀词
+        self._prefixes = {w: [t for t in tokens if w.startswith(t)] for w in tokens}
+        self._pattern = re.compile('(?=(' + '|'.join(re.escape(w) for w in tokens) + '))') if tokens else None
+        self._candidates = {}
+        self._resolved = {}
+
+    def candidates(self, category):
+        """名称包含类别的 ASIN 列（保持原列顺序）。"""
+        if category not in self._candidates:
+            self._candidates[category] = [col for col in self.columns if category in self._lower[col]]
+        return self._candidates[category]
+
+    def scores(self, category, campaign_name_normalized):
+        """候选列 -> 分数；广告活动名称只扫描一次，通过倒排表累加分数。"""
+        scores = dict.fromkeys(self.candidates(category), 0)
+        if self._pattern is None or not scores:
+            return scores
+        found = set()
+        for token in self._pattern.findall(campaign_name_normalized):
+            found.update(self._prefixes[token])
+        for word in found:
+            for col, count in self._postings[word].items():
+                if col in scores:
+                    scores[col] += count
+        return scores
+
+    def best_column(self, category, campaign_name_normalized):
+        """返回 (最佳列, 分数)，没有候选列时返回 (None, 0)。"""
+        key = (category, campaign_name_normalized)
+        if key not in self._resolved:
+            scores = self.scores(category, campaign_name_normalized)
+            if scores:
+                best_col = max(scores, key=scores.get)
+                self._resolved[key] = (best_col, scores[best_col])
+            else:
+                self._resolved[key] = (None, 0)
+        return self._resolved[key]
@@ -0,0 +1,109 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobCancelled(Exception):
+    """任务被用户取消（在下一次进度回调时抛出）。"""
+
+
+class Job:
+    """一个后台生成任务：状态、进度（已处理 / 总数）、结果或错误。
+
+    进度通过 job.progress(done, total) 回调更新，回调时如果已请求取消就抛出 JobCancelled，
+    生成在下一个活动处停止。
+    """
+
+    QUEUED, RUNNING, DONE, FAILED, CANCELLED = '排队中', '运行中', '已完成', '失败', '已取消'
+
+    def __init__(self, label='', unit=''):
+        self.id = uuid.uuid4().hex
+        self.label = label
+        self.unit = unit
+        self.status = self.QUEUED
+        self.done = 0
+        self.total = 0
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished_at = None
+        self._cancel = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in (self.DONE, self.FAILED, self.CANCELLED)
+
+    @property
+    def fraction(self):
+        return self.done / self.total if self.total else 0.0
+
+    def progress(self, done, total):
+        if self._cancel.is_set():
+            raise JobCancelled()
+        self.done, self.total = done, total
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+
+class JobManager:
+    """进程内共享的后台任务池：最多 max_workers 个任务同时运行，其余排队。
+
+    任务按 id 保存在内存里，与 Streamlit 会话无关，重跑脚本或刷新页面后凭 id 取回结果；
+    多个用户共用同一个池。结束超过 keep_seconds 的任务会被清理。
+    """
+
+    def __init__(self, max_workers=2, keep_seconds=3600):
+        self.keep_seconds = keep_seconds
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sp-header-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, label='', unit='', **kwargs):
+        """提交任务，fn(job, *args, **kwargs) 的返回值作为任务结果；label / unit 用于进度显示。"""
+        job = Job(label, unit)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        if job.cancel_requested:
+            job.status = Job.CANCELLED
+        else:
+            job.status = Job.RUNNING
+            try:
+                job.result = fn(job, *args, **kwargs)
+                job.status = Job.DONE
+            except JobCancelled:
+                job.status = Job.CANCELLED
+            except Exception as e:
+                job.error = str(e)
+                job.status = Job.FAILED
+        job.finished_at = time.time()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+        return job
+
+    def _prune(self):
+        now = time.time()
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished and now - job.finished_at > self.keep_seconds]:
+            del self._jobs[job_id]
+
+
+# 进程内共享的默认任务池（Streamlit 每次重跑脚本时模块不会重新导入）
+jobs = JobManager()
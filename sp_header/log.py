@@ -0,0 +1,51 @@
+DEBUG = 10
+INFO = 20
+WARNING = 30
+
+LEVEL_NAMES = {DEBUG: '详细', INFO: '摘要', WARNING: '警告'}
+
+
+class GenerationLog:
+    """生成过程的分级日志，代替逐条 st.write。
+
+    默认只记录摘要（INFO）和警告；逐活动的明细是 DEBUG 级别，verbose=True 时才记录。
+    消息按 logging 的 % 风格延迟格式化，低于当前级别的记录既不格式化也不保存，
+    所以关掉明细时生成耗时不随日志量增长。界面在生成结束后一次性渲染记录。
+    """
+
+    def __init__(self, verbose=False):
+        self.level = DEBUG if verbose else INFO
+        self.records = []
+
+    @property
+    def verbose(self):
+        return self.level <= DEBUG
+
+    def log(self, level, message, *args, kind=None):
+        if level < self.level:
+            return
+        if args:
+            message = message % args
+        self.records.append((level, kind or LEVEL_NAMES[level], message))
+
+    def debug(self, message, *args):
+        self.log(DEBUG, message, *args)
+
+    def info(self, message, *args):
+        self.log(INFO, message, *args)
+
+    def warning(self, message, *args):
+        self.log(WARNING, message, *args)
+
+    def section(self, title):
+        """摘要里的小标题（界面上渲染成 ### 标题）。"""
+        self.log(INFO, title, kind='标题')
+
+    def select(self, min_level=INFO, max_level=None):
+        """按级别筛选记录，返回 [(级别, 类型, 消息)]。"""
+        return [record for record in self.records
+                if record[0] >= min_level and (max_level is None or record[0] <= max_level)]
+
+    def text(self, min_level=DEBUG):
+        """纯文本日志（用于下载或写入文件）。"""
+        return '\n'.join(f"[{kind}] {message}" for level, kind, message in self.records if level >= min_level)
@@ -0,0 +1,90 @@
+import pandas as pd
+
+from .engine import build_rows
+from .log import GenerationLog
+from .stages import StageRecorder
+
+
+LEVELS = ['广告活动', '广告组', '商品广告', '关键词', '否定关键词', '商品定向', '否定商品定向']
+
+
+class RowCounter:
+    """和 RowBuilder 接口相同，但只按活动统计各实体层级的行数，不生成任何行。
+
+    关键词 / ASIN 只取去重合并后的个数，生成引擎的全部规则（类别、兜底列、否定词策略、
+    商品定向）照常执行，所以预估结果和实际生成的行数一致。
+    """
+
+    def __init__(self):
+        self.n_rows = 0
+        self.level_counts = {}
+        self.campaigns = {}
+        self.stages = None
+
+    def _count(self, campaign_name, level, n):
+        if not n:
+            return
+        counts = self.campaigns.setdefault(campaign_name, {})
+        counts[level] = counts.get(level, 0) + n
+        self.level_counts[level] = self.level_counts.get(level, 0) + n
+        self.n_rows += n
+
+    def campaign(self, campaign_name, daily_budget, targeting_type, bidding_strategy, operation=None):
+        self._count(campaign_name, '广告活动', 1)
+
+    def ad_group(self, campaign_name, group_bid, operation=None):
+        self._count(campaign_name, '广告组', 1)
+
+    def product_ad(self, campaign_name, sku, operation=None):
+        self._count(campaign_name, '商品广告', 1)
+
+    def keywords(self, campaign_name, keywords, bid, match_type, operation=None):
+        self._count(campaign_name, '关键词', len(keywords))
+
+    def negative_keywords(self, campaign_name, keywords, match_type, operation=None):
+        self._count(campaign_name, '否定关键词', len(keywords))
+
+    def product_targets(self, campaign_name, asins, bid, operation=None):
+        self._count(campaign_name, '商品定向', len(asins))
+
+    def negative_product_targets(self, campaign_name, asins, operation=None):
+        self._count(campaign_name, '否定商品定向', len(asins))
+
+    def to_frame(self):
+        """每个活动一行：各实体层级行数和总行数。"""
+        frame = pd.DataFrame.from_dict(self.campaigns, orient='index').reindex(columns=LEVELS)
+        frame = frame.fillna(0).astype(int)
+        frame['总行数'] = frame.sum(axis=1)
+        return frame.rename_axis('广告活动名称').reset_index()
+
+    def files_needed(self, max_rows):
+        """按活动边界拆分时需要的文件数（与 shards.plan_shards 的按行数规则相同）。"""
+        if not max_rows or not self.campaigns:
+            return 1
+        files, used = 1, 0
+        for counts in self.campaigns.values():
+            n = sum(counts.values())
+            if used and used + n + 1 > max_rows:
+                files, used = files + 1, 0
+            used += n
+        return files
+
+
+def plan_rows(df_survey, profile, log=None, stages=None):
+    """预估：按国家配置走一遍生成规则，只统计行数，返回 RowCounter。"""
+    counter = RowCounter()
+    build_rows(df_survey, profile, log=log or GenerationLog(), stages=stages or StageRecorder(), rows=counter)
+    return counter
+
+
+def plan_summary(counter, max_rows=None):
+    """预估结果摘要：总行数、各实体层级行数、行数最多的活动，以及是否超过行数上限。"""
+    return {
+        '活动数': len(counter.campaigns),
+        '总行数': counter.n_rows,
+        '实体层级': dict(counter.level_counts),
+        '最大活动行数': max((sum(c.values()) for c in counter.campaigns.values()), default=0),
+        '行数上限': max_rows,
+        '超过上限': bool(max_rows) and counter.n_rows + 1 > max_rows,
+        '拆分文件数': counter.files_needed(max_rows),
+    }
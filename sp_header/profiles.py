@@ -0,0 +1,151 @@
+import json
+import os
+from collections import namedtuple
+
+from .index import MATCH_MARKERS
+
+
+PROFILE_FILE = os.path.join(os.path.dirname(__file__), 'country_profiles.json')
+
+KEYWORD_MODES = ['match', 'map']
+MATCH_TYPE_MODES = ['all', 'first']
+HOST_NEGATIVE_MODES = [None, 'merge', 'separate']
+PRODUCT_TARGET_MODES = ['best_column', 'campaign_column']
+
+NegativePolicy = namedtuple('NegativePolicy', 'match_type add_exact_keywords host host_exact_categories')
+
+
+def column_categories(keyword_columns):
+    """从关键词列名推导类别：'a/b-精准词' 取 a 和 b，'xx精准词' / 'xx广泛' 取 xx。"""
+    categories = set()
+    for col in keyword_columns:
+        col_lower = str(col).lower()
+        if '/' in col_lower:
+            parts = col_lower.split('/')
+            if parts[0]:
+                categories.add(parts[0])
+            if len(parts) > 1 and parts[1]:
+                categories.add(parts[1].split('-')[0])
+        else:
+            for suffix in ['精准词', '广泛词', '精准', '广泛']:
+                if col_lower.endswith(suffix):
+                    prefix = col_lower[:-len(suffix)]
+                    if prefix:
+                        categories.add(prefix)
+                        break
+    return categories
+
+
+class Profile:
+    """编译后的国家配置（执行计划），由 engine.build_rows 执行。
+
+    配置是 JSON 对象（格式见 country_profiles.json）：类别来源、关键词列规则、默认值、
+    各匹配类型的否定词策略和商品定向规则。编译时校验字段并预先算好
+    (精准, 广泛) 标记 -> 关键词匹配类型 / 否定词策略 的查找表，循环里只查表。
+    """
+
+    def __init__(self, spec):
+        try:
+            self.name = spec['name']
+            self.countries = list(spec.get('countries', [self.name]))
+            start, stop = spec['keyword_columns']
+            self.keyword_columns = slice(start, stop)
+
+            defaults = spec['defaults']
+            self.defaults = {
+                'CPC': defaults['cpc'],
+                'SKU': defaults['sku'],
+                '广告组默认竞价': defaults['group_bid'],
+                '预算': defaults['daily_budget'],
+            }
+            self.targeting_type = spec['campaign']['targeting_type']
+            self.bidding_strategy = spec['campaign']['bidding_strategy']
+
+            categories = spec.get('categories', {})
+            self.categories_from_columns = categories.get('from_columns', False)
+            self.extra_categories = [str(c).lower() for c in categories.get('extra', [])]
+
+            keywords = spec['keywords']
+            self.keyword_mode = keywords['mode']
+            self.match_type_mode = keywords.get('match_types', 'all')
+            self.keyword_map = {str(category).lower(): dict(columns)
+                                for category, columns in keywords.get('map', {}).items()}
+            fallback = keywords.get('fallback')
+            self.fallback_category = fallback['category'] if fallback else None
+            if fallback:
+                self.keyword_map[self.fallback_category] = {
+                    match_type: col for match_type, col in fallback.items() if match_type in MATCH_MARKERS
+                }
+
+            self.negative_policies = []
+            for match_type, policy in spec.get('negative_keywords', {}).items():
+                self.negative_policies.append(NegativePolicy(
+                    match_type,
+                    policy.get('add_exact_keywords', False),
+                    policy.get('host'),
+                    [str(c).lower() for c in policy.get('host_exact_categories', [])],
+                ))
+
+            targets = spec['product_targets']
+            self.product_target_mode = targets['mode']
+            self.negative_asin = targets.get('negative_asin', False)
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"国家配置格式错误（{spec.get('name', '?') if isinstance(spec, dict) else '?'}）：{e!r}")
+        self._validate()
+
+        # 编译查找表：(is_exact, is_broad) -> (关键词匹配类型, 否定词策略)
+        self._plan = {}
+        for is_exact in (False, True):
+            for is_broad in (False, True):
+                flags = [m for m, flag in (('精准', is_exact), ('广泛', is_broad)) if flag]
+                match_types = flags[:1] if self.match_type_mode == 'first' else flags
+                # 同时是精准和广泛时按 精准、广泛 的顺序取第一个有策略的匹配类型
+                policy = next((p for m in flags for p in self.negative_policies if p.match_type == m), None)
+                self._plan[is_exact, is_broad] = (match_types, policy)
+
+    def _validate(self):
+        checks = [
+            (self.keyword_mode in KEYWORD_MODES, f"keywords.mode 只能是 {KEYWORD_MODES}"),
+            (self.match_type_mode in MATCH_TYPE_MODES, f"keywords.match_types 只能是 {MATCH_TYPE_MODES}"),
+            (self.product_target_mode in PRODUCT_TARGET_MODES, f"product_targets.mode 只能是 {PRODUCT_TARGET_MODES}"),
+            (all(p.match_type in MATCH_MARKERS for p in self.negative_policies),
+             f"negative_keywords 的键只能是 {list(MATCH_MARKERS)}"),
+            (all(p.host in HOST_NEGATIVE_MODES for p in self.negative_policies),
+             f"negative_keywords.host 只能是 {HOST_NEGATIVE_MODES}"),
+        ]
+        for ok, message in checks:
+            if not ok:
+                raise ValueError(f"国家配置格式错误（{self.name}）：{message}")
+
+    def __repr__(self):
+        return f"Profile({self.name!r})"
+
+    def categories(self, keyword_columns):
+        """分类器使用的类别：映射里的类别、列名推导的类别和额外类别（不含兜底组）。"""
+        categories = {c for c in self.keyword_map if c != self.fallback_category}
+        if self.categories_from_columns:
+            categories |= column_categories(keyword_columns)
+        categories.update(self.extra_categories)
+        return categories
+
+    def plan(self, is_exact, is_broad):
+        """返回 (提取关键词用的匹配类型列表, 否定词策略或 None)。"""
+        return self._plan[bool(is_exact), bool(is_broad)]
+
+
+def load_profiles(path=PROFILE_FILE):
+    """读取并编译国家配置文件，返回 国家 -> Profile。"""
+    with open(path, encoding='utf-8') as f:
+        specs = json.load(f)
+    if isinstance(specs, dict):
+        specs = [specs]
+    profiles = {}
+    for spec in specs:
+        profile = Profile(spec)
+        for country in profile.countries:
+            profiles[country] = profile
+    return profiles
+
+
+# 内置国家配置，导入时加载并编译一次
+PROFILES = load_profiles()
@@ -0,0 +1,343 @@
+import hashlib
+import importlib.util
+import io
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+from xml.etree import ElementTree
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from .cache import read_source_bytes
+from .validation import NEGATIVE_COLUMNS
+
+
+# 规则会用到的命名列；另外 A-Q 列（前 17 列）始终保留，保证 H-Q 关键词列和
+# B 逻辑的 L/M 兜底列位置不变
+NAMED_COLUMNS = ['广告活动名称', 'CPC', 'SKU', '广告组默认竞价', '预算', '否定ASIN'] + NEGATIVE_COLUMNS
+POSITIONAL_COLUMNS = 17
+KEYWORD_MARKERS = ['精准', '广泛', 'exact', 'broad', 'asin']
+# H-Q 关键词列的位置
+KEYWORD_POSITIONS = range(7, POSITIONAL_COLUMNS)
+# 批量表（增量模式的上一版文件）里按文本比较的列
+BULK_TEXT_COLUMNS = ['广告活动编号', '广告组编号', '广告组合编号', '广告编号', '关键词编号', '商品投放 ID', 'SKU',
+                     '关键词文本', '拓展商品投放编号']
+
+
+def select_columns(names):
+    """根据表头返回需要读取的列序号（0 开始，保持原顺序）。
+
+    之前生成的批量表（含“实体层级”列，增量模式的上一版文件）保留全部列。
+    """
+    if '实体层级' in names:
+        return list(range(len(names)))
+    keep = []
+    for i, name in enumerate(names):
+        name_lower = str(name).lower()
+        if (i < POSITIONAL_COLUMNS or name in NAMED_COLUMNS
+                or any(marker in name_lower for marker in KEYWORD_MARKERS)):
+            keep.append(i)
+    return keep
+
+
+def text_columns(names):
+    """需要按文本读取的列名：关键词列（H-Q 和名称含匹配类型 / asin 的列）、否定列和否定ASIN；
+    批量表为编号、SKU、关键词和 ASIN 列。
+
+    这些列里数字样式的文本（'007'、'1e3'）保持原样，数字单元格转成文本，各读取引擎结果一致。
+    """
+    if '实体层级' in names:
+        return [name for name in names if name in BULK_TEXT_COLUMNS]
+    return [name for i, name in enumerate(names)
+            if i in KEYWORD_POSITIONS or name in NEGATIVE_COLUMNS or name == '否定ASIN'
+            or any(marker in str(name).lower() for marker in KEYWORD_MARKERS)]
+
+
+def text_dtypes(names):
+    return dict.fromkeys(text_columns(names), str)
+
+
+def text_value(value):
+    """单元格值转成文本（和 pandas 的 dtype=str 一致：整数值的浮点数不带 .0），空值不变。"""
+    if value is None or isinstance(value, str) or (isinstance(value, float) and value != value):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def header_names(header):
+    """和 pandas 一致地处理表头：空列名为 'Unnamed: i'，重名加 .1、.2 后缀。"""
+    names = []
+    seen = {}
+    for i, name in enumerate(header):
+        if name is None or (isinstance(name, str) and not name.strip()):
+            name = f'Unnamed: {i}'
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def read_pandas(source, sheet_name=0):
+    """pandas 默认的 read_excel（openpyxl 引擎，读取全部列，关键词类的列按文本读取）。"""
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    names = list(pd.read_excel(source, sheet_name=sheet_name, nrows=0).columns)
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return pd.read_excel(source, sheet_name=sheet_name, dtype=text_dtypes(names))
+
+
+def read_openpyxl_readonly(source, sheet_name=0):
+    """openpyxl 只读模式逐行读取，只保留规则用到的列。"""
+    wb = load_workbook(source, read_only=True, data_only=True, keep_links=False)
+    try:
+        return _read_worksheet(wb.worksheets[sheet_name] if isinstance(sheet_name, int) else wb[sheet_name])
+    finally:
+        wb.close()
+
+
+def _read_worksheet(ws):
+    rows = ws.iter_rows(values_only=True)
+    names = header_names(next(rows, ()))
+    keep = select_columns(names)
+    text = set(text_columns(names))
+    columns = [[] for _ in keep]
+    n_rows = 0
+    for row in rows:
+        if not any(value is not None for value in row):
+            continue
+        width = len(row)
+        for values, i in zip(columns, keep):
+            values.append(row[i] if i < width else None)
+        n_rows += 1
+    for values, i in zip(columns, keep):
+        if names[i] in text:
+            values[:] = map(text_value, values)
+    return pd.DataFrame({names[i]: values for i, values in zip(keep, columns)},
+                        index=pd.RangeIndex(n_rows))
+
+
+def read_calamine(source, sheet_name=0):
+    """calamine 引擎（需要安装 python-calamine），先读表头再只解析用到的列。"""
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    names = list(pd.read_excel(source, sheet_name=sheet_name, engine='calamine', nrows=0).columns)
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return pd.read_excel(source, sheet_name=sheet_name, engine='calamine',
+                         usecols=select_columns(names), dtype=text_dtypes(names))
+
+
+def read_csv(source, sheet_name=0):
+    """CSV 调研表（UTF-8，兼容 Excel 导出的 BOM；解码失败时按 GB18030 重试），只解析用到的列。
+
+    关键词类的列按文本读取，保留前导零（'007'）和数字样式的 ASIN。
+    """
+    for encoding in ('utf-8-sig', 'gb18030'):
+        try:
+            if hasattr(source, 'seek'):
+                source.seek(0)
+            names = list(pd.read_csv(source, nrows=0, encoding=encoding).columns)
+            if hasattr(source, 'seek'):
+                source.seek(0)
+            return pd.read_csv(source, usecols=select_columns(names), encoding=encoding, dtype=text_dtypes(names))
+        except UnicodeDecodeError:
+            if encoding == 'gb18030':
+                raise
+
+
+def read_parquet(source, sheet_name=0):
+    """Parquet 调研表（需要安装 pyarrow），只保留用到的列。"""
+    if importlib.util.find_spec('pyarrow') is None:
+        raise ImportError("读取 Parquet 需要安装 pyarrow（pip install pyarrow）")
+    import pyarrow.parquet as pq
+
+    names = header_names(pq.ParquetFile(source).schema_arrow.names)
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    df = pd.read_parquet(source, engine='pyarrow')
+    df.columns = names
+    df = df.iloc[:, select_columns(names)].copy()
+    for col in text_columns(names):
+        if col in df.columns:
+            df[col] = df[col].astype(object).map(text_value)
+    return df
+
+
+# 非 Excel 格式按文件扩展名（或文件头）识别，不受读取引擎选择影响
+FORMAT_READERS = {
+    'csv': read_csv,
+    'parquet': read_parquet,
+}
+
+
+class UnsupportedFormat(ValueError):
+    """调研表不是 xlsx / CSV / Parquet（例如旧版 .xls 或损坏的文件）。"""
+
+
+# 旧版 Excel（.xls）等 OLE 复合文档的文件头
+OLE_HEADER = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+# 判断格式时读取的文件头长度
+HEAD_BYTES = 4096
+
+
+def survey_format(source, data=None):
+    """调研表格式：'xlsx'、'csv' 或 'parquet'。
+
+    先看文件名扩展名（路径或上传文件的 name），其他扩展名或没有扩展名时按文件头判断：
+    Parquet 以 PAR1 开头，xlsx 是 zip（PK 开头），能按 UTF-8 / GB18030 解码的文本为 CSV；
+    其余（旧版 .xls、损坏的文件）抛出 UnsupportedFormat。
+    """
+    name = source if isinstance(source, (str, os.PathLike)) else getattr(source, 'name', '')
+    ext = os.path.splitext(str(name))[1].lower().lstrip('.')
+    if ext in ('xlsx', 'xlsm', 'csv', 'parquet'):
+        return 'xlsx' if ext == 'xlsm' else ext
+    if data is None:
+        data = _read_head(source)
+    if data is None:
+        return 'xlsx'
+    head = data[:HEAD_BYTES]
+    if not head:
+        raise UnsupportedFormat("文件为空，请上传调研表。")
+    if head[:4] == b'PAR1':
+        return 'parquet'
+    if head[:2] == b'PK':
+        return 'xlsx'
+    if _is_text(head):
+        return 'csv'
+    if head[:8] == OLE_HEADER:
+        raise UnsupportedFormat("不支持旧版 Excel 文件（.xls），请在 Excel 中另存为 .xlsx 后重新上传。")
+    kind = f".{ext} 文件" if ext else "无法识别的文件内容"
+    raise UnsupportedFormat(f"不支持的文件格式：{kind}（支持 .xlsx、.csv、.parquet）")
+
+
+def _read_head(source):
+    """读取文件头（不改变文件对象的读取位置）；无法读取内容的来源返回 None。"""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            return f.read(HEAD_BYTES)
+    if hasattr(source, 'read') and hasattr(source, 'seek'):
+        position = source.tell()
+        source.seek(0)
+        data = source.read(HEAD_BYTES)
+        source.seek(position)
+        return data
+    return None
+
+
+def _is_text(head):
+    if b'\x00' in head:
+        return False
+    for encoding in ('utf-8', 'gb18030'):
+        try:
+            head.decode(encoding)
+            return True
+        except UnicodeDecodeError as e:
+            # 文件头可能正好截断在一个多字节字符中间
+            if e.start >= len(head) - 3 and len(head) == HEAD_BYTES:
+                return True
+    return False
+
+
+READERS = {
+    'calamine': read_calamine,
+    'openpyxl-readonly': read_openpyxl_readonly,
+    'openpyxl': read_pandas,
+}
+
+
+def available_readers():
+    """当前环境可用的读取引擎，按速度从快到慢排列。"""
+    names = list(READERS)
+    if importlib.util.find_spec('python_calamine') is None:
+        names.remove('calamine')
+    return names
+
+
+# 上传内容哈希 -> 工作表名（Streamlit 每次重跑和进度轮询都会取，最多保留 32 个工作簿）
+_sheet_names = OrderedDict()
+_sheet_names_lock = threading.Lock()
+
+
+def sheet_names(source):
+    """工作簿中的全部工作表名（CSV / Parquet 只有一个，返回 [0]）。
+
+    只解析 zip 里的 xl/workbook.xml，不加载共享字符串和工作表；按内容哈希缓存。
+    文件损坏时返回 [0]，由后续读取报出错误。
+    """
+    data = read_source_bytes(source)
+    try:
+        if survey_format(source, data) != 'xlsx':
+            return [0]
+    except UnsupportedFormat:
+        return [0]  # 读取时再报出格式错误
+    key = hashlib.sha256(data).hexdigest()
+    with _sheet_names_lock:
+        if key in _sheet_names:
+            _sheet_names.move_to_end(key)
+            return list(_sheet_names[key])
+    try:
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            root = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+    except (zipfile.BadZipFile, KeyError, ElementTree.ParseError):
+        return [0]  # 不是有效的工作簿：按单个工作表处理，读取时再报错
+    # 按标签名匹配，兼容 Transitional / Strict 两种命名空间
+    names = [element.get('name') for element in root.iter() if element.tag.rsplit('}', 1)[-1] == 'sheet']
+    with _sheet_names_lock:
+        _sheet_names[key] = names
+        while len(_sheet_names) > 32:
+            _sheet_names.popitem(last=False)
+    return list(names)
+
+
+def read_sheets(source, sheet_names, reader=None):
+    """一次打开工作簿，读取多个工作表，返回 工作表名 -> DataFrame（保持给定顺序）。
+
+    openpyxl 只读模式共用一个工作簿对象；calamine / pandas 引擎共用一个 ExcelFile，
+    共享字符串等只解析一次。CSV / Parquet 和自定义读取函数逐个调用。
+    """
+    if reader is None:
+        reader = available_readers()[0]
+    if callable(reader) or survey_format(source) != 'xlsx':
+        read = get_reader(reader, survey_format(source))
+        return {name: read(source, sheet_name=name) for name in sheet_names}
+    get_reader(reader)
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    if reader == 'openpyxl-readonly':
+        wb = load_workbook(source, read_only=True, data_only=True, keep_links=False)
+        try:
+            return {name: _read_worksheet(wb.worksheets[name] if isinstance(name, int) else wb[name])
+                    for name in sheet_names}
+        finally:
+            wb.close()
+    with pd.ExcelFile(source, engine=reader) as book:
+        frames = {}
+        for name in sheet_names:
+            names = list(book.parse(name, nrows=0).columns)
+            usecols = None if reader == 'openpyxl' else select_columns(names)
+            frames[name] = book.parse(name, usecols=usecols, dtype=text_dtypes(names))
+        return frames
+
+
+def get_reader(reader=None, fmt='xlsx'):
+    """reader 可以是引擎名、自定义函数 (source, sheet_name) -> DataFrame，或 None（最快的可用引擎）。
+
+    fmt 为 'csv' / 'parquet' 时返回对应格式的读取函数，引擎名只对 xlsx 生效。
+    """
+    if callable(reader):
+        return reader
+    if fmt in FORMAT_READERS:
+        return FORMAT_READERS[fmt]
+    if reader is None:
+        reader = available_readers()[0]
+    if reader not in READERS:
+        raise ValueError(f"未知的读取引擎：{reader}（可选：{', '.join(READERS)}）")
+    return READERS[reader]
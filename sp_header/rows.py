@@ -0,0 +1,223 @@
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+
+# 批量表头列定义（两套逻辑共用）
+COLUMNS = [
+    '产品', '实体层级', '操作', '广告活动编号', '广告组编号', '广告组合编号', '广告编号', '关键词编号', '商品投放 ID',
+    '广告活动名称', '广告组名称', '开始日期', '结束日期', '投放类型', '状态', '每日预算', 'SKU', '广告组默认竞价',
+    '竞价', '关键词文本', '匹配类型', '竞价方案', '广告位', '百分比', '拓展商品投放编号'
+]
+
+
+class RowBuilder:
+    """按实体块收集批量表行，最后一次性按列拼成 DataFrame。
+
+    每个块只记录行数和有值的列：常量列存一个标量（广播），关键词 / ASIN 列
+    直接存数组。没有写到的单元格都是空字符串，和原来手写的 25 列列表一致。
+    """
+
+    def __init__(self, product='商品推广', operation='Create', status='已启用'):
+        self.product = product
+        self.operation = operation
+        self.status = status
+        self.n_rows = 0
+        self.level_counts = {}
+        self._blocks = []
+        self._first_block = {}
+        # 共享的关键词块（tuple）只转换一次数组，各广告活动的块引用同一个数组
+        self._shared_arrays = {}
+        # 生成过程的阶段记录（StageRecorder）和关键词冲突检查结果，由 engine.build_rows 设置
+        self.stages = None
+        self.collisions = None
+
+    def _add(self, n, values, operation=None):
+        if operation:
+            # 和默认操作不同的块（增量模式下的 Update / Archive）单独记录操作列
+            values['操作'] = operation
+        if n:
+            level = values['实体层级']
+            self.level_counts[level] = self.level_counts.get(level, 0) + n
+            self._first_block.setdefault(level, len(self._blocks))
+            self._blocks.append((self.n_rows, n, values))
+            self.n_rows += n
+
+    def first_row(self, level):
+        """某个实体层级的第一行（列名 -> 值），没有该层级时返回 None。"""
+        if level not in self._first_block:
+            return None
+        _, _, values = self._blocks[self._first_block[level]]
+        row = {col: '' for col in COLUMNS}
+        row['产品'] = self.product
+        row['操作'] = self.operation
+        for col, value in values.items():
+            row[col] = value[0] if isinstance(value, np.ndarray) else value
+        return row
+
+    def summary(self):
+        """生成过程中统计好的结果摘要：总行数、各实体层级行数、示例行、各阶段记录和关键词冲突。"""
+        return {
+            '总行数': self.n_rows,
+            '实体层级': dict(self.level_counts),
+            '示例行': {level: self.first_row(level) for level in self.level_counts},
+            '阶段': self.stages.results() if self.stages is not None else [],
+            '冲突': self.collisions or {},
+        }
+
+    def _group_values(self, level, campaign_name):
+        return {
+            '实体层级': level,
+            '广告活动编号': campaign_name,
+            '广告组编号': campaign_name,
+            '广告活动名称': campaign_name,
+            '广告组名称': campaign_name,
+            '状态': self.status,
+        }
+
+    def campaign(self, campaign_name, daily_budget, targeting_type, bidding_strategy, operation=None):
+        self._add(1, {
+            '实体层级': '广告活动',
+            '广告活动编号': campaign_name,
+            '广告活动名称': campaign_name,
+            '投放类型': targeting_type,
+            '状态': self.status,
+            '每日预算': daily_budget,
+            '竞价方案': bidding_strategy,
+        }, operation)
+
+    def ad_group(self, campaign_name, group_bid, operation=None):
+        values = self._group_values('广告组', campaign_name)
+        values['广告组默认竞价'] = group_bid
+        self._add(1, values, operation)
+
+    def product_ad(self, campaign_name, sku, operation=None):
+        values = self._group_values('商品广告', campaign_name)
+        values['SKU'] = sku
+        self._add(1, values, operation)
+
+    def keywords(self, campaign_name, keywords, bid, match_type, operation=None):
+        values = self._group_values('关键词', campaign_name)
+        values.update({'竞价': bid, '关键词文本': self._array(keywords), '匹配类型': match_type})
+        self._add(len(keywords), values, operation)
+
+    def negative_keywords(self, campaign_name, keywords, match_type, operation=None):
+        values = self._group_values('否定关键词', campaign_name)
+        values.update({'关键词文本': self._array(keywords), '匹配类型': match_type})
+        self._add(len(keywords), values, operation)
+
+    def product_targets(self, campaign_name, asins, bid, operation=None):
+        values = self._group_values('商品定向', campaign_name)
+        values.update({'竞价': bid, '拓展商品投放编号': self._asin_expressions(asins)})
+        self._add(len(asins), values, operation)
+
+    def negative_product_targets(self, campaign_name, asins, operation=None):
+        values = self._group_values('否定商品定向', campaign_name)
+        values['拓展商品投放编号'] = self._asin_expressions(asins)
+        self._add(len(asins), values, operation)
+
+    def set_ids(self, ids):
+        """给最后加入的块写入编号列（增量模式下 Update / Archive 行引用上一版批量表里的实体编号）。"""
+        if ids and self._blocks:
+            self._blocks[-1][2].update(ids)
+
+    def extend_campaigns(self, other, campaign_names=None):
+        """从另一个 RowBuilder 复制指定广告活动（None 为全部）的块（数组共用，不复制）。"""
+        for _, n, values in other._blocks:
+            if campaign_names is None or values['广告活动名称'] in campaign_names:
+                if '操作' not in values and other.operation != self.operation:
+                    values = dict(values, 操作=other.operation)
+                self._add(n, values)
+
+    def _array(self, values, convert=None):
+        """关键词 / ASIN 序列转成对象数组；共享的 tuple 块只转换一次。"""
+        if isinstance(values, np.ndarray) and convert is None:
+            return values
+        if not isinstance(values, tuple):
+            return _as_array(convert(values) if convert else values)
+        key = (id(values), convert)
+        if key not in self._shared_arrays:
+            # 同时保存 tuple 本身，保证 id 在构建期间不会被复用
+            self._shared_arrays[key] = (values, _as_array(convert(values) if convert else values))
+        return self._shared_arrays[key][1]
+
+    def _asin_expressions(self, asins):
+        return self._array(asins, _asin_expressions)
+
+    def to_frame(self, categorical=False):
+        """拼成 25 列的 DataFrame。
+
+        categorical=True 时每列都是 category 类型，直接由块生成编码，不展开逐行的对象数组：
+        常量列只存一个小整数编码，共用的关键词 / ASIN 数组只编码一次。空单元格为 ''，
+        缺失值（NaN）为缺失。
+        """
+        if categorical:
+            return self._categorical_frame()
+        data = {col: np.full(self.n_rows, '', dtype=object) for col in COLUMNS}
+        data['产品'][:] = self.product
+        data['操作'][:] = self.operation
+        for start, n, values in self._blocks:
+            stop = start + n
+            for col, value in values.items():
+                data[col][start:stop] = value
+        return pd.DataFrame(data, columns=COLUMNS)
+
+    def _categorical_frame(self):
+        defaults = {'产品': self.product, '操作': self.operation}
+        data = {}
+        for col in COLUMNS:
+            categories = {}
+            array_codes = {}
+
+            def code(value):
+                if value is None or (isinstance(value, float) and value != value):
+                    return -1
+                return categories.setdefault(value, len(categories))
+
+            codes = np.full(self.n_rows, code(defaults.get(col, '')), dtype=np.int32)
+            for start, n, values in self._blocks:
+                if col not in values:
+                    continue
+                value = values[col]
+                if isinstance(value, np.ndarray):
+                    # 共用的数组（同一批关键词出现在多个活动里）只编码一次
+                    key = id(value)
+                    if key not in array_codes:
+                        array_codes[key] = (value, np.fromiter((code(v) for v in value), dtype=np.int32, count=n))
+                    codes[start:start + n] = array_codes[key][1]
+                else:
+                    codes[start:start + n] = code(value)
+            index = pd.Index(list(categories), dtype=object, tupleize_cols=False)
+            data[col] = pd.Categorical.from_codes(codes, categories=index)
+        return pd.DataFrame(data, columns=COLUMNS)
+
+    def iter_rows(self, blank=''):
+        """逐行产出 25 列的元组，不构建整张 DataFrame（用于流式写出）。
+
+        空单元格和缺失值（NaN）都输出为 blank。
+        """
+        for _, n, values in self._blocks:
+            block = dict(values)
+            block['产品'] = self.product
+            block.setdefault('操作', self.operation)
+            columns = []
+            for col in COLUMNS:
+                value = block.get(col, blank)
+                if isinstance(value, np.ndarray):
+                    columns.append(value)
+                else:
+                    if value == '' or pd.isna(value):
+                        value = blank
+                    columns.append(repeat(value, n))
+            yield from zip(*columns)
+
+
+def _as_array(values):
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def _asin_expressions(asins):
+    return [f'asin="{asin}"' for asin in asins]
@@ -0,0 +1,314 @@
+import argparse
+import io
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .cache import survey_cache
+from .engine import SurveyError, build_rows, load_survey
+from .log import GenerationLog
+from .profiles import PROFILES
+from .readers import READERS
+from .stages import StageRecorder
+from .writer import WRITERS, output_formats, to_bytes
+
+
+class ServiceBusy(Exception):
+    """排队的请求已满，稍后重试。"""
+
+
+def _warm_worker():
+    """启动工作进程用的空任务：进程启动后引擎和国家配置已导入，第一个请求不用再等。"""
+
+
+def generate_bulk(source, country, fmt='xlsx', sheet_name=0, reader=None, verbose=False, name=''):
+    """（在工作进程中）生成一个批量表，返回 (文件字节, 行数, 阶段记录, 日志文本)；失败时抛出 SurveyError。
+
+    source 是服务目录下的路径，或上传的字节（name 为文件名，用于判断格式）。工作进程常驻，
+    编译好的分类器和已解析的调研表（survey_cache）在同一进程处理的请求之间复用。
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+        source.name = name
+    log = GenerationLog(verbose=verbose)
+    stages = StageRecorder()
+    with stages.stage('读取') as record:
+        df_survey = load_survey(source, sheet_name=sheet_name, cache=survey_cache, reader=reader)
+        record['行数'] = len(df_survey)
+    rows = build_rows(df_survey, country, log=log, stages=stages)
+    data = to_bytes(rows, fmt).getvalue()
+    return data, rows.n_rows, stages.results(), log.text()
+
+
+class BatchService:
+    """本地 HTTP 批量生成服务：常驻进程，调度系统直接 POST 调研表拿回批量表。
+
+    生成是 CPU 密集的 Python 代码，在常驻的进程池里进行（线程会被 GIL 串行化）：最多
+    max_workers 个请求同时生成，再多 max_queue 个排队，超出时返回 503。工作进程在服务
+    启动时创建并一直保留，国家配置、编译好的分类器和已解析的调研表（各进程自己的
+    survey_cache，按内容哈希）在请求之间常驻，不用像 Streamlit 那样每次交互重跑脚本，
+    也不用每个任务启动一个进程。路径方式只允许读取 root 目录下的文件。
+    """
+
+    def __init__(self, host='127.0.0.1', port=8765, max_workers=2, max_queue=8, root='.', reader=None):
+        self.root = os.path.realpath(root)
+        self.reader = reader
+        self.max_workers = max_workers
+        # 工作进程在这里（HTTP 线程启动之前）一次性全部启动，之后一直复用
+        self._pool = ProcessPoolExecutor(max_workers=max_workers)
+        wait([self._pool.submit(_warm_worker) for _ in range(max_workers)])
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self.server = ThreadingHTTPServer((host, port), _Handler)
+        self.server.daemon_threads = True
+        self.server.service = self
+        self._thread = None
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """在后台线程里开始服务（用于测试 / 嵌入），返回自身。"""
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def shutdown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self._pool.shutdown(wait=True)
+
+    def count(self, failed=False):
+        with self._lock:
+            self.requests += 1
+            self.failures += bool(failed)
+
+    def resolve_path(self, path):
+        """把请求中的路径解析到 root 目录下；越出 root 时抛出 PermissionError。"""
+        full = os.path.realpath(os.path.join(self.root, path))
+        if os.path.commonpath([full, self.root]) != self.root:
+            raise PermissionError(f"路径不在服务目录内：{path}")
+        if not os.path.isfile(full):
+            raise FileNotFoundError(f"找不到文件：{path}")
+        return full
+
+    def submit(self, source, country, fmt='xlsx', sheet_name=0, verbose=False, name=''):
+        """在进程池中生成（source 为路径或上传的字节）；排队已满时抛出 ServiceBusy。
+
+        返回 generate_bulk 的结果。
+        """
+        if country not in PROFILES:
+            raise SurveyError(f"不支持的国家选择：{country}（可选：{', '.join(PROFILES)}）")
+        if fmt not in output_formats():
+            raise SurveyError(f"不支持的输出格式：{fmt}（可选：{', '.join(output_formats())}）")
+        if not self._slots.acquire(blocking=False):
+            raise ServiceBusy("服务繁忙，请稍后重试。")
+        try:
+            return self._pool.submit(generate_bulk, source, country, fmt, sheet_name, self.reader, verbose,
+                                     name).result()
+        finally:
+            self._slots.release()
+
+    def health(self):
+        return {
+            '状态': 'ok',
+            '国家': list(PROFILES),
+            '输出格式': output_formats(),
+            '工作进程数': self.max_workers,
+            '请求数': self.requests,
+            '失败数': self.failures,
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """GET /health 查看状态；POST /generate 生成批量表。
+
+    POST /generate 的参数放在查询串里：country（默认 C US）、format（默认 xlsx）、sheet（工作表名）、
+    sheet_index（工作表序号，0 开始）、name。请求体是调研表文件本身（name 给出文件名，用于判断格式；不给时按文件头判断），或者
+    Content-Type: application/json 的 {"path": 服务目录下的路径, "country": ..., "format": ...}。
+    成功时返回文件内容，行数和耗时放在 X-Rows / X-Seconds 头里；失败时返回 JSON {"错误": ...}。
+    """
+
+    server_version = 'sp-header'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if urllib.parse.urlsplit(self.path).path != '/health':
+            return self._json(404, {'错误': f"未知路径：{self.path}"})
+        self._json(200, self.server.service.health())
+
+    def do_POST(self):
+        service = self.server.service
+        url = urllib.parse.urlsplit(self.path)
+        if url.path != '/generate':
+            return self._json(404, {'错误': f"未知路径：{url.path}"})
+        params = {key: values[-1] for key, values in urllib.parse.parse_qs(url.query).items()}
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        start = time.perf_counter()
+        try:
+            if self.headers.get_content_type() == 'application/json':
+                try:
+                    payload = json.loads(body or b'{}')
+                except ValueError as e:
+                    raise SurveyError(f"JSON 格式错误：{e}")
+                if not isinstance(payload, dict):
+                    raise SurveyError("JSON 请求体必须是对象")
+                params.update(payload)
+                if 'path' not in params:
+                    raise SurveyError("缺少参数：path")
+                source = service.resolve_path(params['path'])
+            else:
+                if not body:
+                    raise SurveyError("请求体为空：请上传调研表文件，或用 JSON 给出 path。")
+                source = body
+            country = params.get('country', 'C US')
+            fmt = params.get('format', 'xlsx')
+            sheet = _sheet_param(params)
+            data, n_rows, _, _ = service.submit(source, country, fmt, sheet_name=sheet, name=params.get('name', ''))
+        except ServiceBusy as e:
+            service.count(failed=True)
+            return self._json(503, {'错误': str(e)}, {'Retry-After': '1'})
+        except SurveyError as e:
+            service.count(failed=True)
+            return self._json(400, {'错误': str(e)})
+        except PermissionError as e:
+            service.count(failed=True)
+            return self._json(403, {'错误': str(e)})
+        except FileNotFoundError as e:
+            service.count(failed=True)
+            return self._json(404, {'错误': str(e)})
+        except Exception as e:
+            service.count(failed=True)
+            return self._json(500, {'错误': f"生成时出错：{e}"})
+        service.count()
+        stem = os.path.splitext(os.path.basename(params.get('path') or params.get('name') or 'survey'))[0]
+        file_name = f"{stem}-header-{country.replace(' ', '_')}{WRITERS[fmt][1]}"
+        self._send(200, data, WRITERS[fmt][2], {
+            'Content-Disposition': f"attachment; filename*=UTF-8''{urllib.parse.quote(file_name)}",
+            'X-Rows': str(n_rows),
+            'X-Seconds': f"{time.perf_counter() - start:.3f}",
+        })
+
+    def _json(self, status, payload, headers=None):
+        self._send(status, json.dumps(payload, ensure_ascii=False).encode('utf-8'),
+                   'application/json; charset=utf-8', headers)
+
+    def _send(self, status, data, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def _sheet_param(params):
+    """sheet 总是工作表名（名为 "2024" 的工作表也能选中），序号用 sheet_index；JSON 里的整数 sheet 为序号。"""
+    if 'sheet_index' in params:
+        index = params['sheet_index']
+        if isinstance(index, str) and index.isdigit():
+            index = int(index)
+        if not isinstance(index, int) or isinstance(index, bool) or index < 0:
+            raise SurveyError(f"sheet_index 必须是非负整数：{index}")
+        return index
+    sheet = params.get('sheet', 0)
+    return sheet if isinstance(sheet, int) and not isinstance(sheet, bool) else str(sheet)
+
+
+class ServiceClient:
+    """BatchService 的本地客户端（标准库 urllib），供调度脚本和测试使用。"""
+
+    def __init__(self, url='http://127.0.0.1:8765', timeout=600):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def health(self):
+        with urllib.request.urlopen(f"{self.url}/health", timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def generate(self, survey, country='C US', fmt='xlsx', sheet=None, name=None):
+        """上传调研表（本地路径或字节）生成批量表，返回 (文件字节, 响应头)。
+
+        sheet 为字符串时按工作表名选择，为整数时按序号（0 开始）。
+
+        失败时抛出 SurveyError（信息取自服务返回的 JSON）。
+        """
+        if isinstance(survey, (str, os.PathLike)):
+            name = name or os.path.basename(survey)
+            with open(survey, 'rb') as f:
+                survey = f.read()
+        params = {'country': country, 'format': fmt}
+        if sheet is not None:
+            params['sheet_index' if isinstance(sheet, int) else 'sheet'] = sheet
+        if name:
+            params['name'] = name
+        return self._post(f"/generate?{urllib.parse.urlencode(params)}", survey, 'application/octet-stream')
+
+    def generate_path(self, path, country='C US', fmt='xlsx', sheet=None):
+        """按服务目录下的路径生成（服务端直接读文件，不上传），返回 (文件字节, 响应头)。"""
+        payload = {'path': path, 'country': country, 'format': fmt}
+        if sheet is not None:
+            payload['sheet'] = sheet
+        return self._post('/generate', json.dumps(payload, ensure_ascii=False).encode('utf-8'), 'application/json')
+
+    def _post(self, path, data, content_type):
+        request = urllib.request.Request(f"{self.url}{path}", data=data, method='POST',
+                                         headers={'Content-Type': content_type})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.read(), dict(response.headers)
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read())['错误']
+            except (ValueError, KeyError):
+                message = str(e)
+            raise SurveyError(f"服务返回 {e.code}：{message}") from None
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m sp_header.service',
+        description='本地 HTTP 批量生成服务：POST 调研表到 /generate，返回 SP 批量 Header 文件。',
+    )
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址（默认 127.0.0.1，只允许本机访问）')
+    parser.add_argument('-p', '--port', type=int, default=8765, help='端口（默认 8765）')
+    parser.add_argument('-j', '--workers', type=int, default=2, help='工作进程数，即同时生成的请求数（默认 2）')
+    parser.add_argument('--queue', type=int, default=8, help='最多排队的请求数，超出时返回 503（默认 8）')
+    parser.add_argument('--root', default='.', help='按路径生成时允许读取的目录（默认当前目录）')
+    parser.add_argument('--reader', default=None, choices=sorted(READERS),
+                        help='xlsx 读取引擎（默认最快的可用引擎）')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    service = BatchService(args.host, args.port, max_workers=args.workers, max_queue=args.queue,
+                           root=args.root, reader=args.reader)
+    print(f"服务已启动：{service.url}（POST /generate，GET /health），Ctrl+C 停止")
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
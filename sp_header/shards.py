@@ -0,0 +1,127 @@
+import io
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .fanout import process_context
+from .rows import RowBuilder
+from .writer import WRITERS, to_bytes
+
+
+# 按字节数拆分时的估算：每行除单元格文本外的开销（XML 标签、单元格引用等），
+# 以及各输出格式相对这个估算的缩小比例（xlsx 合成数据实测约 8.7，取偏保守的值；
+# CSV 没有标签开销）。估算只用于规划，写出后超过上限的分片会再拆开重写。
+ROW_OVERHEAD = 200
+SIZE_RATIO = {'xlsx': 6, 'csv': 2, 'parquet': 6}
+
+
+def _block_bytes(n, values):
+    """估算一个块的未压缩字节数。"""
+    size = n * ROW_OVERHEAD
+    for value in values.values():
+        if isinstance(value, np.ndarray):
+            size += sum(len(str(v).encode('utf-8')) for v in value)
+        else:
+            size += len(str(value).encode('utf-8')) * n
+    return size
+
+
+def campaign_sizes(rows, fmt='xlsx'):
+    """按活动汇总 (行数, 估算写出字节数)，保持活动首次出现的顺序。"""
+    sizes = {}
+    for _, n, values in rows._blocks:
+        name = values['广告活动名称']
+        n_rows, n_bytes = sizes.get(name, (0, 0))
+        sizes[name] = (n_rows + n, n_bytes + _block_bytes(n, values) // SIZE_RATIO[fmt])
+    return sizes
+
+
+def plan_shards(rows, max_rows=None, max_bytes=None, fmt='xlsx'):
+    """按活动边界分片：每片不超过 max_rows 行 / 估算 max_bytes 字节，返回活动名称列表的列表。
+
+    一个活动的全部实体总在同一片里；单个活动本身超过上限时单独成一片。
+    表头行占 1 行，计入行数上限。
+    """
+    shards = [[]]
+    shard_rows = shard_bytes = 0
+    for name, (n_rows, n_bytes) in campaign_sizes(rows, fmt).items():
+        over_rows = max_rows and shard_rows + n_rows + 1 > max_rows
+        over_bytes = max_bytes and shard_bytes + n_bytes > max_bytes
+        if shards[-1] and (over_rows or over_bytes):
+            shards.append([])
+            shard_rows = shard_bytes = 0
+        shards[-1].append(name)
+        shard_rows += n_rows
+        shard_bytes += n_bytes
+    return shards if shards[0] else []
+
+
+def _shard(rows, names):
+    shard = RowBuilder(product=rows.product, operation=rows.operation, status=rows.status)
+    shard.extend_campaigns(rows, set(names))
+    return shard
+
+
+def shard_rows(rows, max_rows=None, max_bytes=None, fmt='xlsx'):
+    """拆成多个 RowBuilder（数组与原结果共用，不复制）。"""
+    return [_shard(rows, names) for names in plan_shards(rows, max_rows, max_bytes, fmt)]
+
+
+def shard_file_name(base_name, index, total):
+    stem, ext = os.path.splitext(base_name)
+    return f"{stem}-{index:0{len(str(total))}d}{ext}"
+
+
+def _shard_bytes(shard, fmt):
+    return to_bytes(shard, fmt).getvalue()
+
+
+def _write_all(shards, max_workers, fmt):
+    workers = min(len(shards), max_workers or os.cpu_count() or 1)
+    if workers <= 1:
+        return [_shard_bytes(shard, fmt) for shard in shards]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=process_context()) as pool:
+        return list(pool.map(_shard_bytes, shards, [fmt] * len(shards)))
+
+
+def write_shards(rows, base_name, max_rows=None, max_bytes=None, max_workers=None, fmt='xlsx'):
+    """分片后并行写出（进程池，单核或只有一片时在本进程写），返回 [(文件名, 行数, 文件字节), ...]。
+
+    字节上限按估算规划，写出后仍超过上限的分片（多于一个活动时）对半拆开重写。
+    """
+    order = {name: i for i, name in enumerate(campaign_sizes(rows, fmt))}
+    pending = plan_shards(rows, max_rows, max_bytes, fmt)
+    if not os.path.splitext(base_name)[1]:
+        base_name += WRITERS[fmt][1]
+    written = []
+    while pending:
+        shards = [_shard(rows, names) for names in pending]
+        retry = []
+        for names, shard, data in zip(pending, shards, _write_all(shards, max_workers, fmt)):
+            if max_bytes and len(data) > max_bytes and len(names) > 1:
+                half = len(names) // 2
+                retry += [names[:half], names[half:]]
+            else:
+                written.append((order[names[0]], shard.n_rows, data))
+        pending = retry
+    written.sort(key=lambda item: item[0])
+    return [(shard_file_name(base_name, index, len(written)), n_rows, data)
+            for index, (_, n_rows, data) in enumerate(written, 1)]
+
+
+def write_shards_zip(rows, base_name, max_rows=None, max_bytes=None, max_workers=None, fmt='xlsx'):
+    """分片写出并打包成 ZIP，返回 (ZIP 缓冲区, 各分片统计)。
+
+    xlsx / Parquet 本身已压缩，ZIP 里直接存储；CSV 压缩存储。
+    """
+    stats = []
+    buffer = io.BytesIO()
+    compression = zipfile.ZIP_DEFLATED if fmt == 'csv' else zipfile.ZIP_STORED
+    with zipfile.ZipFile(buffer, 'w', compression=compression) as archive:
+        for name, n_rows, data in write_shards(rows, base_name, max_rows, max_bytes, max_workers, fmt):
+            archive.writestr(name, data)
+            stats.append({'文件': name, '总行数': n_rows, '字节': len(data)})
+    buffer.seek(0)
+    return buffer, stats
@@ -0,0 +1,103 @@
+import io
+import zipfile
+
+from .collisions import find_collisions
+from .engine import SurveyError, build_rows, resolve_profile
+from .fanout import render_profile, run_parallel
+from .log import GenerationLog
+from .readers import UnsupportedFormat, get_reader, read_sheets
+from .rows import RowBuilder
+from .writer import WRITERS, to_bytes
+
+
+def sheet_file_name(sheet, country, fmt='xlsx'):
+    return f"header-{str(sheet).strip().replace(' ', '_')}-{country.replace(' ', '_')}{WRITERS[fmt][1]}"
+
+
+def load_sheets(source, sheet_names, reader=None):
+    """一次打开工作簿读取多个工作表，返回 工作表名 -> DataFrame；读取失败时抛出 SurveyError。"""
+    get_reader(reader)  # 引擎名错误直接报出，不当作读取失败
+    try:
+        return read_sheets(source, sheet_names, reader=reader)
+    except UnsupportedFormat as e:
+        raise SurveyError(str(e))
+    except FileNotFoundError:
+        raise SurveyError("错误：无法读取上传的文件。请确保文件格式正确。")
+    except Exception as e:
+        raise SurveyError(f"读取文件时出错：{e}")
+
+
+def build_profile_rows(df_survey, profile, verbose=False):
+    """（在工作进程中）只生成行，不写出，返回 (RowBuilder, 日志记录, 错误信息)。"""
+    log = GenerationLog(verbose=verbose)
+    try:
+        rows = build_rows(df_survey, profile, log=log)
+    except SurveyError as e:
+        return None, log.records, str(e)
+    return rows, log.records, None
+
+
+def generate_sheets(frames, country, log=None, max_workers=None, verbose=False, progress=None, fmt='xlsx',
+                    merge=False):
+    """多个工作表（工作表名 -> DataFrame）按同一国家配置并行生成。
+
+    merge=True 时各工作表的行合并成一个批量表（工作表顺序），否则每个工作表一个文件打包成
+    ZIP（各文件在工作进程里直接写出）。某个工作表校验失败只记入该表统计，不影响其他表。
+    返回 (文件缓冲区或 None, 各工作表统计)。progress(已完成工作表数, 工作表总数)。
+    """
+    log = log or GenerationLog(verbose=verbose)
+    profile = resolve_profile(country)
+    sheets = list(frames)
+    worker = build_profile_rows if merge else render_profile
+    args = [(frames[sheet], profile, verbose) + (() if merge else (fmt,)) for sheet in sheets]
+    results = run_parallel(worker, args, max_workers, progress)
+
+    stats = []
+    outputs = []
+    for sheet, result in zip(sheets, results):
+        if merge:
+            rows, records, error = result
+            summary = rows.summary() if rows is not None else None
+        else:
+            data, summary, records, error = result
+        log.section(f"工作表：{sheet}")
+        log.records.extend(records)
+        stat = {'工作表': sheet, '活动数': 0, '总行数': 0, '秒': 0.0, '文件': None, '错误': error}
+        if error:
+            log.warning(error)
+        else:
+            stat['活动数'] = summary['实体层级'].get('广告活动', 0)
+            stat['总行数'] = summary['总行数']
+            stat['秒'] = sum(stage['秒'] for stage in summary['阶段'])
+            if not merge:
+                stat['文件'] = sheet_file_name(sheet, country, fmt)
+            outputs.append((stat, rows if merge else data))
+        stats.append(stat)
+
+    if not outputs:
+        return None, stats
+    if merge:
+        return _merge(outputs, log, fmt), stats
+    buffer = io.BytesIO()
+    compression = zipfile.ZIP_DEFLATED if fmt == 'csv' else zipfile.ZIP_STORED
+    with zipfile.ZipFile(buffer, 'w', compression=compression) as archive:
+        for stat, data in outputs:
+            archive.writestr(stat['文件'], data)
+    buffer.seek(0)
+    return buffer, stats
+
+
+def _merge(outputs, log, fmt):
+    merged = RowBuilder()
+    seen = {}
+    for stat, rows in outputs:
+        names = {values['广告活动名称'] for _, _, values in rows._blocks}
+        for name in sorted(names & set(seen), key=str):
+            log.warning("活动“%s”同时出现在工作表 %s 和 %s，合并后会重复", name, seen[name], stat['工作表'])
+        for name in names:
+            seen.setdefault(name, stat['工作表'])
+        merged.extend_campaigns(rows)
+    log.info("合并 %s 个工作表，共 %s 行", len(outputs), merged.n_rows)
+    # 各工作表单独检查过，合并后再查一次跨工作表的冲突
+    merged.collisions = find_collisions(merged, log)
+    return to_bytes(merged, fmt)
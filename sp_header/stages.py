@@ -0,0 +1,159 @@
+import itertools
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块
+    resource = None
+
+
+def _proc_status(field):
+    """Linux：/proc/self/status 中的内存字段（字节）；读不到时返回 None。"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def current_rss():
+    """进程当前的常驻内存（字节）；无法获取时返回 None。"""
+    rss = _proc_status('VmRSS')
+    if rss is not None:
+        return rss
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss
+
+
+def reset_peak_rss():
+    """Linux：把进程的峰值 RSS（VmHWM）重置为当前 RSS，返回是否成功。"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss():
+    """进程的峰值常驻内存（字节）：Linux 上是上次 reset_peak_rss 以来的峰值，其他系统是整个进程
+    生命周期的峰值；无法获取时返回 None。"""
+    peak = _proc_status('VmHWM')
+    if peak is not None:
+        return peak
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 单位是 KB，macOS 是字节
+        return peak if sys.platform == 'darwin' else peak * 1024
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return getattr(psutil.Process().memory_info(), 'peak_wset', None)
+
+
+# 进程内正在运行的阶段数（所有 StageRecorder 共用）。峰值 RSS 的水位是整个进程的，
+# 只有没有其他阶段在运行时才能重置，否则会把别的任务正在测的峰值清掉
+_active_stages = 0
+_stage_events = itertools.count()
+_active_lock = threading.Lock()
+
+
+def _enter_stage():
+    """登记一个开始的阶段，返回 (序号, 是否独占, 是否重置了峰值水位)；只在独占时重置。"""
+    global _active_stages
+    with _active_lock:
+        _active_stages += 1
+        alone = _active_stages == 1
+        return next(_stage_events), alone, alone and reset_peak_rss()
+
+
+def _exit_stage(seq):
+    """登记阶段结束，返回期间是否有其他阶段开始或结束。"""
+    global _active_stages
+    with _active_lock:
+        _active_stages -= 1
+        return next(_stage_events) != seq + 1
+
+
+class StageRecorder:
+    """按阶段记录耗时、内存和行数；trace_memory=True 时再用 tracemalloc 记录各阶段的内存峰值。
+
+    每个阶段一条记录，同名阶段累加耗时。RSS 都是整个进程的值：峰值RSS 是本阶段内进程的最高
+    常驻内存，Linux 上阶段开始时重置进程的峰值水位（/proc/self/clear_refs），不会沿用之前更大
+    任务留下的峰值；无法重置时（macOS / Windows）用阶段结束时的当前 RSS。新增RSS 是阶段前后
+    当前 RSS 的差。阶段开始时进程里已有其他阶段在运行（后台任务、多国家并行）时不重置水位，
+    以免清掉别的任务正在测的峰值，峰值RSS 改取阶段结束时的当前 RSS；期间和其他阶段有重叠时
+    记 RSS重叠=True，这时两个 RSS 值都包含同时运行的任务。tracemalloc 本身会拖慢运行，计时和
+    测内存最好分两次跑。
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.records = {}
+
+    @contextmanager
+    def stage(self, name):
+        record = self.records.setdefault(name, {'阶段': name, '秒': 0.0, '行数': None, '峰值RSS': None,
+                                                '新增RSS': None, 'RSS重叠': False})
+        started_tracing = False
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+        rss_before = current_rss()
+        seq, alone, has_peak = _enter_stage()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['秒'] += time.perf_counter() - start
+            overlapped = _exit_stage(seq) or not alone
+            rss_after = current_rss()
+            # 没有重置时水位可能来自本阶段之前，只取当前 RSS
+            peak = peak_rss() if has_peak else rss_after
+            record['RSS重叠'] = record['RSS重叠'] or overlapped
+            record['峰值RSS'] = max(record['峰值RSS'] or 0, peak or 0) or None
+            if rss_before is not None and rss_after is not None:
+                record['新增RSS'] = (record['新增RSS'] or 0) + rss_after - rss_before
+            if self.trace_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                record['峰值内存'] = max(record.get('峰值内存', 0), peak - base)
+                if started_tracing:
+                    tracemalloc.stop()
+
+    def results(self):
+        return [dict(record) for record in self.records.values()]
+
+    def total_seconds(self):
+        return sum(record['秒'] for record in self.records.values())
+
+    def to_json(self, **extra):
+        return stages_to_json(self.results(), **extra)
+
+
+def stages_to_json(records, **extra):
+    """阶段记录导出为 JSON 字符串（extra 作为顶层字段一起写出，例如文件名、国家）。"""
+    total = sum(record['秒'] for record in records)
+    return json.dumps(dict(extra, 总秒数=total, 阶段=records), ensure_ascii=False, indent=2, default=str)
+
+
+class NullStages:
+    """不记录阶段（写出 DataFrame 等没有阶段记录的场景）。"""
+
+    @contextmanager
+    def stage(self, name):
+        yield {}
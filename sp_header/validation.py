@@ -0,0 +1,51 @@
+import pandas as pd
+
+
+# 否定关键词列（只检查存在的列）
+NEGATIVE_COLUMNS = ['否定精准', '否定词组', '宿主额外否精准', '宿主额外否词组']
+
+REPORT_COLUMNS = ['列号', '列名', '关键词', '次数']
+
+
+def column_letter(col_index):
+    """1 开始的列序号 -> Excel 列字母（1 -> A，27 -> AA）。"""
+    letters = ''
+    while col_index > 0:
+        col_index, rem = divmod(col_index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def non_blank(series):
+    """去掉空值和只含空白的单元格，保留原始值。"""
+    series = series.dropna()
+    return series[series.astype(str).str.strip() != '']
+
+
+def find_duplicates(df_survey, columns):
+    """一次性统计多列中的重复值。
+
+    返回 DataFrame（列号、列名、关键词、次数），每个重复词一行，按列顺序排列。
+    """
+    positions = {col: i for i, col in enumerate(df_survey.columns)}
+    parts = []
+    for col in columns:
+        if col not in positions:
+            continue
+        values = non_blank(df_survey[col])
+        parts.append(pd.DataFrame({'列序号': positions[col], '关键词': values.to_numpy(dtype=object)}))
+    if not parts:
+        return pd.DataFrame(columns=REPORT_COLUMNS)
+
+    stacked = pd.concat(parts, ignore_index=True)
+    counts = stacked.groupby(['列序号', '关键词'], sort=False).size()
+    counts = counts[counts > 1].reset_index(name='次数')
+    counts = counts.sort_values('列序号', kind='stable')
+
+    report = pd.DataFrame({
+        '列号': [column_letter(i + 1) for i in counts['列序号']],
+        '列名': [df_survey.columns[i] for i in counts['列序号']],
+        '关键词': counts['关键词'].to_numpy(),
+        '次数': counts['次数'].to_numpy(),
+    }, columns=REPORT_COLUMNS)
+    return report
@@ -0,0 +1,131 @@
+import csv
+import importlib.util
+import io
+
+import pandas as pd
+from openpyxl import Workbook
+
+from .rows import COLUMNS
+from .stages import NullStages
+
+
+def write_xlsx(rows, output_file, sheet_name='Sheet1'):
+    """用 openpyxl 只写模式流式写出批量表，返回写出的数据行数。
+
+    rows 可以是 RowBuilder（逐块生成行）或 DataFrame。只写模式下每行写完即
+    刷到临时文件，不会在内存中构建整张工作簿。RowBuilder 带有阶段记录时
+    追加一个“写出”阶段。
+    """
+    stages = getattr(rows, 'stages', None) or NullStages()
+    with stages.stage('写出') as record:
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(sheet_name)
+        ws.append(COLUMNS)
+
+        n_rows = 0
+        for row in _iter_rows(rows):
+            ws.append(row)
+            n_rows += 1
+        wb.save(output_file)
+        record['行数'] = n_rows
+    return n_rows
+
+
+def to_xlsx_bytes(rows, sheet_name='Sheet1'):
+    """写到内存缓冲区并返回 BytesIO（已回到开头），不落盘。"""
+    buffer = io.BytesIO()
+    write_xlsx(rows, buffer, sheet_name=sheet_name)
+    buffer.seek(0)
+    return buffer
+
+
+def write_csv(rows, output_file, encoding='utf-8-sig'):
+    """写出 CSV（列与 xlsx 相同），返回写出的数据行数。
+
+    默认带 BOM 的 UTF-8，Excel 直接打开中文不乱码。output_file 可以是路径或二进制文件对象。
+    """
+    stages = getattr(rows, 'stages', None) or NullStages()
+    with stages.stage('写出') as record:
+        if hasattr(output_file, 'write'):
+            text = io.TextIOWrapper(output_file, encoding=encoding, newline='')
+        else:
+            text = open(output_file, 'w', encoding=encoding, newline='')
+        try:
+            writer = csv.writer(text)
+            writer.writerow(COLUMNS)
+            n_rows = 0
+            for row in _iter_rows(rows):
+                writer.writerow(row)
+                n_rows += 1
+        finally:
+            if hasattr(output_file, 'write'):
+                text.flush()
+                text.detach()  # 不关闭调用方的缓冲区
+            else:
+                text.close()
+        record['行数'] = n_rows
+    return n_rows
+
+
+def parquet_available():
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def write_parquet(rows, output_file):
+    """写出 Parquet（需要安装 pyarrow），列名与 xlsx 相同，返回写出的数据行数。
+
+    全是数字的列保存为数值，其余列保存为字符串，空单元格为空值。
+    """
+    if not parquet_available():
+        raise ImportError("写出 Parquet 需要安装 pyarrow（pip install pyarrow）")
+    stages = getattr(rows, 'stages', None) or NullStages()
+    with stages.stage('写出') as record:
+        frame = rows.to_frame() if hasattr(rows, 'to_frame') else rows[COLUMNS]
+        data = {}
+        for col in COLUMNS:
+            values = frame[col].replace('', None)
+            numbers = pd.to_numeric(values, errors='coerce')
+            if numbers.notna().sum() == values.notna().sum():
+                data[col] = numbers
+            else:
+                data[col] = values.astype('string')
+        pd.DataFrame(data).to_parquet(output_file, engine='pyarrow', index=False)
+        record['行数'] = len(frame)
+    return len(frame)
+
+
+# 输出格式 -> (写出函数, 扩展名, MIME 类型)
+WRITERS = {
+    'xlsx': (write_xlsx, '.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': (write_csv, '.csv', 'text/csv'),
+    'parquet': (write_parquet, '.parquet', 'application/vnd.apache.parquet'),
+}
+
+
+def output_formats():
+    """当前环境可用的输出格式（Parquet 需要 pyarrow）。"""
+    return [fmt for fmt in WRITERS if fmt != 'parquet' or parquet_available()]
+
+
+def write_rows(rows, output_file, fmt='xlsx'):
+    """按格式写出（'xlsx' / 'csv' / 'parquet'），返回写出的数据行数。"""
+    if fmt not in WRITERS:
+        raise ValueError(f"未知的输出格式：{fmt}（可选：{', '.join(WRITERS)}）")
+    return WRITERS[fmt][0](rows, output_file)
+
+
+def to_bytes(rows, fmt='xlsx'):
+    """按格式写到内存缓冲区并返回 BytesIO（已回到开头）。"""
+    buffer = io.BytesIO()
+    write_rows(rows, buffer, fmt)
+    buffer.seek(0)
+    return buffer
+
+
+def _iter_rows(rows):
+    if hasattr(rows, 'iter_rows'):
+        return rows.iter_rows(blank=None)
+    # DataFrame：缺失值写成空单元格
+    frame = rows[COLUMNS].astype(object)
+    frame = frame.where(frame.notna(), None)
+    return frame.itertuples(index=False, name=None)
@@ -0,0 +1,288 @@
+"""重构前 app.py 里的两套生成逻辑（C US / B US），去掉界面输出后保留原样，作为引擎的对照实现。
+
+只有一处改动：原逻辑按 set 的迭代顺序取第一个匹配的关键词类别，结果随 PYTHONHASHSEED
+变化；这里按引擎的规则取最长的类别（长度相同取名称中最靠前的）。
+"""
+import re
+
+import pandas as pd
+
+
+COLUMNS = [
+    '产品', '实体层级', '操作', '广告活动编号', '广告组编号', '广告组合编号', '广告编号', '关键词编号', '商品投放 ID',
+    '广告活动名称', '广告组名称', '开始日期', '结束日期', '投放类型', '状态', '每日预算', 'SKU', '广告组默认竞价',
+    '竞价', '关键词文本', '匹配类型', '竞价方案', '广告位', '百分比', '拓展商品投放编号'
+]
+
+product = '商品推广'
+operation = 'Create'
+status = '已启用'
+targeting_type = '手动'
+bidding_strategy = '动态竞价 - 仅降低'
+default_daily_budget = 12
+default_group_bid = 0.6
+
+
+def first_category(categories, campaign_name_normalized):
+    matches = [c for c in categories if c in campaign_name_normalized]
+    if not matches:
+        return None
+    return min(matches, key=lambda c: (-len(c), campaign_name_normalized.index(c)))
+
+
+def campaign_values(df_survey):
+    non_empty_campaigns = df_survey[
+        df_survey['广告活动名称'].notna() &
+        (df_survey['广告活动名称'] != '')
+    ]
+    required_cols = ['CPC', 'SKU', '广告组默认竞价', '预算']
+    if all(col in non_empty_campaigns.columns for col in required_cols):
+        return non_empty_campaigns.drop_duplicates(
+            subset='广告活动名称', keep='first'
+        ).set_index('广告活动名称')[required_cols].to_dict('index')
+    return {}
+
+
+def has_duplicates(df_survey, keyword_columns):
+    for col in keyword_columns:
+        kw_list = [kw for kw in df_survey[col].dropna() if str(kw).strip()]
+        if len(kw_list) > len(set(kw_list)):
+            return True
+    return False
+
+
+def column_values(df_survey, col):
+    return list(dict.fromkeys([kw for kw in df_survey.get(col, pd.Series()).dropna() if str(kw).strip()]))
+
+
+def campaign_rows(campaign_name, budget, group_bid, sku):
+    return [
+        [product, '广告活动', operation, campaign_name, '', '', '', '', '',
+         campaign_name, '', '', '', targeting_type, status, budget, '', '',
+         '', '', '', bidding_strategy, '', '', ''],
+        [product, '广告组', operation, campaign_name, campaign_name, '', '', '', '',
+         campaign_name, campaign_name, '', '', '', status, '', '', group_bid,
+         '', '', '', '', '', '', ''],
+        [product, '商品广告', operation, campaign_name, campaign_name, '', '', '', '',
+         campaign_name, campaign_name, '', '', '', status, '', sku, '',
+         '', '', '', '', '', '', ''],
+    ]
+
+
+def keyword_row(campaign_name, cpc, kw, match_type):
+    return [product, '关键词', operation, campaign_name, campaign_name, '', '', '', '',
+            campaign_name, campaign_name, '', '', '', status, '', '', '',
+            cpc, kw, match_type, '', '', '', '']
+
+
+def negative_row(campaign_name, kw, match_type):
+    return [product, '否定关键词', operation, campaign_name, campaign_name, '', '', '', '',
+            campaign_name, campaign_name, '', '', '', status, '', '', '', '',
+            kw, match_type, '', '', '', '']
+
+
+def asin_row(campaign_name, cpc, asin, level='商品定向'):
+    return [product, level, operation, campaign_name, campaign_name, '', '', '', '',
+            campaign_name, campaign_name, '', '', '', status, '', '', '',
+            cpc, '', '', '', '', '', f'asin="{asin}"']
+
+
+def header_rows_C(df_survey_C):
+    """C US 原逻辑；关键词或否定关键词有重复时返回 None。"""
+    unique_campaigns = [name for name in df_survey_C['广告活动名称'].dropna() if str(name).strip()]
+    campaign_to_values = campaign_values(df_survey_C)
+    keyword_columns = df_survey_C.columns[7:17]
+    if has_duplicates(df_survey_C, keyword_columns):
+        return None
+
+    neg_exact = column_values(df_survey_C, '否定精准')
+    neg_phrase = column_values(df_survey_C, '否定词组')
+    suzhu_extra_neg_exact = column_values(df_survey_C, '宿主额外否精准')
+    suzhu_extra_neg_phrase = column_values(df_survey_C, '宿主额外否词组')
+
+    keyword_categories = set()
+    for col in keyword_columns:
+        col_lower = str(col).lower()
+        if '/' in col:
+            parts = col_lower.split('/')
+            if parts[0]:
+                keyword_categories.add(parts[0])
+            if len(parts) > 1 and parts[1]:
+                chinese_part = parts[1].split('-')[0] if '-' in parts[1] else parts[1]
+                keyword_categories.add(chinese_part)
+        else:
+            for suffix in ['精准词', '广泛词', '精准', '广泛']:
+                if col_lower.endswith(suffix):
+                    prefix = col_lower[:-len(suffix)]
+                    if prefix:
+                        keyword_categories.add(prefix)
+                        break
+    keyword_categories.update(['suzhu', '宿主', 'case', '包', 'tape'])
+
+    rows = []
+    for campaign_name in unique_campaigns:
+        if campaign_name in campaign_to_values:
+            cpc = campaign_to_values[campaign_name]['CPC']
+            sku = campaign_to_values[campaign_name]['SKU']
+            group_bid = campaign_to_values[campaign_name]['广告组默认竞价']
+            budget = campaign_to_values[campaign_name]['预算']
+        else:
+            cpc = 0.5
+            sku = 'SKU-1'
+            group_bid = default_group_bid
+            budget = default_daily_budget
+
+        campaign_name_normalized = str(campaign_name).lower()
+        matched_category = first_category(keyword_categories, campaign_name_normalized)
+
+        is_exact = any(x in campaign_name_normalized for x in ['精准', 'exact'])
+        is_broad = any(x in campaign_name_normalized for x in ['广泛', 'broad'])
+        is_asin = 'asin' in campaign_name_normalized
+        match_type = '精准' if is_exact else '广泛' if is_broad else 'ASIN' if is_asin else None
+
+        keywords = []
+        if matched_category and (is_exact or is_broad):
+            for col in keyword_columns:
+                col_lower = str(col).lower()
+                if is_exact and matched_category in col_lower and any(x in col_lower for x in ['精准', 'exact']):
+                    keywords.extend([kw for kw in df_survey_C[col].dropna() if str(kw).strip()])
+                elif is_broad and matched_category in col_lower and any(x in col_lower for x in ['广泛', 'broad']):
+                    keywords.extend([kw for kw in df_survey_C[col].dropna() if str(kw).strip()])
+            keywords = list(dict.fromkeys(keywords))
+
+        neg_keywords = []
+        if is_broad and matched_category:
+            for col in keyword_columns:
+                col_lower = str(col).lower()
+                if matched_category in col_lower and any(x in col_lower for x in ['精准', 'exact']):
+                    neg_keywords.extend([kw for kw in df_survey_C[col].dropna() if str(kw).strip()])
+                if (any(x in campaign_name_normalized for x in ['suzhu', '宿主'])
+                        and any(x in col_lower for x in ['case', '包'])
+                        and any(x in col_lower for x in ['精准', 'exact'])):
+                    neg_keywords.extend([kw for kw in df_survey_C[col].dropna() if str(kw).strip()])
+            neg_keywords = list(dict.fromkeys(neg_keywords))
+        combined_neg_exact = list(dict.fromkeys(neg_exact + neg_keywords))
+
+        asin_targets = []
+        if is_asin and matched_category:
+            potential_asin_cols = [col for col in df_survey_C.columns
+                                   if matched_category in str(col).lower() and 'asin' in str(col).lower()]
+            if potential_asin_cols:
+                def calculate_match_score(col_name, campaign_norm):
+                    words = re.split(r'[\s/:-]+', str(col_name).lower())
+                    unique_words = [w.strip() for w in words
+                                    if w.strip() and w not in ['asin', '精准', '广泛', 'exact', 'broad']]
+                    return sum(1 for word in unique_words if word in campaign_norm)
+
+                scores = {col: calculate_match_score(col, campaign_name_normalized) for col in potential_asin_cols}
+                best_col = max(scores, key=scores.get)
+                asin_targets.extend([kw for kw in df_survey_C[best_col].dropna() if str(kw).strip()])
+            asin_targets = list(dict.fromkeys(asin_targets))
+
+        rows.extend(campaign_rows(campaign_name, budget, group_bid, sku))
+        if is_exact or is_broad:
+            rows.extend(keyword_row(campaign_name, cpc, kw, match_type) for kw in keywords)
+        if is_broad:
+            rows.extend(negative_row(campaign_name, kw, '否定精准匹配') for kw in combined_neg_exact)
+            rows.extend(negative_row(campaign_name, kw, '否定词组') for kw in neg_phrase)
+            if any(x in campaign_name_normalized for x in ['suzhu', '宿主']):
+                rows.extend(negative_row(campaign_name, kw, '否定精准匹配') for kw in suzhu_extra_neg_exact)
+                rows.extend(negative_row(campaign_name, kw, '否定词组') for kw in suzhu_extra_neg_phrase)
+        if is_asin:
+            rows.extend(asin_row(campaign_name, cpc, asin) for asin in asin_targets)
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+
+def header_rows_B(df_survey):
+    """B US / K US / A US 原逻辑；关键词有重复时返回 None。"""
+    unique_campaigns = [name for name in df_survey['广告活动名称'].dropna() if str(name).strip()]
+    campaign_to_values = campaign_values(df_survey)
+    keyword_columns = df_survey.columns[7:17]
+    if has_duplicates(df_survey, keyword_columns):
+        return None
+
+    neg_exact = column_values(df_survey, '否定精准')
+    neg_phrase = column_values(df_survey, '否定词组')
+    suzhu_extra_neg_exact = column_values(df_survey, '宿主额外否精准')
+    suzhu_extra_neg_phrase = column_values(df_survey, '宿主额外否词组')
+    neg_asin = column_values(df_survey, '否定ASIN')
+
+    keyword_categories = {
+        'suzhu': 'suzhu/宿主-精准词',
+        '宿主': 'suzhu/宿主-精准词',
+        'case': 'case/包-精准词',
+        '包': 'case/包-精准词',
+        'cards': 'cards精准词',
+        'acces': 'acces精准词',
+        'acc': 'acc精准词',
+        None: '精准词'
+    }
+    exact_keywords = {key: column_values(df_survey, col)
+                      for key, col in keyword_categories.items() if col in df_survey.columns}
+
+    rows = []
+    for campaign_name in unique_campaigns:
+        campaign_name_normalized = str(campaign_name).lower()
+        values = campaign_to_values.get(campaign_name, {})
+        cpc = values.get('CPC', 0.6)
+        sku = values.get('SKU', '')
+        daily_budget = values.get('预算', default_daily_budget)
+        group_bid = values.get('广告组默认竞价', default_group_bid)
+
+        is_exact = any(x in campaign_name_normalized for x in ['精准', 'exact'])
+        is_broad = any(x in campaign_name_normalized for x in ['广泛', 'broad'])
+        is_asin = 'asin' in campaign_name_normalized
+        match_type = '精准' if is_exact else '广泛' if is_broad else 'ASIN' if is_asin else None
+        is_host = any(x in campaign_name_normalized for x in ['suzhu', '宿主'])
+
+        matched_category = first_category(set(keyword_categories) - {None}, campaign_name_normalized)
+        matched_columns = []
+        if matched_category:
+            if is_exact:
+                target_col = keyword_categories[matched_category]
+                if target_col in df_survey.columns:
+                    matched_columns.append(target_col)
+            elif is_broad:
+                target_col_broad = keyword_categories[matched_category].replace('精准', '广泛')
+                if target_col_broad in df_survey.columns:
+                    matched_columns.append(target_col_broad)
+        if not matched_columns and (is_exact or is_broad):
+            matched_category = '配件'
+            matched_columns.append(df_survey.columns[11] if is_exact else df_survey.columns[12])
+
+        keywords = []
+        if matched_columns and (is_exact or is_broad):
+            for col in matched_columns:
+                keywords.extend([kw for kw in df_survey[col].dropna() if str(kw).strip()])
+            keywords = list(dict.fromkeys(keywords))
+
+        campaign_neg_exact = []
+        campaign_neg_phrase = []
+        if is_exact:
+            campaign_neg_exact = list(dict.fromkeys(neg_exact))
+            campaign_neg_phrase = list(dict.fromkeys(neg_phrase))
+        elif is_broad:
+            campaign_neg_exact = list(dict.fromkeys(neg_exact))
+            campaign_neg_phrase = list(dict.fromkeys(neg_phrase))
+            if matched_category in exact_keywords and matched_category != '配件':
+                campaign_neg_exact.extend(exact_keywords.get(matched_category, []))
+            elif matched_category == '配件':
+                campaign_neg_exact.extend(column_values(df_survey, df_survey.columns[11]))
+            campaign_neg_exact = list(dict.fromkeys(campaign_neg_exact))
+        if not (is_exact and is_host) and is_host:
+            campaign_neg_exact = list(dict.fromkeys(campaign_neg_exact + suzhu_extra_neg_exact))
+            campaign_neg_phrase = list(dict.fromkeys(campaign_neg_phrase + suzhu_extra_neg_phrase))
+
+        rows.extend(campaign_rows(campaign_name, daily_budget, group_bid, sku))
+        if is_exact or is_broad:
+            rows.extend(keyword_row(campaign_name, cpc, kw, match_type) for kw in keywords)
+            rows.extend(negative_row(campaign_name, kw, '否定精准匹配') for kw in campaign_neg_exact)
+            rows.extend(negative_row(campaign_name, kw, '否定词组') for kw in campaign_neg_phrase)
+        if is_asin:
+            asin_targets = []
+            if campaign_name in df_survey.columns:
+                asin_targets.extend([asin for asin in df_survey[campaign_name].dropna() if str(asin).strip()])
+            asin_targets = list(dict.fromkeys(asin_targets))
+            rows.extend(asin_row(campaign_name, cpc, asin) for asin in asin_targets)
+            rows.extend(asin_row(campaign_name, '', asin, '否定商品定向') for asin in neg_asin)
+    return pd.DataFrame(rows, columns=COLUMNS)
@@ -0,0 +1,55 @@
+"""跨活动重复关键词和自我否定检查。"""
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import KEYWORD_COLUMNS
+from sp_header import GenerationLog, build_rows, find_collisions
+
+
+def survey():
+    columns = {
+        '广告活动名称': ['case 精准 A', 'case exact B', 'case 广泛 C', 'tape 精准 D'],
+        'CPC': [0.5, 0.6, 0.7, 0.8],
+        'SKU': ['SKU-A', 'SKU-B', 'SKU-C', 'SKU-D'],
+        '广告组默认竞价': [0.6] * 4,
+        '预算': [12] * 4,
+        '备注': [],
+        '其他': [],
+    }
+    columns.update({col: [] for col in KEYWORD_COLUMNS})
+    columns['case/包-精准词'] = ['red case']
+    columns['case/包-广泛词'] = ['case broad kw', 'phone case']
+    columns['tape精准词'] = ['tape roll']
+    # 大小写和空白不同也算同一个词
+    columns['否定精准'] = ['Case  Broad KW']
+    return pd.DataFrame({col: pd.Series(values, dtype=object) for col, values in columns.items()})
+
+
+@pytest.mark.parametrize('country', ['C US', 'B US'])
+def test_collisions_and_self_negations(country):
+    report = build_rows(survey(), country).collisions
+
+    collisions = report['跨活动重复']
+    assert collisions.values.tolist() == [['red case', '精准', 2, ['case 精准 A', 'case exact B']]]
+
+    negations = report['自我否定']
+    assert negations.values.tolist() == [['case 广泛 C', 'case broad kw', '广泛', 'Case  Broad KW']]
+
+
+def test_find_collisions_logs_examples():
+    rows = build_rows(survey(), 'C US')
+    log = GenerationLog()
+    report = find_collisions(rows, log)
+    assert len(report['跨活动重复']) == 1
+    text = log.text()
+    assert "1 个关键词被多个活动以相同匹配类型投放" in text
+    assert "case 广泛 C: 'case broad kw'（广泛）" in text
+
+
+def test_no_collisions():
+    df = survey()
+    df.loc[1, '广告活动名称'] = 'cards exact B'
+    df.loc[0, '否定精准'] = 'unrelated'
+    report = build_rows(df, 'C US').collisions
+    assert report['跨活动重复'].empty
+    assert report['自我否定'].empty
@@ -0,0 +1,107 @@
+"""增量生成：和上一版比较后的 Create / Update / Archive 行及上一版的实体编号。"""
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import KEYWORD_COLUMNS
+from sp_header import GenerationLog, build_rows, diff_rows, load_previous_states
+
+
+def survey(names, cpc, case_keywords):
+    columns = {
+        '广告活动名称': names,
+        'CPC': cpc,
+        'SKU': [f'SKU-{name[-1]}' for name in names],
+        '广告组默认竞价': [0.6] * len(names),
+        '预算': [12] * len(names),
+        '备注': [],
+        '其他': [],
+    }
+    columns.update({col: [] for col in KEYWORD_COLUMNS})
+    columns['case/包-精准词'] = case_keywords
+    columns['tape精准词'] = ['tape roll']
+    columns['否定精准'] = ['cheap']
+    return pd.DataFrame({col: pd.Series(values, dtype=object) for col, values in columns.items()})
+
+
+PREVIOUS = survey(['case 精准 A', 'tape 精准 B', 'case 广泛 C', 'tape 广泛 E'], [0.5, 0.6, 0.7, 0.4],
+                  ['red case', '007'])
+NEW = survey(['case 精准 A', 'tape 精准 B', 'case 广泛 C', 'acces 精准 D'], [0.8, 0.6, 0.7, 0.9],
+             ['red case', '7'])
+
+
+def downloaded_bulk(df):
+    """模拟从广告后台下载的批量表：编号列是亚马逊分配的编号，不是活动名称。"""
+    frame = build_rows(df, 'C US').to_frame()
+    campaigns = {name: i for i, name in enumerate(dict.fromkeys(frame['广告活动名称']))}
+    index = frame['广告活动名称'].map(campaigns)
+    level = frame['实体层级']
+    frame['广告活动编号'] = '1000' + index.astype(str)
+    frame['广告组编号'] = ('2000' + index.astype(str)).where(level != '广告活动', '')
+    frame['广告编号'] = ('300' + frame.index.astype(str)).where(level == '商品广告', '')
+    frame['关键词编号'] = ('400' + frame.index.astype(str)).where(level.isin(['关键词', '否定关键词']), '')
+    return frame
+
+
+def diff_frame(previous_path, log=None):
+    previous = load_previous_states(str(previous_path), 'C US')
+    rows, stats = diff_rows(build_rows(NEW, 'C US'), previous, log=log)
+    return rows.to_frame(), stats
+
+
+def select(frame, name, level, operation):
+    mask = (frame['广告活动名称'] == name) & (frame['实体层级'] == level) & (frame['操作'] == operation)
+    return frame[mask]
+
+
+@pytest.fixture
+def bulk_path(tmp_path):
+    path = tmp_path / 'bulk.xlsx'
+    downloaded_bulk(PREVIOUS).to_excel(path, index=False)
+    return path
+
+
+def test_diff_against_downloaded_bulk(bulk_path):
+    log = GenerationLog()
+    frame, stats = diff_frame(bulk_path, log)
+    assert stats == {'新增活动': 1, '变更活动': 2, '未变活动': 1, '删除活动': 1, '缺少编号': 0}
+    assert "警告" not in log.text()
+
+    # 未变的活动不输出
+    assert 'tape 精准 B' not in set(frame['广告活动名称'])
+    # 新活动整块 Create，没有上一版编号
+    created = frame[frame['广告活动名称'] == 'acces 精准 D']
+    assert set(created['操作']) == {'Create'}
+    assert set(created['广告活动编号']) == {'acces 精准 D'}
+
+    # CPC 变化：关键词 Update，带上一版的关键词 / 活动 / 广告组编号
+    updated = select(frame, 'case 精准 A', '关键词', 'Update')
+    assert updated[['关键词文本', '竞价', '广告活动编号', '广告组编号']].values.tolist() == [
+        ['red case', 0.8, '10000', '20000']]
+    assert updated['关键词编号'].str.startswith('400').all()
+
+    # '007' 和 '7' 是不同的关键词：旧词 Archive（带编号），新词在已有活动里 Create
+    archived = select(frame, 'case 精准 A', '关键词', 'Archive')
+    assert archived[['关键词文本', '关键词编号', '广告活动编号']].values.tolist() == [['007', '4004', '10000']]
+    created = select(frame, 'case 精准 A', '关键词', 'Create')
+    assert created[['关键词文本', '关键词编号', '广告活动编号', '广告组编号']].values.tolist() == [
+        ['7', '', '10000', '20000']]
+    negatives = frame[frame['广告活动名称'] == 'case 广泛 C']
+    assert sorted(negatives[['关键词文本', '操作']].values.tolist()) == [['007', 'Archive'], ['7', 'Create']]
+    assert negatives.loc[negatives['操作'] == 'Archive', '关键词编号'].tolist() != ['']
+
+    # 上一版有、新版没有的活动整体 Archive，带活动编号
+    removed = frame[frame['广告活动名称'] == 'tape 广泛 E']
+    assert removed[['实体层级', '操作', '广告活动编号']].values.tolist() == [['广告活动', 'Archive', '10003']]
+
+
+def test_previous_without_ids_warns(tmp_path):
+    # 上一版是调研表（或本工具生成的批量表）时没有实体编号
+    for path, frame in ((tmp_path / 'survey.xlsx', PREVIOUS),
+                        (tmp_path / 'generated.xlsx', build_rows(PREVIOUS, 'C US').to_frame())):
+        frame.to_excel(path, index=False)
+        log = GenerationLog()
+        frame, stats = diff_frame(path, log)
+        # Update 1 行 + Archive 两个 '007' 和删除的活动
+        assert stats['缺少编号'] == 4
+        assert "4 行 Update / Archive 没有上一版的实体编号" in log.text()
+        assert (frame.loc[frame['操作'] != 'Create', '关键词编号'] == '').all()
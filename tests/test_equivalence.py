@@ -0,0 +1,93 @@
+"""引擎和重构前逻辑（tests/baseline.py）的等价性检查：两套国家配置、所有可用的读取引擎。
+
+修改 country_profiles.json 或引擎后在仓库根目录运行 pytest。
+"""
+import pandas as pd
+import pytest
+
+import baseline
+from benchmarks.synthetic import survey_columns, write_survey
+from sp_header import SurveyError, available_readers, generate_header
+from sp_header.readers import text_dtypes
+
+
+REFERENCES = {'C US': baseline.header_rows_C, 'B US': baseline.header_rows_B}
+
+
+def read_reference(path):
+    """对照实现用 pandas 读取整张表，关键词类的列和引擎一样按文本读取。"""
+    names = list(pd.read_excel(path, nrows=0).columns)
+    return pd.read_excel(path, dtype=text_dtypes(names))
+
+
+def edge_columns():
+    """合成表之外的边界情况：缺默认值列、空白单元格、重复活动、多类别名称、宿主广泛、无关键词列的活动等。"""
+    columns = survey_columns(n_campaigns=16, keywords_per_column=6, negatives=4, asin_columns=2,
+                             asins_per_column=3, seed=1)
+    columns['广告活动名称'] = columns['广告活动名称'] + [
+        'suzhu 广泛 extra', '宿主 精准 extra', 'acces case broad', 'Case Exact 大写', 'misc exact 兜底',
+        'misc broad 兜底', 'tape asin 无列', '只有名称', 'suzhu 精准 SP-0', '   ',
+    ]
+    columns['suzhu/宿主-精准词'] = columns['suzhu/宿主-精准词'] + ['  ', 'case exact kw 0']
+    columns['cards广泛词'] = ['   '] + columns['cards广泛词']
+    # 数字样式的关键词和 ASIN：按文本读取，'007' 和 '7' 是不同的关键词
+    columns['tape精准词'] = columns['tape精准词'] + ['007', '7', '1e3', '0123', 12345, 1.5]
+    columns['acces广泛词'] = columns['acces广泛词'] + ['0042']
+    # 整列都像数字时 pandas 会把文本单元格也转成数字
+    columns['cards精准词'] = [7, '007', '0123', '1e3', 2.5]
+    columns['否定词组'] = columns['否定词组'][:2] + ['00123', 456]
+    asin_column = next(col for col in columns if 'asin' in col and col != '否定ASIN')
+    columns[asin_column] = columns[asin_column] + ['0012345678', 987654321]
+    columns['否定精准'] = columns['否定精准'] + ['否定精准 0', 'suzhu exact kw 1']
+    return columns
+
+
+def missing_defaults_columns():
+    columns = survey_columns(n_campaigns=10, keywords_per_column=4, negatives=3, asin_columns=1,
+                             asins_per_column=2, seed=2)
+    del columns['CPC'], columns['预算']
+    columns['备注'] = ['note']
+    return columns
+
+
+def no_negatives_columns():
+    columns = survey_columns(n_campaigns=12, keywords_per_column=5, negatives=3, asin_columns=2,
+                             asins_per_column=2, seed=3)
+    for col in ['否定精准', '否定词组', '宿主额外否精准', '宿主额外否词组', '否定ASIN']:
+        del columns[col]
+    return columns
+
+
+SURVEYS = {
+    'synthetic': lambda: survey_columns(n_campaigns=80, keywords_per_column=15, negatives=8, asin_columns=4,
+                                        asins_per_column=4),
+    'edge': edge_columns,
+    'missing_defaults': missing_defaults_columns,
+    'no_negatives': no_negatives_columns,
+}
+
+
+@pytest.fixture(scope='module', params=sorted(SURVEYS))
+def survey(request, tmp_path_factory):
+    path = tmp_path_factory.mktemp('surveys') / f'{request.param}.xlsx'
+    write_survey(path, SURVEYS[request.param]())
+    return path
+
+
+@pytest.mark.parametrize('reader', available_readers())
+@pytest.mark.parametrize('country', sorted(REFERENCES))
+def test_matches_baseline(survey, country, reader):
+    expected = REFERENCES[country](read_reference(survey))
+    result = generate_header(survey, country, reader=reader)
+    pd.testing.assert_frame_equal(result.astype(object), expected.astype(object))
+
+
+@pytest.mark.parametrize('country', sorted(REFERENCES))
+def test_duplicate_keywords_stop_generation(tmp_path, country):
+    columns = survey_columns(n_campaigns=8, keywords_per_column=4, negatives=2, asin_columns=1, asins_per_column=2)
+    columns['case/包-精准词'] = columns['case/包-精准词'] + [columns['case/包-精准词'][0]]
+    path = tmp_path / 'dup.xlsx'
+    write_survey(path, columns)
+    assert REFERENCES[country](pd.read_excel(path)) is None
+    with pytest.raises(SurveyError):
+        generate_header(path, country)
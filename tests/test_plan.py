@@ -0,0 +1,34 @@
+"""行数预估（RowCounter）和实际生成（RowBuilder）的行数一致。"""
+import pandas as pd
+import pytest
+
+from sp_header import build_rows, plan_rows, plan_shards
+from test_equivalence import SURVEYS
+
+
+def survey_frame(name):
+    return pd.DataFrame({col: pd.Series(values, dtype=object) for col, values in SURVEYS[name]().items()})
+
+
+def campaign_level_counts(rows):
+    counts = {}
+    for _, n, values in rows._blocks:
+        levels = counts.setdefault(values['广告活动名称'], {})
+        levels[values['实体层级']] = levels.get(values['实体层级'], 0) + n
+    return counts
+
+
+@pytest.mark.parametrize('country', ['C US', 'B US'])
+@pytest.mark.parametrize('survey', sorted(SURVEYS))
+def test_counter_matches_builder(survey, country):
+    df = survey_frame(survey)
+    rows = build_rows(df, country)
+    counter = plan_rows(df, country)
+
+    assert counter.n_rows == rows.n_rows
+    assert counter.level_counts == rows.level_counts
+    assert counter.campaigns == campaign_level_counts(rows)
+    frame = counter.to_frame()
+    assert frame['总行数'].sum() == rows.n_rows
+    for max_rows in (None, 50, 200):
+        assert counter.files_needed(max_rows) == max(1, len(plan_shards(rows, max_rows=max_rows)))
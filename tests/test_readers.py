@@ -0,0 +1,40 @@
+"""调研表读取：CSV 的关键词列按文本读取、格式识别。"""
+import io
+
+import pytest
+
+from sp_header import SurveyError, load_survey
+
+
+def upload(data, name=''):
+    source = io.BytesIO(data)
+    source.name = name
+    return source
+
+
+def test_csv_keeps_numeric_looking_keywords_as_text():
+    text = ('广告活动名称,CPC,SKU,广告组默认竞价,预算,备注,其他,case/包-精准词,否定精准,否定ASIN\n'
+            'case 精准,0.5,SKU-1,0.6,12,,,007,00123,0012345678\n'
+            ',,,,,,,7,1e3,123\n')
+    for name in ('survey.csv', ''):
+        df = load_survey(upload(text.encode('utf-8'), name))
+        assert df['case/包-精准词'].tolist() == ['007', '7']
+        assert df['否定精准'].tolist() == ['00123', '1e3']
+        assert df['否定ASIN'].tolist() == ['0012345678', '123']
+        assert df['CPC'].iloc[0] == 0.5
+
+
+def test_gb18030_csv_without_extension():
+    text = '广告活动名称,CPC\n宿主 精准,0.5\n'
+    df = load_survey(upload(text.encode('gb18030')))
+    assert df['广告活动名称'].tolist() == ['宿主 精准']
+
+
+@pytest.mark.parametrize('data, name, message', [
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1' + b'\x00' * 512, 'survey.xls', '.xls'),
+    (bytes(range(256)) * 4, '', '不支持的文件格式'),
+    (b'', '', '文件为空'),
+])
+def test_unsupported_formats(data, name, message):
+    with pytest.raises(SurveyError, match=message):
+        load_survey(upload(data, name))
@@ -0,0 +1,89 @@
+"""本地 HTTP 批量生成服务：通过 ServiceClient 检查各状态码。"""
+import io
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from benchmarks.synthetic import make_survey
+from sp_header import BatchService, ServiceClient, SurveyError
+
+
+@pytest.fixture(scope='module')
+def root(tmp_path_factory):
+    root = tmp_path_factory.mktemp('service')
+    make_survey(root / 'survey.xlsx', n_campaigns=8, keywords_per_column=3, negatives=2, asin_columns=1,
+                asins_per_column=2)
+    # 名为 "2024" 的工作表按名称选择，不当作序号
+    wb = Workbook()
+    wb.active.title = 'Sheet1'
+    wb.active.append(['广告活动名称'])
+    wb.active.append(['第一个工作表 精准'])
+    ws = wb.create_sheet('2024')
+    ws.append(['广告活动名称'])
+    ws.append(['名为2024的工作表 精准'])
+    wb.save(root / 'sheets.xlsx')
+    return root
+
+
+@pytest.fixture(scope='module')
+def service(root):
+    service = BatchService(port=0, max_workers=1, max_queue=0, root=str(root)).start()
+    yield service
+    service.shutdown()
+
+
+@pytest.fixture
+def client(service):
+    return ServiceClient(service.url, timeout=60)
+
+
+def campaigns(data):
+    df = pd.read_excel(io.BytesIO(data))
+    return df.loc[df['实体层级'] == '广告活动', '广告活动名称'].tolist()
+
+
+def test_generate_upload_and_path(client, root):
+    data, headers = client.generate(root / 'survey.xlsx', 'C US', 'csv')
+    assert int(headers['X-Rows']) > 0
+    assert 'survey-header-C_US.csv' in headers['Content-Disposition']
+    data, headers = client.generate_path('survey.xlsx', 'B US')
+    assert len(campaigns(data)) == 8
+
+
+def test_sheet_name_and_index(client, root):
+    data, _ = client.generate(root / 'sheets.xlsx', sheet='2024')
+    assert campaigns(data) == ['名为2024的工作表 精准']
+    data, _ = client.generate(root / 'sheets.xlsx', sheet=0)
+    assert campaigns(data) == ['第一个工作表 精准']
+    data, _ = client.generate_path('sheets.xlsx', sheet=1)
+    assert campaigns(data) == ['名为2024的工作表 精准']
+
+
+@pytest.mark.parametrize('call, status', [
+    (lambda client, root: client.generate(root / 'survey.xlsx', 'X US'), 400),
+    (lambda client, root: client.generate(b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1' + b'\x00' * 64, name='old.xls'), 400),
+    (lambda client, root: client.generate_path('../outside.xlsx'), 403),
+    (lambda client, root: client.generate_path('missing.xlsx'), 404),
+])
+def test_error_status(client, root, call, status):
+    with pytest.raises(SurveyError, match=f"服务返回 {status}"):
+        call(client, root)
+
+
+def test_busy_returns_503(client, service, root):
+    # max_workers=1、max_queue=0：占住唯一的名额后再来的请求直接返回 503
+    service._slots.acquire()
+    try:
+        with pytest.raises(SurveyError, match="服务返回 503"):
+            client.generate(root / 'survey.xlsx')
+    finally:
+        service._slots.release()
+
+
+def test_health_counts_requests(client, service):
+    health = client.health()
+    assert health['状态'] == 'ok'
+    assert health['工作进程数'] == 1
+    assert health['请求数'] == service.requests
+    assert health['失败数'] == service.failures
@@ -0,0 +1,80 @@
+"""按活动边界拆分批量表：分片不拆开活动、遵守行数 / 字节上限，合起来和不拆分的结果一致。"""
+import io
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import survey_columns
+from sp_header import build_rows, plan_shards, to_bytes, write_shards
+from sp_header.cli import write_output
+
+
+@pytest.fixture(scope='module')
+def rows():
+    columns = survey_columns(n_campaigns=30, keywords_per_column=12, negatives=6, asin_columns=2, asins_per_column=4)
+    df = pd.DataFrame({col: pd.Series(values, dtype=object) for col, values in columns.items()})
+    return build_rows(df, 'C US')
+
+
+def read_csv(data):
+    return pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False)
+
+
+def campaign_rows(rows):
+    counts = {}
+    for _, n, values in rows._blocks:
+        counts[values['广告活动名称']] = counts.get(values['广告活动名称'], 0) + n
+    return counts
+
+
+def test_plan_is_campaign_aligned_and_respects_max_rows(rows):
+    max_rows = 120
+    shards = plan_shards(rows, max_rows=max_rows)
+    counts = campaign_rows(rows)
+    assert len(shards) > 1
+    assert [name for names in shards for name in names] == list(counts)
+    for names in shards:
+        if len(names) > 1:
+            assert sum(counts[name] for name in names) + 1 <= max_rows
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'xlsx'])
+def test_shards_contain_every_row(rows, fmt):
+    shards = write_shards(rows, 'header-C_US', max_rows=150, fmt=fmt, max_workers=1)
+    assert [name for name, _, _ in shards] == [f'header-C_US-{i}.{fmt}' for i in range(1, len(shards) + 1)]
+    assert sum(n_rows for _, n_rows, _ in shards) == rows.n_rows
+
+    if fmt == 'csv':
+        frames = [read_csv(data) for _, _, data in shards]
+        expected = read_csv(to_bytes(rows, 'csv').getvalue())
+    else:
+        frames = [pd.read_excel(io.BytesIO(data), dtype=str) for _, _, data in shards]
+        expected = pd.read_excel(to_bytes(rows, 'xlsx'), dtype=str)
+    seen = set()
+    for frame, (_, n_rows, _) in zip(frames, shards):
+        assert len(frame) == n_rows
+        assert n_rows + 1 <= 150 or frame['广告活动名称'].nunique() == 1
+        names = set(frame['广告活动名称'])
+        assert not names & seen  # 活动不会跨分片
+        seen |= names
+    pd.testing.assert_frame_equal(pd.concat(frames, ignore_index=True), expected)
+
+
+def test_shards_respect_max_bytes(rows):
+    max_bytes = 4000
+    shards = write_shards(rows, 'header.csv', max_bytes=max_bytes, fmt='csv', max_workers=1)
+    assert len(shards) > 1
+    for _, _, data in shards:
+        assert len(data) <= max_bytes or read_csv(data)['广告活动名称'].nunique() == 1
+    frames = [read_csv(data) for _, _, data in shards]
+    assert sum(len(frame) for frame in frames) == rows.n_rows
+
+
+def test_cli_reports_the_shard_files_it_wrote(rows, tmp_path):
+    output_file = tmp_path / 'survey-header-C_US.csv'
+    n_rows, paths = write_output(rows, str(output_file), max_rows=150, fmt='csv')
+    assert n_rows == rows.n_rows
+    assert len(paths) > 1
+    assert not output_file.exists()
+    assert sorted(tmp_path.iterdir()) == sorted(map(type(tmp_path), paths))
+    assert sum(len(read_csv(open(path, 'rb').read())) for path in paths) == rows.n_rows
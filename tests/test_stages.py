@@ -0,0 +1,42 @@
+"""阶段记录：同时运行的阶段不互相重置峰值 RSS 水位。"""
+import threading
+
+from sp_header import StageRecorder
+from sp_header import stages as stages_module
+
+
+def test_sequential_stages_reset_peak(monkeypatch):
+    resets = []
+    monkeypatch.setattr(stages_module, 'reset_peak_rss', lambda: resets.append(1) or True)
+    recorder = StageRecorder()
+    with recorder.stage('读取'):
+        pass
+    with recorder.stage('写出'):
+        pass
+    assert len(resets) == 2
+    assert not any(record['RSS重叠'] for record in recorder.results())
+
+
+def test_overlapping_stages_do_not_reset_each_other(monkeypatch):
+    resets = []
+    monkeypatch.setattr(stages_module, 'reset_peak_rss', lambda: resets.append(1) or True)
+    first, second = StageRecorder(), StageRecorder()
+    inside, release = threading.Event(), threading.Event()
+
+    def run_first():
+        with first.stage('行构建'):
+            inside.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=run_first)
+    thread.start()
+    inside.wait(5)
+    with second.stage('行构建'):
+        pass
+    release.set()
+    thread.join()
+
+    # 只有先开始的阶段重置了水位，两个阶段都标记为重叠
+    assert len(resets) == 1
+    assert first.results()[0]['RSS重叠']
+    assert second.results()[0]['RSS重叠']